@@ -0,0 +1,73 @@
+'''
+Compare browsing months with per-month choropleths against one animated figure
+
+    python -m benchmarks.choropleth_animation
+
+Per-month browsing builds a figure and sends it to the browser on every step;
+the animated figure is built once per store version and every step after that
+happens client-side. Frame data is checked against the per-month figures.
+'''
+import os
+import glob
+import json
+import time
+import plotly.graph_objects as go
+
+from src.charts import makeChoropleth
+from src.data import getStore, getMonth, getFigure, getFigureJSON, _datasets, frame_cache
+from src.store import FIGURES_DIR
+
+ARGS = (-1, 50, "CPI", "sunset", "CPI (%)", "<b>Consumer Price Index Change</b>", "Source: BIS")
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    store = getStore()
+    periods = store.periods()
+
+    start = time.perf_counter()
+    payload = 0
+    per_month = {}
+    for year, month in periods:
+        fig_json = makeChoropleth(getMonth(year, month), *ARGS).to_json()
+        per_month[f"{year}-{month:02d}"] = json.loads(fig_json)["data"][0]
+        payload += len(fig_json)
+    monthly = time.perf_counter() - start
+
+    build = lambda: makeChoropleth(store.toFrame(), *ARGS, animate=True)
+    animate = timed(build)
+    animated_json = build().to_json()
+    for frame in json.loads(animated_json)["frames"]:
+        expected = per_month[frame["name"]]
+        for key in ("locations", "z", "text"):
+            assert frame["data"][0][key] == expected[key], f"{key} differs in {frame['name']}"
+
+    name = ("benchmark", *ARGS)
+    _datasets.pop(("figure", name), None)
+    first = timed(lambda: getFigure(name, build))
+    shared = timed(lambda: getFigure(name, build))
+
+    figure_path = os.path.join(store.path, FIGURES_DIR, store.key[1])
+    for path in glob.glob(os.path.join(figure_path, "*.json")):
+        os.remove(path)
+    frame_cache.clear()
+    serialize = timed(lambda: getFigureJSON(name, build))
+    frame_cache.clear()
+    from_disk = timed(lambda: getFigureJSON(name, lambda: 1 / 0))
+    parse = timed(lambda: go.Figure(json.loads(getFigureJSON(name, build)), _validate=False))
+
+    print(f"{len(periods)} months")
+    print(f"per-month figures: {monthly * 1000:>8.1f} ms to build, {payload / 1e6:.2f} MB sent over all steps")
+    print(f"animated figure:   {animate * 1000:>8.1f} ms to build, {len(animated_json) / 1e6:.2f} MB sent once")
+    print(f"shared animation:  {first * 1000:>8.1f} ms once per store version, {shared * 1000:.3f} ms per session")
+    print(f"serialized form:   {serialize * 1000:>8.1f} ms to write, {from_disk * 1000:.1f} ms to read back "
+          f"from {figure_path}, {parse * 1000:.1f} ms to turn into a figure")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+'''
+Time line trace extraction from the combined dataframe and from per-country groups
+
+    python -m benchmarks.country_groups
+
+Scanning runs df[df.Country == country] on the full monthly (or daily) data for
+every country and indicator, grouped slices CountryGroups blocks. Grouping is
+timed separately since the data layer does it once per selection.
+'''
+import time
+import numpy as np
+
+from src.charts import countrySeries
+from src.data import getStore, getPolicyRates
+from src.grouped import CountryGroups
+
+INDICATORS = ("CPI", "InterestRate")
+INTERVAL = (2008, 9)
+REPEATS = 5
+
+
+def best(func) -> float:
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def traces(df, countries, indicators):
+    return [countrySeries(df, country, indicator, INTERVAL) for indicator in indicators for country in countries]
+
+
+def compare(name, df, countries, indicators):
+    print(f"\n{name}: {len(df):,} rows")
+    print(f"{'countries':>10} {'scan (ms)':>10} {'group (ms)':>11} {'grouped (ms)':>13} {'speedup':>8}")
+    for n in sorted({1, 2, 4, 7, 14, 28, len(countries)}):
+        selected = countries[:n]
+        subset = df[df.Country.isin(selected)]
+        groups = CountryGroups.fromFrame(subset)
+        for (x, y), (gx, gy) in zip(traces(df, selected, indicators), traces(groups, selected, indicators)):
+            assert np.array_equal(x, gx) and np.array_equal(y, gy, equal_nan=True)
+        scan = best(lambda: traces(df, selected, indicators))
+        group = best(lambda: CountryGroups.fromFrame(subset))
+        grouped = best(lambda: traces(groups, selected, indicators))
+        print(f"{n:>10} {scan * 1000:>10.2f} {group * 1000:>11.2f} {grouped * 1000:>13.3f} {scan / grouped:>7.0f}x")
+
+
+def main():
+    store = getStore()
+    monthly = store.toFrame(columns=["Country", "date", *INDICATORS])
+    compare("monthly CPI and interest rates", monthly, list(store.countries()), INDICATORS)
+    rates = getPolicyRates()
+    daily = rates.resample(rates.countries(), freq="D")
+    compare("daily policy rates", daily, list(rates.countries()), ("InterestRate",))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+'''
+Check and time the cross-asset statistics of AssetPanel against per-symbol pandas loops
+
+    python -m benchmarks.cross_asset [--start 2015-01-01] [--window 63] [--step 21]
+
+A scratch OHLC store is filled with the deterministic bars of the market
+fetch benchmark for every symbol of the bundled universes. Daily returns,
+rolling volatility, betas against ES=F and the full rolling correlation
+matrices must match pandas, and so must the monthly returns of ES=F joined
+with the interest rates of the USA.
+'''
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from benchmarks.market_fetch import syntheticBars
+from benchmarks.rolling_stats import best, check
+from src.crossasset import AssetPanel
+from src.data import getAssetStatistic, getCountryReturns, getPanel
+from src.market import universeSymbols
+from src.ohlc import OHLCStore
+
+END = "2022-06-01"
+BENCHMARK = "ES=F"
+
+
+def pandasReturns(store: OHLCStore, symbols: list, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    columns = {}
+    for symbol in symbols:
+        close = store.read(symbol).set_index("date").close
+        close = close[close.index.dayofweek < 5]
+        columns[symbol] = close.pct_change().reindex(dates)
+    return pd.DataFrame(columns)
+
+
+def pandasStats(returns: pd.DataFrame, window: int) -> dict:
+    market = returns[BENCHMARK]
+    volatility, beta = {}, {}
+    for symbol, series in returns.items():
+        volatility[symbol] = series.rolling(window).std()
+        # both over the days the symbol and the benchmark traded
+        beta[symbol] = series.rolling(window).cov(market) / (market + 0 * series).rolling(window).var()
+    return {"volatility": pd.DataFrame(volatility), "beta": pd.DataFrame(beta)}
+
+
+def pandasMatrices(returns: pd.DataFrame, window: int, ends: np.ndarray) -> np.ndarray:
+    return np.stack([returns.iloc[max(end - window + 1, 0):end + 1].corr(min_periods=window).to_numpy()
+                     for end in ends])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--start", default="2015-01-01")
+    parser.add_argument("--window", type=int, default=63, help="trading days")
+    parser.add_argument("--step", type=int, default=21, help="trading days between correlation matrices")
+    args = parser.parse_args()
+
+    symbols = list(universeSymbols())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OHLCStore(tmp)
+        for symbol in symbols:
+            store.append(symbol, syntheticBars(symbol, np.datetime64(args.start), np.datetime64(END)))
+
+        start = time.perf_counter()
+        panel = AssetPanel.fromStore(store, symbols)
+        load = time.perf_counter() - start
+        print(f"{len(symbols)} symbols x {len(panel.months)} trading days, panel built in {load * 1000:.0f} ms")
+
+        start = time.perf_counter()
+        returns = pandasReturns(store, symbols, pd.DatetimeIndex(panel.dates))
+        reference_returns = time.perf_counter() - start
+        check(panel.series("return"), returns.to_numpy().T, "return")
+
+        print(f"{'statistic':>22} {'pandas (ms)':>12} {'panel (ms)':>11} {'speedup':>8}")
+        fast = best(lambda: AssetPanel(symbols, panel.months, panel.values).series("return"))
+        print(f"{'daily returns':>22} {reference_returns * 1000:>12.1f} {fast * 1000:>11.1f} "
+              f"{reference_returns / fast:>7.1f}x")
+
+        reference = pandasStats(returns, args.window)
+        for statistic in ("volatility", "beta"):
+            ours = AssetPanel.fromStore(store, symbols).statistic(statistic, args.window, BENCHMARK)
+            check(ours, reference[statistic].to_numpy().T, statistic)
+            slow = best(lambda: pandasStats(returns, args.window))
+            fast = best(lambda: AssetPanel(symbols, panel.months, panel.values).statistic(
+                statistic, args.window, BENCHMARK))
+            # pandasStats computes both statistics, charge half of it to each
+            print(f"{statistic:>22} {slow * 500:>12.1f} {fast * 1000:>11.1f} {slow / 2 / fast:>7.1f}x")
+
+        ends, matrices = panel.correlationMatrices("return", args.window, args.step)
+        start = time.perf_counter()
+        expected = pandasMatrices(returns, args.window, ends)
+        slow = time.perf_counter() - start
+        check(matrices, expected, "correlation matrices")
+        fast = best(lambda: panel.correlationMatrices("return", args.window, args.step))
+        print(f"{f'{len(ends)} corr matrices':>22} {slow * 1000:>12.1f} {fast * 1000:>11.1f} {slow / fast:>7.1f}x")
+
+        start = time.perf_counter()
+        getAssetStatistic("beta", args.window, benchmark=BENCHMARK, store_path=tmp)
+        first = time.perf_counter() - start
+        again = best(lambda: getAssetStatistic("beta", args.window, benchmark=BENCHMARK, store_path=tmp))
+        print(f"getAssetStatistic: first call {first * 1000:.0f} ms, cached {again * 1e6:.0f} us")
+
+        joined = getCountryReturns(((BENCHMARK, "USA"),), store_path=tmp)
+        close = store.read(BENCHMARK).set_index("date").close
+        monthly = close.resample("MS").last().pct_change() * 100
+        rates = getPanel()
+        usa = rates.countries().index("USA")
+        frame = pd.DataFrame({"Return": monthly.reindex(rates.dates),
+                              "InterestRate": rates.values["InterestRate"][usa]}, index=rates.dates)
+        expected = frame.Return.rolling(36).corr(frame.InterestRate.diff())
+        check(joined.corr("Return", "InterestRate.change", 36)[0], expected.to_numpy(), "joined corr")
+        observed = np.isfinite(joined.values["Return"][0]).sum()
+        print(f"{BENCHMARK} monthly returns joined with USA interest rates over {observed} months, matches pandas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+'''
+Check and time slice queries through the data service against the local store
+
+    python -m benchmarks.data_service [--address unix:/tmp/fm.sock] [--repeats 200]
+
+The service runs in its own process, as it would next to several dashboard
+workers. Every slice read through DataClient must equal the same slice of the
+local ColumnarStore, including dtypes and categories.
+'''
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+from src.data import getLocalStore
+from src.service import DataClient, toArrow
+
+COUNTRIES = ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")
+
+
+def waitFor(client: DataClient, seconds: float=30.0) -> None:
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            client.meta()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def latencies(func, repeats: int) -> np.ndarray:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default=None, help="http://host:port or unix:/path, a temporary socket by default")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    store = getLocalStore()
+    with tempfile.TemporaryDirectory() as tmp:
+        address = args.address or f"unix:{os.path.join(tmp, 'fm.sock')}"
+        service = subprocess.Popen([sys.executable, "-m", "src.service", "--address", address],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            client = DataClient(address)
+            waitFor(client)
+            year, month = store.periods()[-1]
+            queries = {
+                "month": lambda source: source.getMonth(year, month),
+                "month, 7 countries": lambda source: source.getMonth(year, month, COUNTRIES),
+                "7 country series": lambda source: source.getCountries(COUNTRIES, ("Country", "date", "CPI", "InterestRate")),
+                "whole store": lambda source: source.toFrame(),
+            }
+            print(f"{'query':>20} {'rows':>6} {'payload (KB)':>13} {'local p50 (ms)':>15} "
+                  f"{'service p50 (ms)':>17} {'service p90 (ms)':>17}")
+            for name, query in queries.items():
+                expected = query(store)
+                pd.testing.assert_frame_equal(query(client), expected)
+                local = latencies(lambda: query(store), args.repeats)
+                remote = latencies(lambda: query(client), args.repeats)
+                print(f"{name:>20} {len(expected):>6} {len(toArrow(expected)) / 2**10:>13.1f} "
+                      f"{np.percentile(local, 50):>15.2f} {np.percentile(remote, 50):>17.2f} "
+                      f"{np.percentile(remote, 90):>17.2f}")
+            meta = latencies(lambda: client._request("GET", "/meta"), args.repeats)
+            print(f"\nmetadata round trip p50 {np.percentile(meta, 50):.2f} ms, "
+                  f"refreshed at most every {client.refresh_seconds:.0f} s by each worker")
+        finally:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
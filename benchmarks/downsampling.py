@@ -0,0 +1,66 @@
+'''
+Measure figure payload size and build time of the trend plots with and without downsampling
+
+    python -m benchmarks.downsampling
+'''
+import time
+import numpy as np
+import plotly.express as px
+
+from src.charts import makeVerticalLineplots, intervalBounds
+from src.data import getStore, getCountries, getDailyRates
+
+INTERVAL = (2008, 10)
+DEFAULT_COUNTRIES = ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")
+
+
+def build(frames, countries, max_points, method, repeat=3):
+    built, serialised = float("inf"), float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig = makeVerticalLineplots(frames, ("CPI", "InterestRate"), countries, INTERVAL,
+                                    ("CPI", "Interest Rate"), px.colors.sequential.Sunsetdark,
+                                    max_points=max_points, downsample_method=method)
+        middle = time.perf_counter()
+        payload = fig.to_json()
+        built, serialised = min(built, middle - start), min(serialised, time.perf_counter() - middle)
+    return fig, built, serialised, len(payload)
+
+
+def checkInterval(reference, fig):
+    '''
+    Assert every point of the highlighted month survived downsampling
+    '''
+    low, high = (np.datetime64(i) for i in intervalBounds(INTERVAL))
+    for full, reduced in zip(reference.data, fig.data):
+        x_full = np.asarray(full.x, dtype="datetime64[ns]")
+        x_reduced = np.asarray(reduced.x, dtype="datetime64[ns]")
+        inside = x_full[(x_full >= low) & (x_full <= high)]
+        assert np.isin(inside, x_reduced).all(), f"{full.name}: highlighted month not preserved"
+
+
+def main():
+    store = getStore()
+    build(getCountries(DEFAULT_COUNTRIES), DEFAULT_COUNTRIES, None, "lttb", repeat=1)
+    print(f"{'countries':>9} {'rates':>6} {'method':>7} {'points':>8} {'build (ms)':>11} "
+          f"{'to_json (ms)':>13} {'payload (KB)':>13}")
+    for countries in (DEFAULT_COUNTRIES, store.countries()):
+        date_range = ("1999-01-01", "2022-03-31")
+        for frequency in ("M", "D"):
+            frames = getCountries(countries)
+            if frequency == "D":
+                frames = {"CPI": frames, "InterestRate": getDailyRates(countries, "D", date_range=date_range)}
+            reference = None
+            for max_points, method in ((None, "lttb"), (700, "lttb"), (700, "minmax")):
+                fig, built, serialised, payload = build(frames, countries, max_points, method)
+                if reference is None:
+                    reference = fig
+                else:
+                    checkInterval(reference, fig)
+                points = sum(len(i.x) for i in fig.data)
+                print(f"{len(countries):>9} {frequency:>6} {method if max_points else 'full':>7} {points:>8} "
+                      f"{built * 1000:>11.1f} {serialised * 1000:>13.1f} {payload / 1024:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+'''
+Compare the join-based Eurozone expansion against the original per-member loop
+
+    python -m benchmarks.eurozone_expansion
+
+Both versions are run on the BIS CPI and interest rate data for several date
+ranges and on synthetic data with more members and months; outputs must match.
+'''
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable
+
+from src.isocodes import loadCodeTable
+from src.preprocessing import expandCPIInterestRates, getMonthlyLong, splitDate
+from src.utils import cpi_path, ir_path, iso_conversions_path, eurozone_path
+
+DATE_RANGES = [("1999-01", "2022-03"), ("2008-01", "2008-12"), ("2015-06", "2022-03")]
+
+
+def legacyExpandCPIInterestRates(cpi_df: pd.DataFrame, ir_df: pd.DataFrame, eu_join: dict) -> pd.DataFrame:
+    '''
+    Per-member implementation of expandCPIInterestRates used before the join
+    '''
+    cpi_df = splitDate(cpi_df)
+    ir_df = splitDate(ir_df)
+    df = cpi_df.merge(ir_df, how="left")
+
+    dfs = []
+    for i in eu_join:
+        dfs.append(pd.DataFrame({
+                    "year" : df[(df.ISO3 == i) & (df.year >= eu_join[i])].year.values,
+                    "month": df[(df.ISO3 == i) & (df.year >= eu_join[i])].month.values,
+                    "ISO3" : df[(df.ISO3 == i) & (df.year >= eu_join[i])].ISO3.values,
+                    "CPI"  : df[(df.ISO3 == i) & (df.year >= eu_join[i])].CPI.values,
+                    "InterestRate": df[(df.ISO3 == "XM") & (df.year >= eu_join[i])].InterestRate.values}))
+    df = ir_df.merge(cpi_df, how="left")
+
+    return pd.concat([df, *dfs])
+
+
+def timeit(func: Callable, repeat: int=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(name: str, cpi_df: pd.DataFrame, ir_df: pd.DataFrame, eu_join: dict) -> None:
+    legacy = lambda: legacyExpandCPIInterestRates(cpi_df.copy(), ir_df.copy(), eu_join)
+    joined = lambda: expandCPIInterestRates(cpi_df.copy(), ir_df.copy(), eu_join)
+    pd.testing.assert_frame_equal(legacy().reset_index(drop=True), joined().reset_index(drop=True))
+    legacy_time, joined_time = timeit(legacy), timeit(joined)
+    print(f"{name:>32} {len(eu_join):>8} {len(cpi_df):>9,} "
+          f"{legacy_time * 1000:>12.1f} {joined_time * 1000:>11.1f} {legacy_time / joined_time:>7.1f}x")
+
+
+def synthetic(members: int, months: int) -> tuple:
+    '''
+    CPI for members plus the euro area and an XM interest rate over a number of months
+    '''
+    rng = np.random.default_rng(0)
+    dates = [f"{2000 + i // 12}-{i % 12 + 1:02d}" for i in range(months)]
+    codes = [f"E{i:02d}" for i in range(members)] + ["XM"]
+    cpi_df = pd.DataFrame({"date": np.tile(dates, len(codes)),
+                           "ISO3": np.repeat(codes, months),
+                           "CPI": rng.normal(2, 1, months * len(codes))})
+    ir_df = pd.DataFrame({"date": dates, "ISO3": "XM", "InterestRate": rng.normal(1, 0.5, months)})
+    eu_join = {code: 2000 + int(rng.integers(0, months // 12)) for code in codes[:-1]}
+    return cpi_df, ir_df, eu_join
+
+
+def main():
+    iso_conversions = loadCodeTable(iso_conversions_path)
+    eu_index = pd.read_csv(eurozone_path, parse_dates=["Adoption"])
+    eu_join = dict(zip(eu_index.ISO3, eu_index.Adoption.dt.year))
+
+    print(f"{'data':>32} {'members':>8} {'CPI rows':>9} {'legacy (ms)':>12} {'joined (ms)':>11} {'speedup':>8}")
+    for date_range in DATE_RANGES:
+        cpi_df = getMonthlyLong(cpi_path, "CPI", iso_conversions, date_range,
+                                filters={"Unit of measure": "771:Year-on-year changes, in per cent",
+                                         "Frequency": "M:Monthly"})
+        ir_df = getMonthlyLong(ir_path, "InterestRate", iso_conversions, date_range)
+        compare(f"BIS {date_range[0]} to {date_range[1]}", cpi_df, ir_df, eu_join)
+    for members, months in ((20, 279), (100, 279), (100, 2790)):
+        compare(f"synthetic, {months} months", *synthetic(members, months))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+'''
+Time the batch export of the whole back catalogue with an increasing number of worker processes
+
+    python -m benchmarks.export_scaling [--months 279] [--formats json]
+
+Every run must write the same figures (JSON files are compared after parsing,
+key order depends on whether a worker had the figure template cached); speedup
+and parallel efficiency are relative to a single process.
+'''
+import os
+import json
+import argparse
+import tempfile
+
+from src.data import getStore
+from src.export import exportCharts
+
+COUNTRY_SETS = [("default", ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")),
+                ("americas", ("USA", "Canada", "Brazil", "Mexico", "Chile"))]
+
+
+def readFigures(out_dir: str, files: list) -> dict:
+    contents = {}
+    for path in files:
+        if path.endswith(".json"):
+            with open(path) as json_file:
+                contents[os.path.relpath(path, out_dir)] = json.load(json_file)
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=None, help="most recent months to export, all by default")
+    parser.add_argument("--formats", nargs="+", default=["json"])
+    args = parser.parse_args()
+
+    periods = getStore().periods()[-args.months:] if args.months else getStore().periods()
+    start, end = (f"{year}-{month:02d}" for year, month in (periods[0], periods[-1]))
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, *[2**i for i in range(1, cores.bit_length() + 1) if 2**i <= cores], cores})
+    print(f"{len(periods)} months, {len(COUNTRY_SETS)} country sets, {cores} cores")
+    print(f"{'workers':>8} {'files':>7} {'time (s)':>9} {'files/s':>8} {'speedup':>8} {'efficiency':>11}")
+    reference, single = None, None
+    for n in workers:
+        with tempfile.TemporaryDirectory() as out_dir:
+            summary = exportCharts(start, end, COUNTRY_SETS, out_dir, args.formats, workers=n)
+            contents = readFigures(out_dir, summary["files"])
+        if reference is None:
+            reference, single = contents, summary["seconds"]
+        assert contents == reference, f"output with {n} workers differs"
+        speedup = single / summary["seconds"]
+        print(f"{n:>8} {len(summary['files']):>7} {summary['seconds']:>9.2f} "
+              f"{len(summary['files']) / summary['seconds']:>8.1f} {speedup:>7.2f}x {speedup / n:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+'''
+Compare sending the dashboard charts with st.plotly_chart and with the cached payloads
+
+    python -m benchmarks.figure_payload [--reruns 12]
+
+Every rerun steps to the previous month with the default countries, as when
+a user browses the month selector. st.plotly_chart builds every figure and
+validates and encodes it with the plotly JSON encoder; the payload path
+reuses the JSON of unchanged charts and traces and encodes the rest with
+orjson. The payloads must decode to the same figures, and the chart protos
+must match apart from the spec text.
+'''
+import re
+import json
+import base64
+import time
+import argparse
+import numpy as np
+from plotly.colors import sequential
+from streamlit.elements.plotly_chart import marshall
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+
+from src.charts import makeScatterplot, makeVerticalLineplots, makeChoropleth, makeHeatmap
+from src.data import (getStore, getMonth, getCountries, getDataset, getRolling, getCrossCorrelation,
+                      getFigurePayload)
+from src.serialize import ENGINE, CHART_CONFIG, figurePayload
+from src.startup import DEFAULT_COUNTRIES
+
+DATE = re.compile(r"^\d{4}-\d{2}-\d{2}T[\d:.]+$")
+
+
+def charts(year: int, month: int, countries: tuple) -> dict:
+    '''
+    Key, builder and data key of every chart of the dashboard for a selection, as in financial-markets.py
+    '''
+    args = (-1, 50, "CPI", "sunset", "CPI (%)", "<b>Consumer Price Index Change</b>", "source")
+    return {
+        "scatterplot": (("scatterplot", year, month, countries),
+                        lambda: makeScatterplot(getMonth(year, month, countries), ("CPI", "InterestRate")), None),
+        "trendplots": (("trendplots", countries, "Monthly", year, month),
+                       lambda: makeVerticalLineplots(getCountries(countries, grouped=True), ("CPI", "InterestRate"),
+                                                     countries, (year, month), ("CPI", "Interest rate"),
+                                                     sequential.Sunsetdark, max_points=700),
+                       ("trendplots", countries, "Monthly")),
+        "choropleth": (("choropleth", "CPI", year, month), lambda: makeChoropleth(getMonth(year, month), *args), None),
+        "creditplots": (("creditplots", countries, year, month),
+                        lambda: makeVerticalLineplots({name: getDataset(name, grouped=True)
+                                                       for name in ("CreditGap", "PropertyPrices")},
+                                                      ("CreditGap", "PropertyPrices"), countries, (year, month),
+                                                      ("Credit gap", "Property prices"), sequential.Sunsetdark),
+                        ("creditplots", countries)),
+        "rollingplots": (("rollingplots", countries, year, month),
+                         lambda: makeVerticalLineplots({"mean(CPI)": getRolling("mean", ("CPI",), 12),
+                                                        "mean(InterestRate)": getRolling("mean", ("InterestRate",), 12)},
+                                                       ("mean(CPI)", "mean(InterestRate)"), countries, (year, month),
+                                                       ("CPI", "Interest rate"), sequential.Sunsetdark, max_points=700),
+                         ("rollingplots", countries)),
+        "heatmap": (("heatmap", countries, year, month),
+                    lambda: makeHeatmap(getCrossCorrelation("CPI", countries, (year, month), 12), "CPI"), None),
+    }
+
+
+def streamlitPath(build) -> str:
+    proto = PlotlyChart()
+    marshall(proto, build(), False, "streamlit", "streamlit")
+    return proto.figure.spec
+
+
+def decoded(obj):
+    # typed arrays back to lists, NaN as null like in plain JSON
+    if isinstance(obj, dict) and "bdata" in obj:
+        values = np.frombuffer(base64.b64decode(obj["bdata"]), dtype=np.dtype(obj["dtype"]).newbyteorder("<"))
+        if "shape" in obj:
+            values = values.reshape([int(i) for i in obj["shape"].split(",")])
+        return json.loads(json.dumps(np.where(np.isnan(values), None, values).tolist()
+                                     if values.dtype.kind == "f" else values.tolist()))
+    if isinstance(obj, dict):
+        return {key: decoded(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [decoded(i) for i in obj]
+    return obj
+
+
+def normalized(obj):
+    # both encoders write the same dates with a different number of fractional digits
+    if isinstance(obj, dict):
+        return {key: normalized(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [normalized(i) for i in obj]
+    if isinstance(obj, str) and DATE.match(obj):
+        return np.datetime64(obj)
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=12)
+    args = parser.parse_args()
+
+    periods = getStore().periods()[-args.reruns:][::-1]
+    # warm the data caches and figure templates so only figures and serialization are compared
+    for build in (i[1] for i in charts(*periods[0], DEFAULT_COUNTRIES).values()):
+        build()
+
+    old_ms, old_bytes, new_ms, new_bytes = [], [], [], []
+    for year, month in periods:
+        selection = charts(year, month, DEFAULT_COUNTRIES)
+        start = time.perf_counter()
+        old = {name: streamlitPath(build) for name, (_, build, _) in selection.items()}
+        old_ms.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        new = {name: getFigurePayload(key, build, data_key) for name, (key, build, data_key) in selection.items()}
+        new_ms.append(time.perf_counter() - start)
+        old_bytes.append(sum(len(i) for i in old.values()))
+        new_bytes.append(sum(len(i) for i in new.values()))
+        for name in selection:
+            assert normalized(json.loads(old[name])) == normalized(json.loads(new[name])), f"{name} differs"
+
+    proto = PlotlyChart()
+    marshall(proto, charts(*periods[0], DEFAULT_COUNTRIES)["scatterplot"][1](), False, "streamlit", "streamlit")
+    assert json.loads(proto.figure.config) == json.loads(CHART_CONFIG) and proto.theme == "streamlit"
+
+    reruns = len(periods)
+    print(f"{reruns} reruns of {len(selection)} charts stepping back one month, {ENGINE} encoder")
+    print(f"{'':>18} {'ms per rerun':>13} {'kB per rerun':>13}")
+    print(f"{'st.plotly_chart':>18} {np.mean(old_ms) * 1000:>13.1f} {np.mean(old_bytes) / 1e3:>13.1f}")
+    print(f"{'cached payloads':>18} {np.mean(new_ms) * 1000:>13.1f} {np.mean(new_bytes) / 1e3:>13.1f}")
+    print(f"{'saved':>18} {(np.mean(old_ms) - np.mean(new_ms)) * 1000:>13.1f} "
+          f"{(np.mean(old_bytes) - np.mean(new_bytes)) / 1e3:>13.1f}")
+
+    start = time.perf_counter()
+    for year, month in periods:
+        for name, (key, build, data_key) in charts(year, month, DEFAULT_COUNTRIES).items():
+            getFigurePayload(key, build, data_key)
+    print(f"revisiting the same months: {(time.perf_counter() - start) / reruns * 1000:.2f} ms per rerun")
+    print("payloads decode to the same figures as st.plotly_chart sends")
+
+    typed = {name: figurePayload(build(), typed_arrays=True) for name, (_, build, _) in selection.items()}
+    for name, payload in typed.items():
+        assert decoded(json.loads(payload)) == json.loads(new[name]), f"{name} differs with typed arrays"
+    print(f"with FM_TYPED_ARRAYS=1 (plotly.js 2.28 or later): {sum(len(i) for i in typed.values()) / 1e3:.1f} kB per rerun "
+          "before caching, same figures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+'''
+Time per-chart build latency with and without the figure template cache
+
+    python -m benchmarks.figure_templates
+'''
+import json
+import time
+import plotly.express as px
+
+from src.charts import makeChoropleth, makeScatterplot, makeVerticalLineplots, figure_templates
+from src.data import getMonth, getCountries
+
+COUNTRIES = ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")
+MONTHS = [(2008, month) for month in range(1, 13)]
+
+
+def charts():
+    return {
+        "choropleth": lambda year, month: makeChoropleth(
+            getMonth(year, month), -1, 50, "CPI", "sunset", "CPI (%)",
+            "<b>Consumer Price Index Change</b>", "Source: BIS"),
+        "scatterplot": lambda year, month: makeScatterplot(
+            getMonth(year, month, COUNTRIES), ("CPI", "InterestRate")),
+        "vertical lineplots": lambda year, month: makeVerticalLineplots(
+            getCountries(COUNTRIES), ("CPI", "InterestRate"), COUNTRIES, (year, month),
+            ("<b>CPI over Time</b>", "<b>Interest Rate over Time</b>"), px.colors.sequential.Sunsetdark),
+    }
+
+
+def timeMonths(build) -> float:
+    start = time.perf_counter()
+    for year, month in MONTHS:
+        build(year, month)
+    return (time.perf_counter() - start) / len(MONTHS)
+
+
+def main():
+    for build in charts().values():
+        build(*MONTHS[0])
+    print(f"{'chart':>20} {'full build (ms)':>16} {'from template (ms)':>19} {'speedup':>8}")
+    for name, build in charts().items():
+        figure_templates.clear()
+        full = []
+        for year, month in MONTHS:
+            full.append(json.loads(build(year, month).to_json()))
+            figure_templates.clear()
+        cold = timeMonths(lambda year, month: (figure_templates.clear(), build(year, month)))
+        build(*MONTHS[0])
+        for (year, month), expected in zip(MONTHS, full):
+            assert json.loads(build(year, month).to_json()) == expected, f"{name} differs for {year}-{month}"
+        warm = timeMonths(build)
+        print(f"{name:>20} {cold * 1000:>16.1f} {warm * 1000:>19.1f} {cold / warm:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+Compare the vectorised hover text formatter against the original row-wise apply
+
+    python -m benchmarks.hover_text
+'''
+import time
+import numpy as np
+import pandas as pd
+from typing import Callable
+
+from src.preprocessing import defineText, formatText
+from src.utils import countries_cpi_ir_data
+
+
+def legacyDefineText(df: pd.DataFrame, indicators) -> pd.DataFrame:
+    '''
+    Row-wise implementation defineText used before vectorisation
+    '''
+    df = df.copy()
+    for indicator in indicators:
+        df[f"text_{indicator}"] = df.apply(lambda row: f"{row['name']}<br>{row[indicator]: .2f}%", axis=1)
+    return df
+
+
+def timeit(func: Callable, repeat: int=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def upscale(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    '''
+    Repeat the dataset with perturbed values to mimic a larger, e.g. daily, dataset
+    '''
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(factor):
+        frame = df.copy()
+        frame["CPI"] = frame["CPI"] + rng.normal(0, 0.5, len(frame))
+        frame["InterestRate"] = frame["InterestRate"] + rng.choice([0, 0.25, 0.5], len(frame))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    indicators = ("InterestRate", "CPI")
+    base = pd.read_csv(countries_cpi_ir_data).drop(columns=["text_InterestRate", "text_CPI"])
+    print(f"{'rows':>10} {'apply (s)':>12} {'vectorised (s)':>15} {'speedup':>9}")
+    for factor in (1, 4, 16):
+        df = upscale(base, factor) if factor > 1 else base
+        legacy = legacyDefineText(df, indicators)
+        vectorised = defineText(df, indicators)
+        for indicator in indicators:
+            column = f"text_{indicator}"
+            assert legacy[column].equals(vectorised[column]), f"{column} differs"
+        single = defineText(df, "CPI")
+        assert single["text_CPI"].equals(legacy["text_CPI"]), "single indicator path differs"
+
+        apply_time = timeit(lambda: legacyDefineText(df, indicators), repeat=1)
+        vector_time = timeit(lambda: defineText(df, indicators))
+        print(f"{len(df):>10} {apply_time:>12.3f} {vector_time:>15.4f} {apply_time / vector_time:>8.0f}x")
+
+    ir = pd.DataFrame({"name": base["name"], "interest rate": base["InterestRate"]})
+    legacy = ir.apply(lambda row: f"{row['name']}<br>{row['interest rate']}%", axis=1)
+    assert legacy.equals(formatText(ir["name"], ir["interest rate"], spec="")), "formatIRData text differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+Compare the ISO code table against the original json replace and name merge
+
+    python -m benchmarks.iso_codes
+
+The daily BIS policy rates are melted as in formatIRData, with the euro area
+rate expanded to its members, and the monthly ones are streamed into the
+same long format; their ISO2 codes are converted to ISO3 codes and country
+names both ways and the outputs must match. Loading the table is timed
+separately, it happens once per process.
+'''
+import json
+import time
+import pandas as pd
+from typing import Callable
+
+from src.bisreader import readLong
+from src.isocodes import CodeTable
+from src.preprocessing import getInterestRates, reformatEU, _namedRows
+from src.utils import ir_path, ir_daily_path, iso_to_name_path, eurozone_path
+
+ISO_CONVERSIONS_JSON = "./data/iso_conversions.json"
+
+
+def monthlyRates() -> pd.DataFrame:
+    df = readLong(ir_path, date_range=("1999-01", "2022-03"), frequency="M", dtype="float64")
+    return pd.DataFrame({"date": df["period"], "ISO3": df["Reference area"].astype(str).str[:2],
+                         "interest rate": df["value"]})
+
+
+def dailyRates() -> pd.DataFrame:
+    wide = reformatEU(getInterestRates("1999-01-01", ir_daily_path, ISO_CONVERSIONS_JSON, iso_to_name_path),
+                      eurozone_path)
+    return pd.melt(wide, id_vars=["date"], var_name="ISO3", value_name="interest rate")
+
+
+def legacyNames(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    json.load, DataFrame.replace and merge of formatIRData before the code table
+    '''
+    with open(ISO_CONVERSIONS_JSON) as json_file:
+        conversions = json.load(json_file)
+    df = df.replace(conversions)
+    return df.merge(pd.read_csv(iso_to_name_path, encoding="latin1"))
+
+
+def tableNames(df: pd.DataFrame, table: CodeTable) -> pd.DataFrame:
+    df = df.assign(ISO3=table.translate(df["ISO3"], "ISO2", "ISO3"))
+    df["name"] = table.translate(df["ISO3"], "ISO3", "name", keep=False)
+    return _namedRows(df)
+
+
+def timeit(func: Callable, repeat: int=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    load = lambda: CodeTable.fromFiles(ISO_CONVERSIONS_JSON, iso_to_name_path)
+    table = load()
+    print(f"code table: {len(table)} areas, loaded in {timeit(load) * 1000:.1f} ms")
+    print(f"{'data':>16} {'rows':>9} {'areas':>6} {'replace+merge (ms)':>19} {'code table (ms)':>16} {'speedup':>8}")
+    for name, read in (("monthly WS_CBPOL", monthlyRates), ("daily WS_CBPOL", dailyRates)):
+        df = read()
+        legacy, coded = legacyNames(df), tableNames(df, table)
+        pd.testing.assert_frame_equal(legacy, coded[legacy.columns])
+        legacy_time, table_time = timeit(lambda: legacyNames(df)), timeit(lambda: tableNames(df, table))
+        print(f"{name:>16} {len(df):>9,} {df['ISO3'].nunique():>6} {legacy_time * 1000:>19.1f} "
+              f"{table_time * 1000:>16.1f} {legacy_time / table_time:>7.1f}x")
+    print("ISO3 codes and names match")
+
+
+if __name__ == "__main__":
+    main()
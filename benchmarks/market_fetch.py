@@ -0,0 +1,118 @@
+'''
+Fetch the bundled symbol universes from a local stand-in chart API, serially and concurrently
+
+    python -m benchmarks.market_fetch [--latency 0.03] [--errors 0.05] [--start 2015-01-01]
+
+The stand-in serves deterministic random-walk bars in the Yahoo chart format
+after a fixed delay per request and answers a share of requests with 503, so
+retries are exercised. Stored bars must equal the served ones, and a refresh
+a week later must only pull the new bars.
+'''
+import json
+import zlib
+import asyncio
+import argparse
+import tempfile
+import threading
+import urllib.parse
+import numpy as np
+import pandas as pd
+
+from src.market import ChartProvider, refresh, universeSymbols
+from src.ohlc import OHLCStore, FIELDS
+
+FIRST_END, SECOND_END = "2022-06-01", "2022-06-08"
+
+
+def syntheticBars(symbol: str, start: np.datetime64, end: np.datetime64) -> pd.DataFrame:
+    '''
+    Bars of a symbol from start up to but excluding end, the same for every request
+    '''
+    days = np.arange(np.datetime64("2000-01-01"), np.datetime64("2030-01-01"))
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+    spread = close * rng.uniform(0, 0.02, len(days))
+    bars = pd.DataFrame({"date": days, "open": close - spread / 2, "high": close + spread,
+                         "low": close - spread, "close": close, "volume": rng.integers(1e5, 1e7, len(days)).astype(float)})
+    if not symbol.endswith("-USD"):
+        # only crypto trades at weekends
+        bars = bars[(days.astype("int64") + 3) % 7 < 5]
+    return bars[(bars.date >= start) & (bars.date < end)].reset_index(drop=True)
+
+
+class StandInServer:
+    '''
+    Chart API stand-in on localhost, run in a thread with its own event loop
+    '''
+    def __init__(self, latency: float, errors: float):
+        self.latency = latency
+        self.errors = errors
+        self.requests = 0
+        self.rng = np.random.default_rng(0)
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, "127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/chart"
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                target = urllib.parse.urlsplit(request.split(b" ")[1].decode())
+                query = dict(urllib.parse.parse_qsl(target.query))
+                symbol = urllib.parse.unquote(target.path.rsplit("/", 1)[1])
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                if self.rng.random() < self.errors:
+                    status, body = "503 Service Unavailable", b"try again"
+                else:
+                    days = [np.datetime64(int(query[i]), "s").astype("datetime64[D]") for i in ("period1", "period2")]
+                    bars = syntheticBars(symbol, *days)
+                    # sessions open at 14:30 UTC, the offset moves them to the exchange date
+                    timestamps = bars.date.to_numpy().astype("datetime64[s]").astype("int64") + 14 * 3600 + 1800
+                    status, body = "200 OK", json.dumps({"chart": {"error": None, "result": [{
+                        "meta": {"symbol": symbol, "gmtoffset": -14400},
+                        "timestamp": timestamps.tolist(),
+                        "indicators": {"quote": [{field: bars[field].tolist() for field in FIELDS}]}}]}}).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+def check(store: OHLCStore, symbols: list, start: str, end: str) -> None:
+    for symbol in symbols:
+        expected = syntheticBars(symbol, np.datetime64(start), np.datetime64(end))
+        pd.testing.assert_frame_equal(store.read(symbol), expected, check_dtype=False, obj=symbol)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.03, help="seconds per request")
+    parser.add_argument("--errors", type=float, default=0.05, help="share of requests answered with 503")
+    parser.add_argument("--start", default="2015-01-01")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = StandInServer(args.latency, args.errors)
+    symbols = list(universeSymbols())
+    print(f"{len(symbols)} symbols, {args.latency * 1000:.0f} ms per request, {args.errors:.0%} answered with 503")
+    print(f"{'run':>22} {'requests':>9} {'bars':>8} {'failed':>7} {'time (s)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = (("serial", f"{tmp}/serial", 1, FIRST_END),
+                ("concurrent", f"{tmp}/concurrent", args.concurrency, FIRST_END),
+                ("refresh a week later", f"{tmp}/concurrent", args.concurrency, SECOND_END))
+        for label, path, concurrency, end in runs:
+            requests = server.requests
+            summary = refresh(None, path, ChartProvider(server.url, concurrency), args.start, end,
+                              concurrency=concurrency, backoff=0.05)
+            print(f"{label:>22} {server.requests - requests:>9} {summary['bars']:>8} "
+                  f"{len(summary['failed']):>7} {summary['seconds']:>9.2f}")
+            assert not summary["failed"], summary["failed"]
+        check(OHLCStore(f"{tmp}/serial"), symbols, args.start, FIRST_END)
+        check(OHLCStore(f"{tmp}/concurrent"), symbols, args.start, SECOND_END)
+    print("stored bars match the served ones")
+
+
+if __name__ == "__main__":
+    main()
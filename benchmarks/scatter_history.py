@@ -0,0 +1,66 @@
+'''
+Compare browsing the CPI vs interest rate scatterplot month by month with the WebGL history figure
+
+    python -m benchmarks.scatter_history [--trail 6]
+
+Without the history mode every month shown is a rerun building and sending
+one cross-section figure; the history figure is built and sent once and
+the browser steps through its frames. The frames must hold the same
+points as the per-month figures.
+'''
+import time
+import argparse
+import numpy as np
+
+from src.charts import makeScatterplot, figure_templates
+from src.data import getStore
+
+COLUMNS = ["Country", "year", "month", "CPI", "InterestRate"]
+INDICATORS = ("CPI", "InterestRate")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trail", type=int, default=6, help="earlier months drawn behind every country")
+    args = parser.parse_args()
+
+    store = getStore()
+    df = store.toFrame(COLUMNS)
+    periods = store.periods()
+
+    figure_templates.clear()
+    start = time.perf_counter()
+    sizes = []
+    monthly = {}
+    for year, month in periods:
+        fig = makeScatterplot(store.getMonth(year, month, columns=COLUMNS), INDICATORS)
+        sizes.append(len(fig.to_json()))
+        monthly[f"{year}-{month:02d}"] = fig
+    per_month = time.perf_counter() - start
+
+    start = time.perf_counter()
+    history = makeScatterplot(df, INDICATORS, history=True, trail=args.trail)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    payload = len(history.to_json())
+    serialize = time.perf_counter() - start
+
+    countries = list(history.data[2].customdata)
+    for frame in history.frames:
+        expected = monthly[frame.name].data[0]
+        rows = [countries.index(i) for i in expected.text]
+        x, y = np.asarray(frame.data[1].x, dtype=float), np.asarray(frame.data[1].y, dtype=float)
+        np.testing.assert_allclose(x[rows], np.asarray(expected.x, dtype=float), equal_nan=True, err_msg=frame.name)
+        np.testing.assert_allclose(y[rows], np.asarray(expected.y, dtype=float), equal_nan=True, err_msg=frame.name)
+        assert np.isnan(np.delete(x, rows)).all(), frame.name
+
+    points = np.isfinite(np.asarray(history.data[0].x, dtype=float)).sum()
+    print(f"{len(countries)} countries x {len(periods)} months, {points} points in the history trace")
+    print(f"per-month figures: {per_month / len(periods) * 1000:.1f} ms and {np.mean(sizes) / 1e3:.0f} kB per rerun, "
+          f"{per_month:.2f} s and {sum(sizes) / 1e6:.1f} MB to step through all months")
+    print(f"history figure: built in {build:.2f} s, serialized in {serialize:.2f} s, {payload / 1e6:.1f} MB sent once")
+    print("frames match the per-month cross-sections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+Time cold starts of the dashboard in fresh interpreters, with and without the prebuilt default view
+
+    python -m benchmarks.startup [--runs 5]
+
+Every run imports streamlit as the server would and executes financial-markets.py
+once without a server. Reported are the import time of the script, the time
+from the start of the script to its first chart and the whole first run, as
+recorded by src.startup, plus the import time of single modules.
+'''
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from src.startup import APP_PATH, prebuild
+
+SPANS = ("startup.imports", "startup.first chart", "script run")
+MODULES = ("plotly.express", "plotly.subplots", "plotly.colors", "src.data", "src.charts", "src.startup")
+RUN = "import streamlit, runpy; runpy.run_path({!r})"
+IMPORT = ("import time, streamlit; start = time.perf_counter(); import {}; "
+          "print(time.perf_counter() - start)")
+
+
+def coldRun(fast_start: bool) -> dict:
+    '''
+    Run the app once in a new interpreter and return its startup spans in milliseconds
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "timing.json")
+        env = dict(os.environ, FM_TIMING="1", FM_TIMING_EXPORT=path, FM_FAST_START=str(int(fast_start)))
+        subprocess.run([sys.executable, "-c", RUN.format(APP_PATH)], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(path) as json_file:
+            spans = {row["span"]: row["total_ms"] for row in json.load(json_file)["spans"]}
+    return {name: spans[name] for name in SPANS}
+
+
+def importTime(module: str) -> float:
+    output = subprocess.run([sys.executable, "-c", IMPORT.format(module)], check=True,
+                            capture_output=True, text=True).stdout
+    return float(output) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':>16} {'import after streamlit (ms)':>28}")
+    for module in MODULES:
+        print(f"{module:>16} {np.median([importTime(module) for _ in range(args.runs)]):>28.1f}")
+
+    print(f"\nprebuilt the default view in {prebuild():.2f} s\n")
+    print(f"{'':>10}" + "".join(f"{name + ' (ms)':>26}" for name in SPANS))
+    for label, fast_start in (("build", False), ("prebuilt", True)):
+        runs = [coldRun(fast_start) for _ in range(args.runs)]
+        print(f"{label:>10}" + "".join(f"{np.median([run[name] for run in runs]):>26.0f}" for name in SPANS))
+
+
+if __name__ == "__main__":
+    main()
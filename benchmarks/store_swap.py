@@ -0,0 +1,93 @@
+'''
+Check that readers in other processes always see a whole store generation while it is rewritten
+
+    python -m benchmarks.store_swap [--swaps 40] [--readers 2]
+
+Two versions of the dataset, differing in row count and values, are written
+alternately to a scratch store (in /dev/shm when available) while reader
+processes keep opening it and checking that every snapshot is exactly one of
+them. A store opened before all swaps must still read its original data.
+Also compares attaching to the store with parsing the csv.
+'''
+import os
+import time
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+from src.data import getLocalStore
+from src.store import ColumnarStore, writeStore, generations
+from src.utils import countries_cpi_ir_data
+
+COLUMNS = ["year", "month", "ISO3", "InterestRate", "CPI", "name", "Country"]
+
+
+def fingerprint(store: ColumnarStore) -> tuple:
+    return store.rows, float(np.nansum(store.toFrame(["CPI"])["CPI"].to_numpy("float64")))
+
+
+def reader(store_path: str, expected: list, stop, results) -> None:
+    reads, bad, attach = 0, 0, []
+    while not stop.is_set():
+        start = time.perf_counter()
+        store = ColumnarStore(store_path)
+        attach.append(time.perf_counter() - start)
+        reads += 1
+        bad += fingerprint(store) not in expected
+    results.put((reads, bad, float(np.median(attach)) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--swaps", type=int, default=40)
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+
+    first = getLocalStore().toFrame(COLUMNS)
+    last = first.year.astype("int64") * 12 + first.month
+    # the second version has one month less and shifted values
+    second = first[last < last.max()].assign(CPI=lambda df: df.CPI + 1)
+    shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(dir=shm) as tmp:
+        store_path = os.path.join(tmp, "swap.store")
+        writeStore(first, store_path)
+        opened = ColumnarStore(store_path)
+        expected = [fingerprint(opened)]
+        writeStore(second, store_path)
+        expected.append(fingerprint(ColumnarStore(store_path)))
+
+        stop, results = multiprocessing.Event(), multiprocessing.Queue()
+        readers = [multiprocessing.Process(target=reader, args=(store_path, expected, stop, results))
+                   for _ in range(args.readers)]
+        for process in readers:
+            process.start()
+        swaps = []
+        for i in range(args.swaps):
+            start = time.perf_counter()
+            writeStore(first if i % 2 else second, store_path)
+            swaps.append(time.perf_counter() - start)
+        stop.set()
+        outcomes = [results.get() for _ in readers]
+        for process in readers:
+            process.join()
+
+        reads, bad = sum(i[0] for i in outcomes), sum(i[1] for i in outcomes)
+        print(f"{args.swaps} swaps in {'/dev/shm' if shm else 'a temporary directory'}, "
+              f"write and swap p50 {np.median(swaps) * 1000:.1f} ms, "
+              f"{len(generations(store_path))} generations left on disk")
+        print(f"{reads} snapshots read by {args.readers} processes, {bad} inconsistent")
+        assert bad == 0, "a reader saw a mix of generations"
+        assert fingerprint(opened) == expected[0], "a store opened before the swaps changed"
+        print("a store opened before all swaps still reads its own generation")
+
+        start = time.perf_counter()
+        pd.read_csv(countries_cpi_ir_data)
+        parse = time.perf_counter() - start
+        attach = np.median([i[2] for i in outcomes])
+        print(f"attach to the store p50 {attach:.2f} ms, pd.read_csv of the csv {parse * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+'''
+Time, memory and payload size of every stage of the preprocessing and chart pipeline
+
+    python -m benchmarks.suite                                  # all scenarios
+    python -m benchmarks.suite --scenarios bundled daily        # a subset
+    python -m benchmarks.suite --baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite --profile defineText             # cProfile one stage
+
+Scenarios run offline on the bundled data/ files:
+    bundled    monthly CPI and interest rates, 1999-01 to 2022-03
+    history    the same files from 1950-01 on
+    countries  synthetic files with 10 times the countries
+    daily      daily policy rates
+
+Every stage is run once under tracemalloc for its peak memory and output
+size, then timed without it. Results are written as JSON; with --baseline
+stages slower or hungrier than the tolerance are reported and the exit code is 1.
+'''
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime as dt
+import tempfile
+import tracemalloc
+import cProfile
+import pstats
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.express as px
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.preprocessing import getCombinedCPIInterestRates, formatIRData, defineText
+from src.charts import makeChoropleth, makeScatterplot, makeVerticalLineplots, figure_templates
+from src.grouped import CountryGroups
+from src.policyrates import PolicyRates
+from src.data import sizeOf, getCountries
+from src.utils import (cpi_path, ir_path, ir_daily_path, iso_conversions_path, eurozone_path)
+from benchmarks.synthetic import writeUpscaledCountries
+
+SCENARIOS = ("bundled", "history", "countries", "daily")
+COUNTRIES = ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")
+INDICATORS = ("InterestRate", "CPI")
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results", "latest.json")
+# differences below this are noise whatever the ratio
+MIN_SECONDS = 0.002
+MIN_BYTES = 2**20
+
+Stage = Tuple[str, Callable[[], Any]]
+
+
+def payloadBytes(result: Any) -> int:
+    '''
+    Size of a stage output: JSON length for figures, memory for everything else
+    '''
+    if isinstance(result, plotly.basedatatypes.BaseFigure):
+        return len(result.to_json())
+    if hasattr(result, "nbytes") and not isinstance(result, (pd.DataFrame, pd.Series)):
+        return int(result.nbytes)
+    return sizeOf(result)
+
+
+def chartFrame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Add the "Country" and "date" columns the chart builders expect
+    '''
+    return df.assign(Country=df["name"],
+                     date=pd.to_datetime(pd.DataFrame({"year": df.year, "month": df.month, "day": 1})))
+
+
+def chartStages(df: pd.DataFrame, countries: Tuple[str, ...]) -> Iterator[Stage]:
+    '''
+    Full (untemplated) builds of every chart, on the last month and the given countries
+    '''
+    df = chartFrame(df)
+    last = df[(df.year == df.year.max())]
+    last = last[last.month == last.month.max()]
+    year, month = int(last.year.iloc[0]), int(last.month.iloc[0])
+    trend = df[df.Country.isin(countries)]
+
+    def untemplated(build):
+        def run():
+            figure_templates.clear()
+            return build()
+        return run
+
+    yield "makeChoropleth", untemplated(lambda: makeChoropleth(
+        last, -1, 50, "CPI", "sunset", "CPI (%)", "<b>Consumer Price Index Change</b>", "Source: BIS"))
+    yield "makeChoropleth(animate)", untemplated(lambda: makeChoropleth(
+        df, -1, 50, "CPI", "sunset", "CPI (%)", "<b>Consumer Price Index Change</b>", "Source: BIS",
+        animate=True))
+    yield "makeScatterplot", untemplated(lambda: makeScatterplot(
+        last[last.Country.isin(countries)], ("CPI", "InterestRate")))
+    yield "CountryGroups.fromFrame", lambda: CountryGroups.fromFrame(trend)
+    groups = CountryGroups.fromFrame(trend)
+    yield "makeVerticalLineplots", untemplated(lambda: makeVerticalLineplots(
+        groups, ("CPI", "InterestRate"), countries, (year, month),
+        ("<b>CPI over Time</b>", "<b>Interest Rate over Time</b>"), px.colors.sequential.Sunsetdark))
+
+
+def pipelineStages(paths: Dict[str, str], date_range: Tuple[str, str],
+                   countries: Tuple[str, ...]) -> Iterator[Stage]:
+    combine = lambda: getCombinedCPIInterestRates.__wrapped__(date_range=date_range, **paths)
+    yield "getCombinedCPIInterestRates", combine
+    combined = combine()
+    yield "defineText", lambda: defineText(combined, INDICATORS)
+    yield from chartStages(defineText(combined, INDICATORS), countries)
+
+
+def scenarioStages(name: str, work_dir: str) -> Iterator[Stage]:
+    '''
+    Stages of a scenario, built lazily so inputs are prepared outside the measurements
+    '''
+    bundled = {"cpi_path": cpi_path, "ir_path": ir_path,
+               "iso_conversions_path": iso_conversions_path, "eurozone_path": eurozone_path}
+    if name == "bundled":
+        yield from pipelineStages(bundled, ("1999-01", "2022-03"), COUNTRIES)
+    elif name == "history":
+        yield from pipelineStages(bundled, ("1950-01", "2022-03"), COUNTRIES)
+    elif name == "countries":
+        paths = writeUpscaledCountries(os.path.join(work_dir, "countries"), 10)
+        names = pd.read_csv(paths["iso_conversions_path"], keep_default_na=False).name
+        countries = COUNTRIES + tuple(f"{country} {copy}" for copy in range(1, 10) for country in COUNTRIES
+                                      if f"{country} {copy}" in set(names))
+        yield from pipelineStages(paths, ("1999-01", "2022-03"), countries)
+    elif name == "daily":
+        yield "formatIRData", lambda: formatIRData.__wrapped__(
+            "1999-01-01", ir_daily_path, "./data/iso_conversions.json", "./data/iso_to_name.csv", eurozone_path)
+        load = lambda: PolicyRates.fromBIS(ir_daily_path, iso_conversions_path, eurozone_path)
+        yield "PolicyRates.fromBIS", load
+        rates = load()
+        resample = lambda: rates.resample(rates.countries(), freq="D", date_range=("1999-01-01", "2022-03-31"))
+        yield "PolicyRates.resample(D)", resample
+        daily = resample()
+        yield "CountryGroups.fromFrame", lambda: CountryGroups.fromFrame(daily)
+        trends = {"CPI": getCountries(COUNTRIES, grouped=True), "InterestRate": CountryGroups.fromFrame(daily)}
+        for max_points in (None, 700):
+            def build(max_points=max_points):
+                figure_templates.clear()
+                return makeVerticalLineplots(trends, ("CPI", "InterestRate"), COUNTRIES, (2008, 9),
+                                             ("<b>CPI over Time</b>", "<b>Interest Rate over Time</b>"),
+                                             px.colors.sequential.Sunsetdark, max_points=max_points)
+            yield f"makeVerticalLineplots(max_points={max_points})", build
+    else:
+        raise ValueError(f"scenario must be one of {SCENARIOS}")
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    '''
+    Best wall time of repeat runs, then peak traced memory and output size of one more run
+
+    The timed runs go first so lazy imports and first-call setup do not
+    count towards the peak memory.
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    measurement = {"seconds": min(times),
+                   "median_seconds": float(np.median(times)),
+                   "peak_bytes": int(peak),
+                   "payload_bytes": int(payloadBytes(result))}
+    if isinstance(result, (pd.DataFrame, CountryGroups)):
+        measurement["rows"] = len(result)
+    return measurement
+
+
+def profile(func: Callable[[], Any], lines: int=25) -> None:
+    profiler = cProfile.Profile()
+    profiler.runcall(func)
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(lines)
+
+
+def environment() -> Dict[str, str]:
+    return {"timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plotly": plotly.__version__}
+
+
+def run(scenarios: List[str], repeat: int, profile_stage: Optional[str]=None) -> List[Dict[str, Any]]:
+    results = []
+    print(f"{'scenario':>10} {'stage':>38} {'time (ms)':>10} {'peak (MB)':>10} {'payload (KB)':>13}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scenario in scenarios:
+            for stage, func in scenarioStages(scenario, work_dir):
+                if profile_stage is not None:
+                    if stage == profile_stage:
+                        print(f"\n{scenario} / {stage}")
+                        profile(func)
+                    continue
+                result = {"scenario": scenario, "stage": stage, **measure(func, repeat)}
+                results.append(result)
+                print(f"{scenario:>10} {stage:>38} {result['seconds'] * 1000:>10.1f} "
+                      f"{result['peak_bytes'] / 2**20:>10.1f} {result['payload_bytes'] / 2**10:>13.1f}")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    '''
+    Compare results with a saved run
+
+    Args:
+        results (List[Dict]): measurements of this run
+        baseline (Dict): contents of a results file written by this suite
+        tolerance (float): allowed relative increase, e.g. 0.25 for 25%
+    Returns:
+        List[str]: descriptions of the regressions
+    '''
+    previous = {(i["scenario"], i["stage"]): i for i in baseline["results"]}
+    regressions = []
+    print(f"\n{'scenario':>10} {'stage':>38} {'time':>8} {'peak':>8} {'payload':>8}")
+    for result in results:
+        old = previous.get((result["scenario"], result["stage"]))
+        if old is None:
+            continue
+        ratios = []
+        for key, minimum in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES), ("payload_bytes", MIN_BYTES)):
+            ratio = result[key] / old[key] if old[key] else 1.0
+            ratios.append(ratio)
+            if ratio > 1 + tolerance and result[key] - old[key] > minimum:
+                regressions.append(f"{result['scenario']} / {result['stage']}: {key} {old[key]:.4g} -> "
+                                   f"{result[key]:.4g} ({ratio:.2f}x)")
+        print(f"{result['scenario']:>10} {result['stage']:>38} " + " ".join(f"{i:>7.2f}x" for i in ratios))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing and chart pipeline")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the best is reported")
+    parser.add_argument("--out", default=RESULTS_PATH, help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase")
+    parser.add_argument("--profile", metavar="STAGE", help="print a cProfile report of a stage instead")
+    args = parser.parse_args()
+
+    results = run(args.scenarios, args.repeat, args.profile)
+    if args.profile is not None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as json_file:
+        json.dump({"environment": environment(), "results": results}, json_file, indent=1)
+    print(f"\nResults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            regressions = compare(results, json.load(json_file), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
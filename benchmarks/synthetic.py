@@ -0,0 +1,79 @@
+'''
+Write upscaled copies of the bundled BIS files for benchmarking
+
+Every country series is repeated under new reference area codes with
+slightly perturbed values, and the ISO conversion table is extended to
+match, so the regular pipeline runs unchanged on factor times the countries.
+'''
+import os
+import csv
+import shutil
+import string
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator
+
+from src.bisreader import readHeader
+from src.utils import cpi_path, ir_path, iso_conversions_path, eurozone_path
+
+
+def _codes(taken: set) -> Iterator[str]:
+    # lowercase codes never clash with the upper case ISO2 codes used by BIS
+    for first, second in itertools.product(string.ascii_lowercase, repeat=2):
+        if first + second not in taken:
+            yield first + second
+
+
+def _perturb(values: list, shift: float) -> list:
+    array = np.array(values, dtype=object)
+    array[array == ""] = "nan"
+    array = array.astype("float64") + shift
+    return ["" if np.isnan(i) else f"{i:.4g}" for i in array]
+
+
+def _upscaleFile(source: str, target: str, copies: Dict[str, list]) -> None:
+    metadata, _ = readHeader(source)
+    with open(source, newline="", encoding="utf-8-sig") as source_file, \
+         open(target, "w", newline="", encoding="utf-8") as target_file:
+        reader, writer = csv.reader(source_file), csv.writer(target_file)
+        writer.writerow(next(reader))
+        for row in reader:
+            writer.writerow(row)
+            for copy, code in enumerate(copies.get(row[1][:2], ()), start=1):
+                writer.writerow([row[0], code + row[1][2:], *row[2:len(metadata)],
+                                 *_perturb(row[len(metadata):], 0.01 * copy)])
+
+
+def writeUpscaledCountries(out_dir: str, factor: int) -> Dict[str, str]:
+    '''
+    Write CPI, interest rate and ISO files with factor times the countries
+
+    Args:
+        out_dir (str): directory the files are written to
+        factor (int): number of copies of every country, 1 keeps the originals only
+    Returns:
+        Dict[str, str]: paths keyed like the arguments of getCombinedCPIInterestRates
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    iso_conversions = pd.read_csv(iso_conversions_path, keep_default_na=False)
+    with open(ir_path, encoding="utf-8-sig") as ir_file, open(cpi_path, encoding="utf-8-sig") as cpi_file:
+        present = {row[1][:2] for row in itertools.chain(csv.reader(ir_file), csv.reader(cpi_file)) if row}
+    # only countries with data get copies, there are 676 spare codes
+    codes = _codes(set(iso_conversions.ISO2))
+    copies, rows = {}, []
+    for iso2, iso3, name in iso_conversions[["ISO2", "ISO3", "name"]].itertuples(index=False):
+        if iso2 not in present:
+            continue
+        copies[iso2] = [next(codes) for _ in range(factor - 1)]
+        rows.extend((code, f"{code}x", f"{name} {copy}") for copy, code in enumerate(copies[iso2], start=1))
+    paths = {"cpi_path": os.path.join(out_dir, os.path.basename(cpi_path)),
+             "ir_path": os.path.join(out_dir, os.path.basename(ir_path)),
+             "iso_conversions_path": os.path.join(out_dir, os.path.basename(iso_conversions_path)),
+             "eurozone_path": os.path.join(out_dir, os.path.basename(eurozone_path))}
+    _upscaleFile(cpi_path, paths["cpi_path"], copies)
+    _upscaleFile(ir_path, paths["ir_path"], copies)
+    pd.concat([iso_conversions, pd.DataFrame(rows, columns=["ISO2", "ISO3", "name"])],
+              ignore_index=True).to_csv(paths["iso_conversions_path"], index=False)
+    shutil.copy(eurozone_path, paths["eurozone_path"])
+    return paths
@@ -1,14 +1,24 @@
+from time import perf_counter
+import_start = perf_counter()
 import streamlit as st
 import pandas as pd
-import numpy as np
-import time
-import datetime as dt
-from datetime import datetime, date, time
-from src.charts import makeChoropleth, makeScatterplot, makeLineplot, addLineplot, makeVerticalLineplots
-import plotly.graph_objects as go
-import plotly.express as px
+from calendar import monthrange
+# plotly.express is not needed for its colour scales, and plotly loads graph objects on first use
+from plotly.colors import sequential
+from src.charts import makeChoropleth, makeScatterplot, makeVerticalLineplots, makeHeatmap
 
-from src.utils import countries_cpi_ir_data
+from src.data import (getStore, getMonth, getCountries, getDailyRates, getFigurePayload, getDataset, 
+  getRolling, getCrossCorrelation)
+from src.datasets import DATASETS
+from src.rolling import REAL_RATE, rollingLabel
+from src import timing, startup
+# charts are sent as cached JSON payloads, st.plotly_chart would validate and encode every figure on every rerun
+from src.serialize import plotlyChart
+
+run_start = perf_counter()
+session_timing = st.session_state.setdefault("timing", timing.SpanStats()) if timing.enabled() else None
+timing.bindSession(session_timing)
+startup.beginRun(import_start, run_start - import_start)
 
 st.set_page_config(
         page_title="Financial Markets",
@@ -18,65 +28,172 @@ st.set_page_config(
 
 st.header("Consumer Price Index (CPI) and Central Bank Interest Rates")
 select_year,select_month, select_countries = st.columns((1,1,4))
+store = getStore()
+periods = store.periods()
 
 with select_year:
   st.write("\n\n\n")
+  years = sorted({y for y, _ in periods})
   year = st.selectbox(
      'Select year',
-     range(1999, 2023))
+     years, index=len(years) - 1)
 
 with select_month:
   st.write("\n\n\n")
-  if year < 2022:
-    month = st.selectbox(
-      'Select month',
-      range(1,13))
-  else:
-    month = st.selectbox(
-      'Select month',
-      range(1,5))
+  months = [m for y, m in periods if y == year]
+  month = st.selectbox(
+    'Select month',
+    months, index=len(months) - 1)
   
-df = pd.read_csv(countries_cpi_ir_data)
-all_countries = tuple(df.Country.unique())
+all_countries = store.countries()
 
 with select_countries:
   st.write("\n\n\n")
-  countries = st.multiselect("Choose countries", all_countries, 
-    ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia"))
+  countries = st.multiselect("Choose countries", all_countries, startup.DEFAULT_COUNTRIES)
+# charts of the latest month and default countries are served prebuilt to new sessions
+default_view = startup.isDefaultView(year, month, countries)
 
 scatter_section_1, trendplots_1 = st.columns(2)
 
 with scatter_section_1:
-  scatterplot_1 = makeScatterplot(
-    df[(df.year==year) & 
-    (df.month==month) & 
-    (df.Country.isin(countries))], 
-    ("CPI", "InterestRate")
-  )
-  st.plotly_chart(scatterplot_1)
+  scatter_history = st.checkbox("Browse the whole history of all countries with a slider", value=False)
+  if scatter_history:
+    # one WebGL figure with a frame per month, moving the slider does not rerun the script
+    scatterplot_1 = getFigurePayload(("scatter history", tuple(countries)), lambda: makeScatterplot(
+      store.toFrame(["Country", "year", "month", "CPI", "InterestRate"]),
+      ("CPI", "InterestRate"), history=True, labels=countries))
+  else:
+    scatterplot_1 = startup.firstView("scatterplot", lambda: makeScatterplot(
+      getMonth(year, month, countries),
+      ("CPI", "InterestRate")
+    ), default_view, key=("scatterplot", year, month, tuple(countries)))
+  with timing.span("st.plotly_chart"):
+    plotlyChart(scatterplot_1)
+  startup.chartShown()
 
 with trendplots_1:
-  trendplots_1=makeVerticalLineplots(
-    df, indicators=("CPI", "InterestRate"), 
+  frequency = st.radio("Interest rate frequency", ("Monthly", "Weekly", "Daily"), horizontal=True)
+  trend_df = getCountries(countries, grouped=True)
+  if frequency != "Monthly":
+    first, last = periods[0], periods[-1]
+    trend_df = {"CPI": trend_df, 
+                "InterestRate": getDailyRates(countries, freq=frequency[0], 
+                  date_range=(f"{first[0]}-{first[1]:02d}-01", 
+                              f"{last[0]}-{last[1]:02d}-{monthrange(*last)[1]}"),
+                  grouped=True)}
+  trendplots_1=startup.firstView("trendplots", lambda: makeVerticalLineplots(
+    trend_df, indicators=("CPI", "InterestRate"), 
     interval=(year, month),
     countries=countries,
     subplot_titles=("<b>CPI over Time</b>", "<b>Interest Rate over Time</b>"),
-    colorscheme=px.colors.sequential.Sunsetdark)
-  st.plotly_chart(trendplots_1)
+    colorscheme=sequential.Sunsetdark,
+    max_points=700), default_view and frequency == "Monthly",
+    key=("trendplots", tuple(countries), frequency, year, month),
+    # monthly series are shorter than max_points, so the month only moves the highlight
+    data_key=("trendplots", tuple(countries), frequency) + (() if frequency == "Monthly" else (year, month)))
+  with timing.span("st.plotly_chart"):
+    plotlyChart(trendplots_1)
 
 choropleth_section_1, choropleth_section_2 = st.columns(2)
+animate_maps = st.checkbox("Browse all months on the maps with a slider", value=False)
+month_df = getMonth(year, month)
+source = 'Source: BIS: Statistics (https://www.bis.org/statistics/full_data_sets.htm)'
+choropleth_args = {
+  "InterestRate": (-1, 50, 'InterestRate', "sunset", "Interest Rate (%)", '<b>Central Bank Policy Rates</b>', source),
+  "CPI": (-1, 50, 'CPI', "sunset", "CPI (%)", '<b>Consumer Price Index Change</b>', source)}
+
+def choropleth(indicator):
+  args = choropleth_args[indicator]
+  if animate_maps:
+    return getFigurePayload(("choropleth", *args), 
+      lambda: makeChoropleth(store.toFrame(), *args, animate=True))
+  return startup.firstView(("choropleth", indicator), lambda: makeChoropleth(month_df, *args), 
+    default_view, key=("choropleth", indicator, year, month))
 
 with choropleth_section_1:
-  choropleth1=makeChoropleth(df[(df.year == year)&(df.month == month)], -1, 50,'InterestRate', "sunset", 
-              "Interest Rate (%)", '<b>Central Bank Policy Rates</b>',
-              'Source: BIS: Statistics (https://www.bis.org/statistics/full_data_sets.htm)')
+  choropleth1=choropleth('InterestRate')
 
 
-  st.plotly_chart(choropleth1, use_container_width=True)
+  with timing.span("st.plotly_chart"):
+    plotlyChart(choropleth1, use_container_width=True)
 with choropleth_section_2:
-  choropleth2=makeChoropleth(df[(df.year == year)&(df.month == month)], -1, 50,'CPI', "sunset", 
-              "CPI (%)", '<b>Consumer Price Index Change</b>',
-              'Source: BIS: Statistics (https://www.bis.org/statistics/full_data_sets.htm)')
+  choropleth2=choropleth('CPI')
+
+
+  with timing.span("st.plotly_chart"):
+    plotlyChart(choropleth2, use_container_width=True)
+
+st.header("Credit and Residential Property Prices")
+credit_names = [i for i in DATASETS if i not in ("CPI", "InterestRate")]
+select_upper, select_lower, _ = st.columns((1,1,2))
+with select_upper:
+  upper = st.selectbox("Upper plot", credit_names, index=credit_names.index("CreditGap"),
+    format_func=lambda name: DATASETS[name].title)
+with select_lower:
+  lower = st.selectbox("Lower plot", credit_names, index=credit_names.index("PropertyPrices"),
+    format_func=lambda name: DATASETS[name].title)
+if upper != lower:
+  creditplots=getFigurePayload(("creditplots", upper, lower, tuple(countries), year, month), 
+    lambda: makeVerticalLineplots(
+      {name: getDataset(name, grouped=True) for name in (upper, lower)},
+      indicators=(upper, lower),
+      interval=(year, month),
+      countries=countries,
+      subplot_titles=tuple(f"<b>{DATASETS[name].title} ({DATASETS[name].unit})</b>" for name in (upper, lower)),
+      colorscheme=sequential.Sunsetdark),
+    data_key=("creditplots", upper, lower, tuple(countries)))
+  with timing.span("st.plotly_chart"):
+    plotlyChart(creditplots, use_container_width=True)
+
+st.header("Rolling Statistics")
+select_window, select_statistic, _ = st.columns((2,2,1))
+with select_window:
+  window = st.select_slider("Window (months)", (3, 6, 12, 24, 36, 60), value=12)
+with select_statistic:
+  statistic = st.radio("Statistic", ("Mean", "Volatility", "Real rate"), horizontal=True)
+# (statistic, indicators, subplot title) of the upper and lower plot
+rolling_args = {
+  "Mean": (("mean", ("CPI",), "Rolling Mean of CPI"), 
+           ("mean", ("InterestRate",), "Rolling Mean of Interest Rate")),
+  "Volatility": (("volatility", ("CPI",), "Volatility of Monthly CPI Changes"), 
+                 ("volatility", ("InterestRate",), "Volatility of Monthly Interest Rate Changes")),
+  "Real rate": (("mean", (REAL_RATE,), "Rolling Mean of the Real Rate"), 
+                ("corr", ("CPI", "InterestRate"), "Correlation of CPI and Interest Rate"))}
+
+rolling_section, correlation_section = st.columns(2)
+with rolling_section:
+  rolling_labels = tuple(rollingLabel(name, indicators) for name, indicators, _ in rolling_args[statistic])
+  rollingplots=getFigurePayload(("rollingplots", statistic, window, tuple(countries), year, month), 
+    lambda: makeVerticalLineplots(
+      {rollingLabel(name, indicators): getRolling(name, indicators, window) 
+        for name, indicators, _ in rolling_args[statistic]},
+      indicators=rolling_labels,
+      interval=(year, month),
+      countries=countries,
+      subplot_titles=tuple(f"<b>{title}, {window} months</b>" for _, _, title in rolling_args[statistic]),
+      colorscheme=sequential.Sunsetdark,
+      max_points=700),
+    data_key=("rollingplots", statistic, window, tuple(countries)))
+  with timing.span("st.plotly_chart"):
+    plotlyChart(rollingplots)
 
+with correlation_section:
+  correlated = st.radio("Correlation between countries of", ("CPI", "InterestRate", REAL_RATE), horizontal=True)
+  # a pair needs at least 12 joint months
+  correlation_window = max(window, 12)
+  heatmap = getFigurePayload(("heatmap", correlated, tuple(countries), year, month, correlation_window), 
+    lambda: makeHeatmap(
+      getCrossCorrelation(correlated, countries, (year, month), correlation_window),
+      f"<b>{correlated}, {correlation_window} months to {year}-{month:02d}</b>"))
+  with timing.span("st.plotly_chart"):
+    plotlyChart(heatmap)
 
-  st.plotly_chart(choropleth2, use_container_width=True)
+timing.record("script run", perf_counter() - run_start)
+if timing.enabled():
+  with st.expander("Timing"):
+    for title, stats in (("This session", session_timing), ("All sessions", timing.process_stats)):
+      st.write(title)
+      st.dataframe(pd.DataFrame(stats.summary()).round(2))
+    st.download_button("Download latencies", 
+      pd.DataFrame(timing.process_stats.summary()).to_json(orient="records"), 
+      file_name="timing.json")
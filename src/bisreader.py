@@ -0,0 +1,166 @@
+import re
+import csv
+import operator
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+PERIOD = re.compile(r"\d{4}(-Q[1-4]|-\d{2}(-\d{2})?)?")
+FREQUENCIES = {"A": re.compile(r"\d{4}"),
+               "Q": re.compile(r"\d{4}-Q[1-4]"),
+               "M": re.compile(r"\d{4}-\d{2}"),
+               "D": re.compile(r"\d{4}-\d{2}-\d{2}")}
+
+# the daily csv_col exports put all 28k days on one line
+csv.field_size_limit(2**31 - 1)
+
+
+def readHeader(path: str) -> Tuple[List[str], List[str]]:
+    '''
+    Split the header of a wide BIS csv_col file into metadata and period columns
+
+    Args:
+        path (str): path to a BIS csv_col file
+    Returns:
+        Tuple[List[str], List[str]]: metadata column names and period column names
+    '''
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        header = next(csv.reader(csv_file))
+    first_period = next(i for i, column in enumerate(header) if PERIOD.fullmatch(column))
+    return header[:first_period], header[first_period:]
+
+
+def periodsToDates(periods: Iterable[str]) -> np.ndarray:
+    '''
+    Convert BIS period labels to the first day of each period
+
+    Args:
+        periods (Iterable[str]): labels such as "2022", "2022-Q1", "2022-03" or "2022-03-31"
+    Returns:
+        np.ndarray: datetime64[D] array
+    '''
+    dates = []
+    for period in periods:
+        if "-Q" in period:
+            period = f"{period[:4]}-{3 * int(period[-1]) - 2:02d}"
+        dates.append(period)
+    return np.array(dates, dtype="datetime64[D]")
+
+
+def periodBounds(period: str) -> Tuple[np.datetime64, np.datetime64]:
+    '''
+    Return the first and last day covered by a BIS period label
+    '''
+    start = periodsToDates([period])[0]
+    if FREQUENCIES["D"].fullmatch(period):
+        return start, start
+    if FREQUENCIES["M"].fullmatch(period):
+        months = 1
+    elif FREQUENCIES["Q"].fullmatch(period):
+        months = 3
+    else:
+        months = 12
+    end = (start.astype("datetime64[M]") + months).astype("datetime64[D]") - 1
+    return start, end
+
+
+def _matches(row: List[str], filters: List[Tuple[int, Union[str, Tuple[str, ...]]]]) -> bool:
+    for position, accepted in filters:
+        if isinstance(accepted, str):
+            if row[position] != accepted:
+                return False
+        elif row[position] not in accepted:
+            return False
+    return True
+
+
+def _parseValues(values: Tuple[str, ...], dtype: str) -> np.ndarray:
+    array = np.array(values, dtype=object)
+    array[array == ""] = "nan"
+    return array.astype(dtype)
+
+
+def iterSeries(path: str,
+               filters: Optional[Dict[str, Union[str, Iterable[str]]]]=None,
+               date_range: Optional[Tuple[str, str]]=None,
+               frequency: Optional[str]=None,
+               dtype: str="float32") -> Iterator[Tuple[Dict[str, str], List[str], np.ndarray]]:
+    '''
+    Stream a wide BIS csv_col file one series (row) at a time
+
+    Metadata filters are checked before any value is parsed, and only the
+    period columns inside date_range are converted, so memory is bounded by
+    a single series rather than the file.
+
+    Args:
+        path (str): path to a BIS csv_col file
+        filters (Dict[str, str or Iterable[str]]): required values of metadata columns,
+            e.g. {"Frequency": "M:Monthly"}
+        date_range (Tuple[str, str]): first and last period to keep, inclusive
+        frequency (str): keep only period columns of this frequency, one of "A", "Q", "M", "D"
+        dtype (str): dtype of the emitted values
+    Returns:
+        Iterator over (metadata, periods, values) for every matching series
+    '''
+    metadata, periods = readHeader(path)
+    pattern = FREQUENCIES[frequency] if frequency else PERIOD
+    positions = [len(metadata) + i for i, period in enumerate(periods) if pattern.fullmatch(period)]
+    if date_range is not None:
+        start, end = periodBounds(date_range[0])[0], periodBounds(date_range[1])[1]
+        dates = periodsToDates([periods[i - len(metadata)] for i in positions])
+        positions = np.array(positions, dtype=int)[(dates >= start) & (dates <= end)].tolist()
+    selected = [periods[i - len(metadata)] for i in positions]
+    if len(positions) == 1:
+        getter = lambda row: (row[positions[0]],)
+    else:
+        getter = operator.itemgetter(*positions) if positions else (lambda row: ())
+    conditions = []
+    for column, accepted in (filters or {}).items():
+        accepted = accepted if isinstance(accepted, str) else tuple(accepted)
+        conditions.append((metadata.index(column), accepted))
+
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        for row in reader:
+            if not row or not _matches(row, conditions):
+                continue
+            yield dict(zip(metadata, row)), selected, _parseValues(getter(row), dtype)
+
+
+def readLong(path: str,
+             key: str="Reference area",
+             filters: Optional[Dict[str, Union[str, Iterable[str]]]]=None,
+             date_range: Optional[Tuple[str, str]]=None,
+             frequency: Optional[str]=None,
+             dtype: str="float32",
+             dropna: bool=False) -> pd.DataFrame:
+    '''
+    Read a wide BIS csv_col file straight into long format without transposing
+
+    Args:
+        path (str): path to a BIS csv_col file
+        key (str): metadata column identifying the series
+        filters (Dict[str, str or Iterable[str]]): required values of metadata columns
+        date_range (Tuple[str, str]): first and last period to keep, inclusive
+        frequency (str): keep only period columns of this frequency, one of "A", "Q", "M", "D"
+        dtype (str): dtype of the value column
+        dropna (bool): drop missing observations
+    Returns:
+        pd.DataFrame: columns key (categorical), "period", "date" and "value", grouped by series
+    '''
+    keys, periods, values = [], None, []
+    for metadata, selected, series in iterSeries(path, filters, date_range, frequency, dtype):
+        periods = selected
+        keys.append(metadata[key])
+        values.append(series)
+    periods = periods or []
+    n_periods = len(periods)
+    df = pd.DataFrame({
+        key: pd.Categorical(np.repeat(np.array(keys, dtype=object), n_periods), categories=pd.unique(keys)),
+        "period": np.tile(np.array(periods, dtype=object), len(keys)),
+        "date": np.tile(periodsToDates(periods), len(keys)).astype("datetime64[ns]"),
+        "value": np.concatenate(values) if values else np.empty(0, dtype=dtype)})
+    if dropna:
+        df = df[df.value.notna()].reset_index(drop=True)
+    return df
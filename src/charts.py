@@ -1,12 +1,230 @@
 import plotly.graph_objects as go
 import pandas as pd
-from typing import Tuple, List, Union
-import plotly.express as px
+import numpy as np
+import threading
+from collections import OrderedDict
+from typing import Tuple, List, Union, Dict, Optional, Hashable
+from plotly.colors import sequential
 from calendar import monthrange
 from plotly.subplots import make_subplots
 
+from src.downsample import downsample
+from src.grouped import CountryGroups
+from src.schema import decimalValues
+from src.timing import timed
 
 
+class FigureTemplates:
+    '''
+    Process-wide cache of validated figure skeletons
+
+    Layouts, subplot grids, colorbars and annotations are validated once per
+    key; later calls only swap in new data arrays and move the highlight.
+    '''
+    def __init__(self, max_items: int=128):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, fig: go.Figure) -> None:
+        skeleton = fig.to_dict()
+        with self._lock:
+            self._items[key] = skeleton
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+figure_templates = FigureTemplates()
+
+def patchFigure(skeleton: dict, 
+                traces: List[dict], 
+                interval: Optional[Tuple[int, int]]=None) -> go.Figure:
+    '''
+    Build a figure from a cached skeleton with new trace data
+    
+    The skeleton has been validated when it was cached, so the figure is 
+    created without validating it again.
+    
+    Args:
+        skeleton (dict): figure dictionary from FigureTemplates
+        traces (List[dict]): new data properties for every trace, in order
+        interval (Tuple[int, int]): year and month every highlight shape is moved to
+    Returns:
+        go.Figure with the new data
+    '''
+    layout = skeleton["layout"]
+    if interval is not None:
+        x0, x1 = intervalBounds(interval)
+        layout = {**layout, "shapes": [{**shape, "x0": x0, "x1": x1} for shape in layout.get("shapes", ())]}
+    data = [{**template, **trace} for template, trace in zip(skeleton["data"], traces)]
+    return go.Figure({"data": data, "layout": layout}, _validate=False)
+
+def intervalBounds(interval: Tuple[int, int]) -> Tuple[str, str]:
+    '''
+    Return the first and last day of the highlighted month as ISO dates
+    
+    Args:
+        interval (Tuple[int, int]): year and month
+    Returns:
+        Tuple[str, str]: first and last day of the month
+    '''
+    year, month = interval
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{monthrange(year, month)[1]}"
+
+def countrySeries(df: Union[pd.DataFrame, CountryGroups], 
+                  country: str, 
+                  indicator: str,
+                  interval: Tuple[int, int],
+                  max_points: Optional[int]=None,
+                  downsample_method: str="lttb") -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Extract x and y of a single country trace, downsampled to at most about max_points
+    
+    Args:
+        df (pd.DataFrame or CountryGroups): timeseries data for different countries, 
+            grouped data is sliced without scanning the other countries
+        country (str): country to extract
+        indicator (str): targetted indicator, title of a column
+        interval (Tuple[int, int]): year and month that is kept at full resolution
+        max_points (int): target number of points, e.g. plot width in pixels, None keeps all
+        downsample_method (str): "lttb" or "minmax"
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: dates and values
+    '''
+    if isinstance(df, CountryGroups):
+        x, y = df.get(country, "date"), df.get(country, indicator)
+    else:
+        country_df = df[df.Country == country]
+        x, y = country_df["date"].to_numpy(), country_df[indicator].to_numpy()
+    if max_points is not None and len(x) > max_points:
+        kept = downsample(x, y, max_points, downsample_method, keep=intervalBounds(interval))
+        x, y = x[kept], y[kept]
+    return x, decimalValues(y)
+
+
+
+def choroplethFrames(df: pd.DataFrame, indicator: str) -> List[Tuple[str, dict]]:
+    '''
+    Split a long dataframe into one choropleth trace per month
+    
+    Args:
+        df (pd.DataFrame): dataframe with "year", "month", "ISO3", indicator and text columns
+        indicator (str): illustrated indicator
+    Returns:
+        List[Tuple[str, dict]]: "YYYY-MM" frame names and trace data in chronological order
+    '''
+    years, months = df["year"].to_numpy("int64"), df["month"].to_numpy("int64")
+    order = np.lexsort((months, years))
+    keys = (years * 12 + months - 1)[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    locations = df["ISO3"].to_numpy(dtype=object)[order]
+    z = decimalValues(df[indicator])[order]
+    text = df[f"text_{indicator}"].to_numpy(dtype=object)[order]
+    return [(f"{keys[start] // 12}-{keys[start] % 12 + 1:02d}",
+             dict(locations=locations[start:stop], z=z[start:stop], text=text[start:stop]))
+            for start, stop in zip(starts, stops)]
+
+def animateFigure(fig: go.Figure, frames: List[Tuple[str, Union[dict, List[dict]]]],
+                  traces: Tuple[int, ...]=(0,)) -> go.Figure:
+    '''
+    Add animation frames, a month slider and a play button to a figure
+    
+    Frames only carry the data of the animated traces, layout, geometry and 
+    the other traces are shared, so stepping through months happens in the browser.
+    
+    Args:
+        fig (go.Figure): figure showing the last frame
+        frames (List[Tuple[str, Union[dict, List[dict]]]]): frame names and the data
+            of the animated trace, or a list with the data of each of traces
+        traces (Tuple[int, ...]): positions of the animated traces
+    Returns:
+        go.Figure with frames
+    '''
+    animation = dict(mode="immediate", frame=dict(duration=0, redraw=True), transition=dict(duration=0))
+    fig.update_layout(
+        sliders=[dict(
+            active=len(frames) - 1,
+            x=0.1, len=0.9, y=0.02,
+            currentvalue=dict(prefix="Month: "),
+            steps=[dict(method="animate", label=name, args=[[name], animation]) for name, _ in frames])],
+        updatemenus=[dict(
+            type="buttons", showactive=False,
+            x=0.1, y=0.02, xanchor="right", yanchor="top",
+            buttons=[dict(label="Play", method="animate",
+                          args=[None, {**animation, "frame": dict(duration=300, redraw=True), 
+                                       "fromcurrent": True}])])])
+    figure = fig.to_dict()
+    trace_types = [figure["data"][i]["type"] for i in traces]
+    figure["frames"] = [dict(name=name, 
+                             data=[dict(type=trace_type, **trace) for trace_type, trace 
+                                   in zip(trace_types, data if isinstance(data, list) else [data])],
+                             traces=list(traces)) 
+                        for name, data in frames]
+    return go.Figure(figure, _validate=False)
+
+def scatterTrajectories(df: pd.DataFrame, 
+                        indicators: Union[Tuple[str, str], List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Pivot a long dataframe into the monthly path of every country through two indicators
+    
+    Args:
+        df (pd.DataFrame): dataframe with "Country", "year", "month" and both indicator columns
+        indicators (Tuple[str, str] or List[str, str]): indicators in (x, y) format
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: sorted countries, month numbers 
+            (year * 12 + month - 1) from the first to the last, and countries x months x and y 
+            values, NaN where a country has no data
+    '''
+    codes, countries = pd.factorize(df["Country"], sort=True)
+    keys = df["year"].to_numpy("int64") * 12 + df["month"].to_numpy("int64") - 1
+    months = np.arange(keys.min(), keys.max() + 1) if len(keys) else np.empty(0, dtype="int64")
+    values = []
+    for indicator in indicators:
+        array = np.full((len(countries), len(months)), np.nan)
+        array[codes, keys - (months[0] if len(months) else 0)] = decimalValues(df[indicator])
+        values.append(array)
+    return np.asarray(countries, dtype=object), months, values[0], values[1]
+
+def scatterFrames(months: np.ndarray, x: np.ndarray, y: np.ndarray, 
+                  trail: int) -> List[Tuple[str, List[dict]]]:
+    '''
+    Split country paths into one frame per month with the position and recent trail of every country
+    
+    Args:
+        months (np.ndarray): month numbers of the columns
+        x (np.ndarray): countries x months values on the x axis
+        y (np.ndarray): countries x months values on the y axis
+        trail (int): number of earlier months drawn behind every country
+    Returns:
+        List[Tuple[str, List[dict]]]: "YYYY-MM" frame names with the trail and position traces
+    '''
+    gap = np.full((len(x), 1), np.nan)
+    frames = []
+    for column, key in enumerate(months):
+        first = max(column - trail, 0)
+        # NaN after every country breaks the trail lines between countries
+        trails = dict(x=np.hstack([x[:, first:column + 1], gap]).ravel(), 
+                      y=np.hstack([y[:, first:column + 1], gap]).ravel())
+        frames.append((f"{key // 12}-{key % 12 + 1:02d}", [trails, dict(x=x[:, column], y=y[:, column])]))
+    return frames
+
+@timed()
 def makeChoropleth(df: pd.DataFrame, 
                   min_val: float, 
                   max_val: float, 
@@ -14,12 +232,13 @@ def makeChoropleth(df: pd.DataFrame,
                   colorscale: str, 
                   colorbar_title: str, 
                   title: str, 
-                  source: str) -> go.Figure:
+                  source: str,
+                  animate: bool=False) -> go.Figure:
     '''
         Return stylised plotly graph object choropleth
         
         Args:
-            df (pd.DataFrame): filtered for specific date
+            df (pd.DataFrame): filtered for specific date, or all months when animate is set
             min_val (float): minimum value for the colorscale
             max_val (float): maximum values for the colorscale
             indicator (str): illustrated indicator
@@ -27,6 +246,8 @@ def makeChoropleth(df: pd.DataFrame,
             colorbar_title (str): name of the indicator
             title (str): title of the choropleth
             source (str): citation, quote, or any other link to the source
+            animate (bool): precompute one frame per month with a slider, 
+                starting at the last month
         Returns:
             plotly.graph_objs._figure.Figure: stylised plotly choropleth
     '''
@@ -35,14 +256,28 @@ def makeChoropleth(df: pd.DataFrame,
     else:
         print(f"Indicator {indicator} not found")
         return
+    if animate:
+        frames = choroplethFrames(df, indicator)
+        fig = makeChoropleth(pd.DataFrame({"ISO3": frames[-1][1]["locations"],
+                                           indicator: frames[-1][1]["z"],
+                                           f"text_{indicator}": frames[-1][1]["text"]}),
+                             min_val, max_val, indicator, colorscale, colorbar_title, title, source)
+        return animateFigure(fig, frames)
+    trace = dict(locations=df['ISO3'].to_numpy(dtype=object),
+                 z=decimalValues(df[indicator]),
+                 text=df[f'text_{indicator}'].to_numpy(dtype=object))
+    key = ("choropleth", min_val, max_val, indicator, colorscale, colorbar_title, title, source)
+    skeleton = figure_templates.get(key)
+    if skeleton is not None:
+        return patchFigure(skeleton, [trace])
     fig = go.Figure(data=go.Choropleth(
-        locations=df['ISO3'],
-        z=df[indicator].astype(float),
+        locations=trace['locations'],
+        z=trace['z'],
         zmin=min_val,
         zmax=max_val,
         colorscale= colorscale,
         autocolorscale=False,
-        text=df[f'text_{indicator}'], 
+        text=trace['text'], 
         hovertemplate="%{text}",
         hoverlabel = dict(namelength=0),
         colorbar_title=colorbar_title,
@@ -85,31 +320,50 @@ def makeChoropleth(df: pd.DataFrame,
         )],
         margin=dict(l=5, r=5, t=5, b=2)
     )
+    figure_templates.put(key, fig)
     return fig
 
+@timed()
 def makeScatterplot(df: pd.DataFrame, indicators: Union[Tuple[str, str], List[str]], 
                    hovertemplate: str="%{text}<br>interest rate: %{y:.2f}%,<br>inflation %{x:.2f}%", 
-                   textposition:str="top right") -> go.Figure:
+                   textposition:str="top right",
+                   history: bool=False,
+                   labels: Optional[List[str]]=None,
+                   trail: int=6) -> go.Figure:
     '''
     Delivers a formatted go.figure scatterplot
     
     Args:
-        df (pd.DataFrame): dataframe that contains data for visualisation
+        df (pd.DataFrame): dataframe that contains data for visualisation, 
+            all months and countries when history is set
         indicators (Tuple[str, str] or List[str, str]): indicators to be visualised, in (x, y) format
         hovertemplate (str): template to format hovertemplate output
         textposition (str): placement of text around the datapoints
+        history (bool): draw the paths of all countries over all months with WebGL and
+            precompute one frame per month with a slider, starting at the last month
+        labels (List[str]): countries named next to their marker when history is set, none by default
+        trail (int): earlier months drawn behind every country when history is set
     Returns:
         go.Figure, a scatterplot with visualised data
     '''
+    if history:
+        return makeScatterHistory(df, indicators, hovertemplate, textposition, labels, trail)
+    trace = dict(x=decimalValues(df[indicators[0]]),
+                 y=decimalValues(df[indicators[1]]),
+                 text=df["Country"].to_numpy(dtype=object))
+    key = ("scatter", tuple(indicators), hovertemplate, textposition)
+    skeleton = figure_templates.get(key)
+    if skeleton is not None:
+        return patchFigure(skeleton, [trace])
     fig= go.Figure(go.Scatter(
-        x=df[indicators[0]],
-        y=df[indicators[1]],
-        text=df["Country"],
+        x=trace["x"],
+        y=trace["y"],
+        text=trace["text"],
         hovertemplate=hovertemplate,
         name="",  
         marker=dict(
                 # color="#E57A88",
-                color = px.colors.sequential.Sunsetdark,
+                color = sequential.Sunsetdark,
                 opacity=0.8,
                 line=dict(
                     color='#525252',
@@ -119,7 +373,14 @@ def makeScatterplot(df: pd.DataFrame, indicators: Union[Tuple[str, str], List[st
         textposition=textposition,
         mode="markers+text"
     ))
+    styleScatterplot(fig, indicators)
+    figure_templates.put(key, fig)
+    return fig
 
+def styleScatterplot(fig: go.Figure, indicators: Union[Tuple[str, str], List[str]]) -> go.Figure:
+    '''
+    Apply the layout and axis titles shared by the scatterplots
+    '''
     fig.update_layout(
         template="none",
         grid=dict(xgap=0.05, ygap=0.05),
@@ -153,29 +414,91 @@ def makeScatterplot(df: pd.DataFrame, indicators: Union[Tuple[str, str], List[st
             title_standoff = 0)
     return fig
 
+@timed()
+def makeScatterHistory(df: pd.DataFrame, indicators: Union[Tuple[str, str], List[str]], 
+                       hovertemplate: str="%{text}<br>interest rate: %{y:.2f}%,<br>inflation %{x:.2f}%", 
+                       textposition: str="top right",
+                       labels: Optional[List[str]]=None,
+                       trail: int=6) -> go.Figure:
+    '''
+    Delivers a WebGL scatterplot of every country over the whole history with a month slider
+    
+    The full paths of all countries are drawn faintly once; the frames only 
+    move the markers and their trails, so scrubbing through months happens 
+    in the browser without a rerun. See makeScatterplot for the arguments.
+    
+    Returns:
+        go.Figure, a scatterplot with one frame per month
+    '''
+    countries, months, x, y = scatterTrajectories(df, indicators)
+    frames = scatterFrames(months, x, y, trail)
+    labels = set(labels or ())
+    gap = np.full((len(countries), 1), np.nan)
+    colors = [sequential.Sunsetdark[i % len(sequential.Sunsetdark)] for i in range(len(countries))]
+    last_trail, last = frames[-1][1] if frames else (dict(x=[], y=[]), dict(x=[], y=[]))
+    fig = go.Figure([
+        go.Scattergl(
+            x=np.hstack([x, gap]).ravel(),
+            y=np.hstack([y, gap]).ravel(),
+            mode="lines",
+            line=dict(color="#525252", width=1),
+            opacity=0.15,
+            hoverinfo="skip",
+            name="history"),
+        go.Scattergl(
+            x=last_trail["x"],
+            y=last_trail["y"],
+            mode="lines",
+            line=dict(color=sequential.Sunsetdark[2], width=2),
+            opacity=0.6,
+            hoverinfo="skip",
+            name="trail"),
+        go.Scattergl(
+            x=last["x"],
+            y=last["y"],
+            text=[country if country in labels else "" for country in countries],
+            customdata=countries,
+            hovertemplate=hovertemplate.replace("%{text}", "%{customdata}"),
+            name="",
+            marker=dict(
+                color=colors,
+                opacity=0.8,
+                line=dict(color='#525252', width=1),
+                size=12),
+            textposition=textposition,
+            mode="markers+text")])
+    styleScatterplot(fig, indicators)
+    fig.update_layout(showlegend=False, margin=dict(l=15, r=15, b=110))
+    return animateFigure(fig, frames, traces=(1, 2))
+
 
-def makeLineplot(df: pd.DataFrame, 
+def makeLineplot(df: Union[pd.DataFrame, CountryGroups], 
                  indicator: str, 
                  interval: Tuple[int, int],
                  countries: List[str], 
-                 colorscheme: List[str]) -> go.Figure:
+                 colorscheme: List[str],
+                 max_points: Optional[int]=None,
+                 downsample_method: str="lttb") -> go.Figure:
     '''
     makes a formatted lineplot
     
     Args:
-        df (pd.DataFrame) formatted dataframe with timeseries data for different countries
+        df (pd.DataFrame or CountryGroups) formatted dataframe with timeseries data for different countries
         indicator (str): targetted indicators, title of a column
         interval (Tuple[int, int]): year and month to be highlighted
         countries (List[str]): list of countries to be plotted
-        colorscheme (List[str]) list of strings of colors, px.colors.sequential works 
+        colorscheme (List[str]) list of strings of colors, plotly.colors.sequential works 
+        max_points (int): downsample every line to about this many points, None keeps all
+        downsample_method (str): "lttb" or "minmax"
     Returns:
         go.Figure lineplot
     '''
     counter = 0
     fig = go.Figure(layout=dict(hovermode = "x unified"))
     for country in countries:
-        fig.add_trace(go.Scatter(x=df[df.Country == country]["date"], 
-                            y=df[df.Country == country][indicator], mode='lines', name=country,
+        x, y = countrySeries(df, country, indicator, interval, max_points, downsample_method)
+        fig.add_trace(go.Scatter(x=x, 
+                            y=y, mode='lines', name=country,
                             hovertemplate="%{y:.2f}%",
                             line = dict(color=colorscheme[counter%7])
                             ))
@@ -213,9 +536,10 @@ def makeLineplot(df: pd.DataFrame,
         title_font = {"size": 15},
         title_standoff = 0)
     
+    x0, x1 = intervalBounds(interval)
     fig.add_vrect(
-        x0=f"{interval[0]}-{interval[1]}-01", 
-        x1=f"{interval[0]}-{interval[1]}-{monthrange(interval[0],interval[1])[1]}",
+        x0=x0, 
+        x1=x1,
         fillcolor="Blue", opacity=0.5,
         layer="below", line_width=0,
     )
@@ -223,32 +547,37 @@ def makeLineplot(df: pd.DataFrame,
 
 
 
-def addLineplot(df: pd.DataFrame, 
+def addLineplot(df: Union[pd.DataFrame, CountryGroups], 
                 fig: go.Figure,
                 indicator: str,
                 interval: Tuple[int, int],
                 countries: List[str],
                 pos: Tuple[int, int],
-                colorscheme: List[str]) -> go.Figure:
+                colorscheme: List[str],
+                max_points: Optional[int]=None,
+                downsample_method: str="lttb") -> go.Figure:
     '''
     adds a formatted lineplot to a pre-existing go.Figure
     
     Args:
-        df (pd.DataFrame): a formatted dataframe with timeseries data for different countries
+        df (pd.DataFrame or CountryGroups): a formatted dataframe with timeseries data for different countries
         fig (go.Figure): a figure to add lineplot to
         indicator (str): targetted indicators, title of a column
         interval (Tuple[int, int]): year and month to be highlighted
         countries (List[str]): list of countries to be plotted
         pos (int): position in the subplot item
-        colorscheme (List[str]) list of strings of colors, px.colors.sequential works 
+        colorscheme (List[str]) list of strings of colors, plotly.colors.sequential works 
+        max_points (int): downsample every line to about this many points, None keeps all
+        downsample_method (str): "lttb" or "minmax"
     Returns:
         go.Figure with added lines to a subplot
     '''
     counter = 0
     
     for country in countries:
-        fig.add_trace(go.Scatter(x=df[df.Country == country]["date"], 
-                               y=df[df.Country == country][indicator], mode='lines', name=country,
+        x, y = countrySeries(df, country, indicator, interval, max_points, downsample_method)
+        fig.add_trace(go.Scatter(x=x, 
+                               y=y, mode='lines', name=country,
                               hovertemplate="%{y:.2f}%",
                               line = dict(color=colorscheme[counter%7]),
                               
@@ -256,9 +585,10 @@ def addLineplot(df: pd.DataFrame,
                       row=pos[0], col=pos[1])
         counter += 1
     
+    x0, x1 = intervalBounds(interval)
     fig.add_vrect(
-        x0=f"{interval[0]}-{interval[1]}-01", 
-        x1=f"{interval[0]}-{interval[1]}-{monthrange(interval[0],interval[1])[1]}",
+        x0=x0, 
+        x1=x1,
         fillcolor="Blue", opacity=0.5,
         layer="below", line_width=0,
         row=pos[0], col=pos[1]
@@ -266,24 +596,41 @@ def addLineplot(df: pd.DataFrame,
 
     return fig
 
-def makeVerticalLineplots(df: pd.DataFrame,
+@timed()
+def makeVerticalLineplots(df: Union[pd.DataFrame, CountryGroups, Dict[str, Union[pd.DataFrame, CountryGroups]]],
                           indicators: Tuple[str],
                           countries: Tuple[str],
                           interval: Tuple[int],
                           subplot_titles: Tuple[str],
-                          colorscheme: List[str]) -> go.Figure:
+                          colorscheme: List[str],
+                          max_points: Optional[int]=None,
+                          downsample_method: str="lttb") -> go.Figure:
     '''
     makes vertical lineplots with titles
 
     Args:
-        df (pd.DataFrame): a formatted dataframe with timeseries data for different countries
+        df (pd.DataFrame, CountryGroups or a dict of them): a formatted dataframe with timeseries data 
+            for different countries, or one dataframe per indicator when they differ in frequency
         fig (go.Figure): a figure to add lineplot to
         indicators (str): targetted indicators, title of a column
         countries (List[str]): list of countries to be plotted
         interval (Tuple[int, int]): year and month to be highlighted
         subplot_titles (Tuple[str]): titles to be used for the graphs
-        colorscheme (List[str]) list of strings of colors, px.colors.sequential works 
+        colorscheme (List[str]) list of strings of colors, plotly.colors.sequential works 
+        max_points (int): downsample every line to about this many points, None keeps all
+        downsample_method (str): "lttb" or "minmax"
     '''
+    key = ("vertical", tuple(indicators), tuple(countries), tuple(subplot_titles), tuple(colorscheme))
+    skeleton = figure_templates.get(key)
+    if skeleton is not None:
+        traces = []
+        for indicator in indicators:
+            for country in countries:
+                x, y = countrySeries(df[indicator] if isinstance(df, dict) else df, 
+                                     country, indicator, interval, max_points, downsample_method)
+                traces.append(dict(x=x, y=y))
+        return patchFigure(skeleton, traces, interval)
+
     rows = len(indicators)
     fig = make_subplots(rows=rows, cols=1,
                         shared_xaxes=True,
@@ -291,12 +638,14 @@ def makeVerticalLineplots(df: pd.DataFrame,
                         subplot_titles=subplot_titles)
     pos = 1
     for indicator in indicators:
-        addLineplot(df, fig, 
+        addLineplot(df[indicator] if isinstance(df, dict) else df, fig, 
                     indicator, 
                     interval, 
                     countries,
                     (pos, 1), 
-                    colorscheme)
+                    colorscheme,
+                    max_points,
+                    downsample_method)
         pos += 1
 
     fig.update_xaxes(
@@ -329,4 +678,48 @@ def makeVerticalLineplots(df: pd.DataFrame,
         margin=dict(l=15, r=15))
     fig.layout.annotations[0].update(font_size=20)
     fig.layout.annotations[1].update(font_size=20)
-    return fig
\ No newline at end of file
+    figure_templates.put(key, fig)
+    return fig
+
+@timed()
+def makeHeatmap(df: pd.DataFrame, title: str, 
+                hovertemplate: str="%{y} and %{x}: %{z:.2f}<extra></extra>") -> go.Figure:
+    '''
+    Delivers a formatted go.figure heatmap of a square matrix, e.g. correlations between countries
+    
+    Args:
+        df (pd.DataFrame): matrix with the same labels as index and columns, values between -1 and 1
+        title (str): title of the figure
+        hovertemplate (str): template to format hovertemplate output
+    Returns:
+        go.Figure, a heatmap with visualised data
+    '''
+    fig = go.Figure(go.Heatmap(
+        z=df.to_numpy(),
+        x=list(df.columns),
+        y=list(df.index),
+        zmin=-1,
+        zmax=1,
+        colorscale="RdBu_r",
+        hovertemplate=hovertemplate))
+
+    fig.update_layout(
+        template="none",
+        font=dict(color='#525252'),
+        hoverlabel=dict(
+            bgcolor="white",
+            font_size=16,
+            font_family="Sans-Serif"
+        ),
+        title={
+                'text': title,
+                'y':0.9,
+                'x':0.5,
+                'xanchor': 'center',
+                'yanchor': 'top',
+            },
+        title_font_color='#525252',
+        title_font_size=20,
+        margin=dict(l=120, r=15))
+    fig.update_yaxes(autorange="reversed")
+    return fig
@@ -0,0 +1,212 @@
+import numpy as np
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from src.ohlc import OHLCStore
+from src.rolling import RollingPanel
+
+# equity index futures of the futures universe and the country whose rates they are compared with
+INDEX_COUNTRIES = {"ES=F": "USA", "YM=F": "USA", "NQ=F": "USA", "RTY=F": "USA"}
+# differences of prefix sums below this share of the summed squares are rounding, i.e. a flat window
+FLAT = 1e-12
+
+
+def _days(dates: np.ndarray) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]").astype("int64")
+
+
+def _lastObserved(values: np.ndarray) -> np.ndarray:
+    # position of the last value that is not NaN up to every column of a row, -1 before the first
+    return np.maximum.accumulate(np.where(np.isnan(values), -1, np.arange(values.shape[1])), axis=1)
+
+
+class AssetPanel(RollingPanel):
+    '''
+    Daily closes and returns of many symbols as symbols x days arrays
+
+    Rows are symbols instead of countries and periods are the days any of
+    them traded, so every rolling statistic of RollingPanel applies with
+    windows counted in trading days. The months axis of RollingPanel holds
+    day numbers (days since 1970-01-01) here. Windows sums come from prefix
+    sums, which keeps windows of hundreds of days as cheap as short ones.
+
+    Besides "close", "return" (simple return since the previous close of the
+    symbol, NaN on days it did not trade) and "<series>@<symbol>" (the series
+    of one symbol on every row, e.g. "return@ES=F" for betas against it) can
+    be used wherever an indicator is expected.
+    '''
+    @classmethod
+    def fromStore(cls, store: OHLCStore, symbols: Iterable[str],
+                  start: Optional[str]=None, end: Optional[str]=None,
+                  weekdays: bool=True) -> "AssetPanel":
+        '''
+        Align the closes of several symbols from an OHLC store
+
+        Args:
+            store (OHLCStore): store of daily bars
+            symbols (Iterable[str]): tickers, one row each, symbols without bars stay empty
+            start (str): first date, all by default
+            end (str): last date, all by default
+            weekdays (bool): drop weekends, so returns of symbols trading every day
+                are taken from Friday to Monday like the ones of exchange listed symbols
+        Returns:
+            AssetPanel: one row per symbol, one column per trading day
+        '''
+        symbols = list(symbols)
+        dates, closes = store.panel(symbols, "close", start, end)
+        if weekdays:
+            # 1970-01-01 was a Thursday
+            keep = (_days(dates) + 3) % 7 < 5
+            dates, closes = dates[keep], closes[:, keep]
+        return cls(symbols, _days(dates), {"close": closes})
+
+    def symbols(self) -> Tuple[str, ...]:
+        return self.countries()
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.months.astype("datetime64[D]").astype("datetime64[ns]")
+
+    def column(self, date: str) -> int:
+        '''
+        Return the position of the last trading day up to a date, -1 before the first one
+        '''
+        return int(np.searchsorted(self.months, _days(np.datetime64(date, "D")), "right")) - 1
+
+    def _position(self, end: str) -> int:
+        return self.column(end)
+
+    def series(self, name: str) -> np.ndarray:
+        '''
+        Return the symbols x days values of a loaded or derived series
+        '''
+        if name in self.values or name in self._derived:
+            return super().series(name)
+        if name == "return":
+            close = self.values["close"]
+            previous = np.full(close.shape, -1)
+            previous[:, 1:] = _lastObserved(close)[:, :-1]
+            before = np.take_along_axis(close, np.maximum(previous, 0), axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self._derived[name] = np.where(previous >= 0, close / before - 1, np.nan)
+        elif "@" in name:
+            series, symbol = name.rsplit("@", 1)
+            if symbol not in self._codes:
+                raise KeyError(name)
+            self._derived[name] = np.broadcast_to(self.series(series)[self._codes[symbol]], self.values["close"].shape)
+        else:
+            return super().series(name)
+        return self._derived[name]
+
+    def _moments(self, names: Tuple[str, ...], window: int,
+                 start: int) -> Tuple[np.ndarray, Tuple[np.ndarray, ...], Dict[Tuple[int, int], np.ndarray]]:
+        '''
+        Observations, means and sums of centred products from prefix sums, see RollingPanel._moments
+        '''
+        if window < 1:
+            raise ValueError(f"window must be at least 1 day, got {window}")
+        arrays = [self.series(i) for i in names]
+        missing = np.logical_or.reduce([np.isnan(i) for i in arrays])
+        # shifting every row by its mean keeps the prefix sums small
+        count = np.maximum((~missing).sum(axis=1, keepdims=True), 1)
+        centres = [np.where(missing, 0.0, i).sum(axis=1, keepdims=True) / count for i in arrays]
+        values = [np.where(missing, 0.0, array - centre) for array, centre in zip(arrays, centres)]
+        days = missing.shape[1]
+        # windows ending before this position start with the first day
+        full = max(window - 1 - start, 0)
+
+        def rolling(array):
+            prefix = np.zeros((array.shape[0], days + 1))
+            np.cumsum(array, axis=1, out=prefix[:, 1:])
+            sums = prefix[:, start + 1:].copy()
+            sums[:, full:] -= prefix[:, start + full + 1 - window:days + 1 - window]
+            return sums
+
+        n = np.rint(rolling((~missing).astype("float64")))
+        sums = [rolling(i) for i in values]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = tuple(total / n + centre for total, centre in zip(sums, centres))
+            products = {}
+            for i in range(len(names)):
+                for j in range(i, len(names)):
+                    raw = rolling(values[i] * values[j])
+                    products[i, j] = raw - sums[i] * sums[j] / n
+                    if i == j:
+                        products[i, j] = np.where(products[i, j] > FLAT * raw, products[i, j], 0.0)
+        return n, means, products
+
+    def monthlyReturns(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Compound daily returns into calendar months, from the last close of one month to the next
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: month numbers (year * 12 + month - 1) and a
+                symbols x months array, NaN for months a symbol did not trade in
+                or that have no earlier close
+        '''
+        close = self.values["close"]
+        months = self.months.astype("datetime64[D]").astype("datetime64[M]").astype("int64") + 1970 * 12
+        if len(months) == 0:
+            return months, close
+        firsts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        lasts = np.r_[firsts[1:] - 1, len(months) - 1]
+        last = _lastObserved(close)[:, lasts]
+        closes = np.where(last >= 0, np.take_along_axis(close, np.maximum(last, 0), axis=1), np.nan)
+        traded = np.add.reduceat(~np.isnan(close), firsts, axis=1) > 0
+        returns = np.full(closes.shape, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1
+        return months[firsts], np.where(traded, returns, np.nan)
+
+    def joinCountries(self, panel: RollingPanel,
+                      countries: Mapping[str, str]=INDEX_COUNTRIES) -> RollingPanel:
+        '''
+        Line up monthly returns of symbols with the indicators of the country they belong to
+
+        The result has one row per symbol and the months of the country panel,
+        with "Return" in percent next to every indicator of the country, so
+        e.g. corr("Return", "InterestRate.change", 12) or
+        beta("Return", "InterestRate.change", 36) relate equity index returns
+        to the policy rate.
+
+        Args:
+            panel (RollingPanel): country panel, e.g. getPanel()
+            countries (Mapping[str, str]): country of every symbol to join,
+                symbols missing from either panel are left out
+        Returns:
+            RollingPanel: symbols x months
+        '''
+        pairs = [(symbol, country) for symbol, country in countries.items()
+                 if symbol in self._codes and country in panel.countries()]
+        months, returns = self.monthlyReturns()
+        codes = {country: code for code, country in enumerate(panel.countries())}
+        rows = [codes[country] for _, country in pairs]
+        values = {indicator: array[rows] for indicator, array in panel.values.items()}
+        joined = np.full((len(pairs), len(panel.months)), np.nan)
+        columns = np.searchsorted(panel.months, months)
+        inside = np.isin(months, panel.months)
+        joined[:, columns[inside]] = returns[[self._codes[symbol] for symbol, _ in pairs]][:, inside] * 100
+        values["Return"] = joined
+        return RollingPanel([symbol for symbol, _ in pairs], panel.months, values)
+
+    def statistic(self, statistic: str, window: int, benchmark: Optional[str]=None,
+                  min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling statistic of daily returns by name
+
+        Args:
+            statistic (str): "mean" or "volatility" of returns, or "beta" or "corr" against benchmark
+            window (int): window length in trading days
+            benchmark (str): symbol the returns of every symbol are compared with
+            min_periods (int): observations required in a window, window by default
+        Returns:
+            np.ndarray: symbols x days
+        '''
+        if statistic == "mean":
+            return self.mean("return", window, min_periods)
+        if statistic == "volatility":
+            return self.std("return", window, min_periods)
+        if statistic in ("beta", "corr"):
+            if benchmark is None:
+                raise ValueError(f"{statistic} needs a benchmark symbol")
+            return getattr(self, statistic)("return", f"return@{benchmark}", window, min_periods)
+        raise ValueError(f"unknown statistic {statistic!r}")
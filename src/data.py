@@ -0,0 +1,626 @@
+import os
+import sys
+import hashlib
+import tempfile
+import threading
+import functools
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from src.store import ColumnarStore, buildStore, isStale, FIGURES_DIR
+from src.grouped import CountryGroups
+from src.schema import INDICATORS
+from src.datasets import DATASETS, loadDatasets, toMonthly
+from src.rolling import RollingPanel, rollingLabel
+from src.crossasset import AssetPanel, INDEX_COUNTRIES
+from src.ohlc import OHLCStore
+from src.market import universeSymbols
+from src.policyrates import PolicyRates
+from src.timing import timed
+from src.serialize import figurePayload, dataPayload
+from src.utils import (countries_cpi_ir_data, countries_cpi_ir_store, ir_daily_path, 
+                       iso_conversions_path, eurozone_path, ohlc_store)
+
+
+def fileKey(path: str) -> Tuple[str, int, int]:
+    '''
+    Identify a file by path, modification time and size
+
+    Args:
+        path (str): path to a file or directory
+    Returns:
+        Tuple[str, int, int]: absolute path, mtime in nanoseconds and size
+    '''
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def sizeOf(obj: Any) -> int:
+    '''
+    Estimate the memory held by a cached value in bytes
+
+    Args:
+        obj (Any): dataframe, series, numpy array or any other object
+    Returns:
+        int: size in bytes
+    '''
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.index.memory_usage()) + sum(sizeOf(obj[i]) for i in obj.columns)
+    if isinstance(obj, pd.Series):
+        if isinstance(obj.dtype, pd.CategoricalDtype):
+            # categories are shared with the store, only the codes belong to this frame
+            return int(obj.cat.codes.nbytes)
+        return int(obj.memory_usage(index=False, deep=True))
+    if isinstance(obj, (np.ndarray, CountryGroups)):
+        return int(obj.nbytes)
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(sizeOf(i) for i in obj)
+    return sys.getsizeof(obj)
+
+
+class FrameCache:
+    '''
+    Thread-safe LRU cache bounded by item count and total bytes
+
+    Shared by every Streamlit session in the process. Cached values are
+    handed out as-is and must be treated as read-only by callers.
+    '''
+    def __init__(self, max_bytes: int=128 * 2**20, max_items: int=512):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        size = sizeOf(value)
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or len(self._items) > self.max_items:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        '''
+        Return hit/miss/evict counters and current memory use
+        '''
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "items": len(self._items),
+                    "bytes": self.bytes,
+                    "max_bytes": self.max_bytes}
+
+
+frame_cache = FrameCache()
+_datasets = {}
+# held only to look up _datasets and _loader_locks, loaders run under the lock of their own name
+_datasets_lock = threading.Lock()
+_loader_locks = {}
+
+
+def _argKey(arg: Any) -> Hashable:
+    if isinstance(arg, str) and os.path.exists(arg):
+        return fileKey(arg)
+    if isinstance(arg, (list, set)):
+        return tuple(arg)
+    return arg
+
+
+def cached(func: Callable) -> Callable:
+    '''
+    Cache a function of file paths and plain values in the shared frame cache
+
+    Arguments that are existing file paths are keyed on path, mtime and size,
+    so editing a source file invalidates the entry without hashing its content.
+    '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__qualname__,
+               tuple(_argKey(i) for i in args),
+               tuple(sorted((k, _argKey(v)) for k, v in kwargs.items())))
+        return _cachedCall(key, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+
+def loadOnce(name: Hashable, version: Hashable, loader: Callable[[], Any]) -> Any:
+    '''
+    Load a dataset once per process and share it across sessions
+
+    Loaded datasets are returned without waiting for loads of other names.
+    Only callers of the same name wait for its loader, which may itself call
+    getStore or loadOnce for other names.
+
+    Args:
+        name (Hashable): identity of the dataset, e.g. its path
+        version (Hashable): version of the dataset, typically a fileKey; a new
+            version replaces the previously loaded one
+        loader (Callable): function producing the dataset
+    Returns:
+        Any: the shared dataset
+    '''
+    with _datasets_lock:
+        loaded = _datasets.get(name)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+    with _loaderLock(name):
+        with _datasets_lock:
+            loaded = _datasets.get(name)
+        if loaded is None or loaded[0] != version:
+            loaded = (version, loader())
+            with _datasets_lock:
+                _datasets[name] = loaded
+        return loaded[1]
+
+
+def _loaderLock(name: Hashable) -> threading.Lock:
+    with _datasets_lock:
+        return _loader_locks.setdefault(name, threading.Lock())
+
+
+def _cachedCall(key: Hashable, func: Callable, *args) -> Any:
+    value = frame_cache.get(key, frame_cache)
+    if value is frame_cache:
+        value = frame_cache.put(key, func(*args))
+    return value
+
+
+@timed("load.getStore")
+def getStore(store_path: str=countries_cpi_ir_store,
+             csv_path: Optional[str]=countries_cpi_ir_data) -> ColumnarStore:
+    '''
+    Return the process-wide store, read through the data service when FM_DATA_SERVICE is set
+
+    With FM_DATA_SERVICE=http://host:port or unix:/path/to.sock every worker
+    reads slices from one service process (python -m src.service) that owns
+    the store, otherwise see getLocalStore.
+
+    Args:
+        store_path (str): directory of the store
+        csv_path (str): source csv used to (re)build a missing or stale store
+    Returns:
+        ColumnarStore or DataClient: shared read-only store
+    '''
+    address = os.environ.get("FM_DATA_SERVICE")
+    if address:
+        from src.service import DataClient
+        return loadOnce(("service", address), None, lambda: DataClient(address))
+    return getLocalStore(store_path, csv_path)
+
+
+def getLocalStore(store_path: str=countries_cpi_ir_store,
+                  csv_path: Optional[str]=countries_cpi_ir_data) -> ColumnarStore:
+    '''
+    Return the process-wide columnar store, reopening it only when it changes on disk
+
+    Args:
+        store_path (str): directory of the store
+        csv_path (str): source csv used to (re)build a missing or stale store
+    Returns:
+        ColumnarStore: shared read-only store
+    '''
+    if csv_path is not None and isStale(store_path, csv_path):
+        # one build per store, sessions waiting for it check again once it is done
+        with _loaderLock(("build", os.path.abspath(store_path))):
+            if isStale(store_path, csv_path):
+                buildStore(csv_path, store_path)
+    return loadOnce(("store", os.path.abspath(store_path)),
+                    fileKey(os.path.join(store_path, "meta.json")),
+                    lambda: ColumnarStore(store_path))
+
+
+@timed("filter.getMonth")
+def getMonth(year: int, month: int,
+             countries: Optional[Iterable[str]]=None) -> pd.DataFrame:
+    '''
+    Return a cached month cross-section from the shared store
+
+    Args:
+        year (int): year of the cross-section
+        month (int): month of the cross-section
+        countries (Iterable[str]): restrict to these countries, all by default
+    Returns:
+        pd.DataFrame: read-only month slice
+    '''
+    store = getStore()
+    countries = None if countries is None else tuple(countries)
+    return _cachedCall(("getMonth", store.key, year, month, countries),
+                       store.getMonth, year, month, countries)
+
+
+@timed("filter.getCountries")
+def getCountries(countries: Iterable[str],
+                 grouped: bool=False) -> Union[pd.DataFrame, CountryGroups]:
+    '''
+    Return cached full time series for the given countries from the shared store
+
+    Args:
+        countries (Iterable[str]): countries to include, in order
+        grouped (bool): return per-country blocks for the line charts instead of a dataframe
+    Returns:
+        pd.DataFrame or CountryGroups: read-only country series
+    '''
+    store = getStore()
+    countries = tuple(countries)
+    if grouped:
+        # the line charts only read dates and values, so no hover text is derived for the blocks
+        columns = ("Country", "date", *INDICATORS)
+        return _cachedCall(("getCountries", store.key, countries, True),
+                           lambda: CountryGroups.fromFrame(store.getCountries(countries, columns)))
+    return _cachedCall(("getCountries", store.key, countries),
+                       store.getCountries, countries)
+
+
+@timed("load.getPolicyRates")
+def getPolicyRates(ir_daily_path: str=ir_daily_path) -> PolicyRates:
+    '''
+    Return the process-wide change-point store of daily policy rates
+
+    Args:
+        ir_daily_path (str): path to WS_CBPOL_D_csv_col.csv
+    Returns:
+        PolicyRates: shared read-only store
+    '''
+    return loadOnce(("policy_rates", os.path.abspath(ir_daily_path)),
+                    (fileKey(ir_daily_path), fileKey(iso_conversions_path), fileKey(eurozone_path)),
+                    lambda: PolicyRates.fromBIS(ir_daily_path, iso_conversions_path, eurozone_path))
+
+
+@timed("filter.getDailyRates")
+def getDailyRates(countries: Iterable[str], freq: str="D", how: str="last",
+                  date_range: Optional[Tuple[str, str]]=None,
+                  grouped: bool=False) -> Union[pd.DataFrame, CountryGroups]:
+    '''
+    Return cached policy rates of the given countries aggregated to freq
+
+    Args:
+        countries (Iterable[str]): countries to include, in order
+        freq (str): "D" daily, "W" weekly or "M" monthly
+        how (str): "last" or "mean" value of every period
+        date_range (Tuple[str, str]): first and last day to include
+        grouped (bool): return per-country blocks for the line charts instead of a dataframe
+    Returns:
+        pd.DataFrame or CountryGroups: read-only frame with "Country", "date" and "InterestRate" columns
+    '''
+    rates = getPolicyRates()
+    countries = tuple(countries)
+    date_range = None if date_range is None else tuple(date_range)
+    key = ("getDailyRates", fileKey(ir_daily_path), countries, freq, how, date_range)
+    if grouped:
+        return _cachedCall(key + (True,),
+                           lambda: CountryGroups.fromFrame(getDailyRates(countries, freq, how, date_range)))
+    return _cachedCall(key, rates.resample, countries, freq, how, date_range)
+
+
+@timed("load.getDatasets")
+def getDatasets() -> Dict[str, pd.DataFrame]:
+    '''
+    Return every registered BIS dataset, loaded in parallel once per process
+
+    Returns:
+        Dict[str, pd.DataFrame]: shared normalized long dataframes keyed by name
+    '''
+    return loadOnce("datasets", _datasetsVersion(), lambda: loadDatasets(iso_conversions_path=iso_conversions_path))
+
+
+def _datasetsVersion() -> Tuple:
+    return tuple(fileKey(i.path) for i in DATASETS.values()) + (fileKey(iso_conversions_path),)
+
+
+@timed("filter.getDataset")
+def getDataset(name: str, monthly: Optional[str]=None,
+               grouped: bool=False) -> Union[pd.DataFrame, CountryGroups]:
+    '''
+    Return a cached view of a registered dataset, aligned to months on demand
+
+    Args:
+        name (str): key of DATASETS
+        monthly (str): "ffill" or "interpolate" to align quarterly data to months, None keeps periods
+        grouped (bool): return per-country blocks for the line charts instead of a dataframe
+    Returns:
+        pd.DataFrame or CountryGroups: read-only frame with "Country", "ISO3", "date", "year", "month" and name
+    '''
+    df = getDatasets()[name]
+    key = ("getDataset", _datasetsVersion(), name, monthly, grouped)
+    if grouped:
+        return _cachedCall(key, lambda: CountryGroups.fromFrame(getDataset(name, monthly), columns=("date", name)))
+    if monthly is None or DATASETS[name].frequency == "M":
+        return df
+    return _cachedCall(key, toMonthly, df, name, monthly)
+
+
+@timed("load.getPanel")
+def getPanel() -> RollingPanel:
+    '''
+    Return the process-wide country x month panel of the store for rolling statistics
+
+    When only the last months of the store were written since the panel was
+    loaded, as by an ingest, the previous panel gets them replaced or
+    appended and keeps its cached statistics of the months before.
+
+    Returns:
+        RollingPanel: shared panel of CPI and interest rates
+    '''
+    store = getStore()
+    return loadOnce("panel", store.key, lambda: _loadPanel(store))
+
+
+def _loadPanel(store: ColumnarStore) -> RollingPanel:
+    # called by loadOnce, which holds the lock of "panel"
+    columns = ("Country", "year", "month", *INDICATORS)
+    loaded = _datasets.get("panel")
+    if loaded is not None and loaded[0][0] == store.key[0] and loaded[0][1] < store.generation:
+        written = store.periodsWrittenAfter(loaded[0][1])
+        # ingest only appends or replaces the last months, anything else rewrote history and needs a rebuild
+        periods = store.periods()
+        if len(written) < len(periods) and written == periods[len(periods) - len(written):]:
+            frames = [store.getMonth(year, month, columns=columns) for year, month in written]
+            return loaded[1].append(pd.concat(frames, ignore_index=True), replace=True) if frames else loaded[1]
+    return RollingPanel.fromFrame(store.toFrame(columns))
+
+
+@timed("filter.getRolling")
+def getRolling(statistic: str, indicators: Tuple[str, ...], window: int) -> CountryGroups:
+    '''
+    Return a cached rolling statistic of every country as per-country blocks for the line charts
+
+    Args:
+        statistic (str): "mean", "std", "volatility", "corr" or "beta"
+        indicators (Tuple[str, ...]): one indicator, two for "corr" and "beta"
+        window (int): window length in months
+    Returns:
+        CountryGroups: "date" and rollingLabel(statistic, indicators) columns
+    '''
+    panel = getPanel()
+    indicators = tuple(indicators)
+    return _cachedCall(("getRolling", getStore().key, statistic, indicators, window),
+                       lambda: panel.toGroups(getattr(panel, statistic)(*indicators, window),
+                                              rollingLabel(statistic, indicators)))
+
+
+@timed("filter.getCrossCorrelation")
+def getCrossCorrelation(indicator: str, countries: Iterable[str],
+                        end: Tuple[int, int], window: int) -> pd.DataFrame:
+    '''
+    Return a cached correlation matrix of an indicator between countries, see RollingPanel.crossCorrelation
+    '''
+    panel = getPanel()
+    countries = tuple(countries)
+    return _cachedCall(("getCrossCorrelation", getStore().key, indicator, countries, tuple(end), window),
+                       panel.crossCorrelation, indicator, countries, tuple(end), window)
+
+
+def _ohlcVersion(store_path: str) -> Hashable:
+    # index.json is replaced last by every update of the OHLC store
+    index_path = os.path.join(store_path, "index.json")
+    return fileKey(index_path) if os.path.exists(index_path) else None
+
+
+@timed("load.getAssetPanel")
+def getAssetPanel(universe: Optional[str]=None, start: Optional[str]=None, end: Optional[str]=None,
+                  store_path: str=ohlc_store) -> AssetPanel:
+    '''
+    Return the shared symbols x days panel of a universe, reloaded after the OHLC store is updated
+
+    Args:
+        universe (str): key of market.UNIVERSES, all universes by default
+        start (str): first date, all by default
+        end (str): last date, all by default
+        store_path (str): directory of the OHLC store
+    Returns:
+        AssetPanel: closes and returns of the symbols of the universe
+    '''
+    return loadOnce(("assets", store_path, universe, start, end), _ohlcVersion(store_path),
+                    lambda: AssetPanel.fromStore(OHLCStore(store_path),
+                                                 universeSymbols(None if universe is None else [universe]),
+                                                 start, end))
+
+
+@timed("filter.getAssetStatistic")
+def getAssetStatistic(statistic: str, window: int, universe: Optional[str]=None,
+                      start: Optional[str]=None, end: Optional[str]=None,
+                      benchmark: Optional[str]=None, store_path: str=ohlc_store) -> pd.DataFrame:
+    '''
+    Return a cached rolling statistic of the daily returns of a universe, see AssetPanel.statistic
+
+    Returns:
+        pd.DataFrame: days x symbols
+    '''
+    panel = getAssetPanel(universe, start, end, store_path)
+    key = ("getAssetStatistic", _ohlcVersion(store_path), universe, start, end, statistic, window, benchmark)
+    return _cachedCall(key, lambda: pd.DataFrame(panel.statistic(statistic, window, benchmark).T,
+                                                 index=panel.dates, columns=list(panel.symbols())))
+
+
+@timed("filter.getAssetCorrelations")
+def getAssetCorrelations(window: int, step: int=21, universe: Optional[str]=None,
+                         start: Optional[str]=None, end: Optional[str]=None,
+                         store_path: str=ohlc_store) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Return cached rolling correlation matrices of the daily returns of a universe
+
+    Args:
+        window (int): window length in trading days
+        step (int): trading days between consecutive matrices, counted back from the last day
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: dates the windows end with and a windows x symbols x symbols
+            array, rows and columns in the order of getAssetPanel().symbols()
+    '''
+    panel = getAssetPanel(universe, start, end, store_path)
+    key = ("getAssetCorrelations", _ohlcVersion(store_path), universe, start, end, window, step)
+
+    def compute():
+        ends, matrices = panel.correlationMatrices("return", window, step)
+        return panel.dates[ends], matrices
+    return _cachedCall(key, compute)
+
+
+@timed("load.getCountryReturns")
+def getCountryReturns(countries: Tuple[Tuple[str, str], ...]=tuple(INDEX_COUNTRIES.items()),
+                      store_path: str=ohlc_store) -> RollingPanel:
+    '''
+    Return monthly returns of symbols next to CPI and interest rates of their country, see AssetPanel.joinCountries
+
+    Args:
+        countries (Tuple[Tuple[str, str], ...]): pairs of symbol and country
+        store_path (str): directory of the OHLC store
+    Returns:
+        RollingPanel: symbols x months with "Return" and the indicators of the country panel
+    '''
+    countries = tuple(countries)
+    return loadOnce(("country returns", store_path, countries), (_ohlcVersion(store_path), getStore().key),
+                    lambda: AssetPanel.fromStore(OHLCStore(store_path), [symbol for symbol, _ in countries])
+                    .joinCountries(getPanel(), dict(countries)))
+
+
+# code the figures are built with, prebuilt figures of other versions of it are rebuilt
+FIGURE_SOURCES = tuple(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), *i)
+                       for i in (("src", "charts.py"), ("src", "serialize.py"), ("financial-markets.py",)))
+
+
+@functools.lru_cache(maxsize=None)
+def figureCodeVersion() -> str:
+    '''
+    Return a hash of FIGURE_SOURCES as loaded by this process
+    '''
+    digest = hashlib.sha1()
+    for path in FIGURE_SOURCES:
+        if os.path.exists(path):
+            with open(path, "rb") as source_file:
+                digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def getFigureJSON(name: Hashable, build: Callable[[], Any], rebuild: bool=False) -> str:
+    '''
+    Return a serialized figure built once per version of the shared store and of the chart code
+
+    The JSON is kept in the frame cache and in a "figures" directory inside
+    the store, one per generation, so later processes reuse it until the
+    store is rewritten or a deploy changes FIGURE_SOURCES.
+
+    Args:
+        name (Hashable): identity of the figure, e.g. its chart arguments
+        build (Callable): function producing the go.Figure
+        rebuild (bool): build and write the figure even if a current one exists
+    Returns:
+        str: plotly JSON of the figure
+    '''
+    store = getStore()
+    key = ("getFigureJSON", store.key, name)
+    value = None if rebuild else frame_cache.get(key, frame_cache)
+    if value is None or value is frame_cache:
+        # sessions arriving together on a cold process wait for one build of the figure
+        with _loaderLock(key):
+            value = None if rebuild else frame_cache.get(key, frame_cache)
+            if value is None or value is frame_cache:
+                value = frame_cache.put(key, _loadFigureJSON(store, name, build, rebuild))
+    return value
+
+
+def _loadFigureJSON(store: ColumnarStore, name: Hashable, build: Callable[[], Any], rebuild: bool=False) -> str:
+    figures_path = os.path.join(store.path, FIGURES_DIR, store.key[1])
+    path = os.path.join(figures_path, f"{hashlib.sha1(repr(name).encode()).hexdigest()}.json")
+    version = f"{figureCodeVersion()}\n"
+    if not rebuild and os.path.exists(path):
+        with open(path) as json_file:
+            if json_file.readline() == version:
+                return json_file.read()
+    figure = figurePayload(build())
+    os.makedirs(figures_path, exist_ok=True)
+    # a temporary file of its own for every writer, other processes may write the same figure
+    descriptor, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=figures_path)
+    try:
+        with os.fdopen(descriptor, "w") as json_file:
+            json_file.write(version)
+            json_file.write(figure)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return figure
+
+
+@timed("serialize.getFigurePayload")
+def getFigurePayload(key: Hashable, build: Callable[[], Any], data_key: Optional[Hashable]=None) -> str:
+    '''
+    Return a serialized figure cached per store version and input slice
+
+    A rerun with the same selection neither builds nor encodes the figure
+    again. Charts whose traces depend on less than the whole selection, e.g.
+    line plots that only move their highlight with the month, pass a
+    data_key; the traces are then encoded once per data_key and only the
+    layout is encoded for a new selection.
+
+    Args:
+        key (Hashable): everything the figure depends on, e.g. chart name, month and countries
+        build (Callable): function producing the go.Figure
+        data_key (Hashable): everything the traces of the figure depend on
+    Returns:
+        str: plotly JSON for serialize.plotlyChart
+    '''
+    store_key = getStore().key
+
+    def encode():
+        fig = build()
+        if data_key is None:
+            return figurePayload(fig)
+        data = _cachedCall(("getFigurePayload.data", store_key, data_key), dataPayload, fig)
+        return figurePayload(fig, data)
+    return _cachedCall(("getFigurePayload", store_key, key), encode)
+
+
+@timed("load.getFigure")
+def getFigure(name: Hashable, build: Callable[[], Any]) -> Any:
+    '''
+    Return a process-wide figure built once per store version
+
+    Large figures such as animations are shared by every session and must
+    be treated as read-only by callers. Rebuilding from the store is faster
+    than re-creating the figure from its JSON, see getFigureJSON for the
+    serialized form.
+
+    Args:
+        name (Hashable): identity of the figure, e.g. its chart arguments
+        build (Callable): function producing the go.Figure
+    Returns:
+        go.Figure: shared figure
+    '''
+    return loadOnce(("figure", name), getStore().key, build)
+
+
+def cacheStats() -> Dict[str, int]:
+    '''
+    Return counters of the shared frame cache and the number of loaded datasets
+    '''
+    return {**frame_cache.stats(), "datasets": len(_datasets)}
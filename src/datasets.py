@@ -0,0 +1,147 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from src.bisreader import readLong
+from src.utils import (cpi_path, ir_path, credit_gap_path, total_credit_path, property_prices_path,
+                       iso_conversions_path)
+from src.isocodes import loadCodeTable
+
+
+class Dataset(NamedTuple):
+    '''
+    Description of a wide BIS csv_col file and the series used from it
+    '''
+    path: str
+    key: str
+    frequency: str
+    filters: Dict[str, str]
+    unit: str
+    title: str
+
+
+DATASETS = {
+    "CPI": Dataset(cpi_path, "Reference area", "M",
+                   {"Frequency": "M:Monthly", "Unit of measure": "771:Year-on-year changes, in per cent"},
+                   "%", "Consumer Price Index Change"),
+    "InterestRate": Dataset(ir_path, "Reference area", "M", {},
+                            "%", "Central Bank Policy Rates"),
+    "CreditGap": Dataset(credit_gap_path, "Borrowers' country", "Q",
+                         {"Credit gap data type": "C:Credit-to-GDP gaps (actual-trend)"},
+                         "% of GDP", "Credit-to-GDP Gap"),
+    "TotalCredit": Dataset(total_credit_path, "Borrowers' country", "Q",
+                           {"Borrowing sector": "P:Private non-financial sector",
+                            "Lending sector": "A:All sectors",
+                            "Valuation method": "M:Market value",
+                            "Unit type": "770:Percentage of GDP",
+                            "Adjustment": "A:Adjusted for breaks"},
+                           "% of GDP", "Credit to the Private Non-financial Sector"),
+    "PropertyPrices": Dataset(property_prices_path, "Reference area", "Q",
+                              {"Value": "R:Real", "Unit of measure": "771:Year-on-year changes, in per cent"},
+                              "%", "Real Residential Property Prices"),
+}
+
+
+def loadDataset(name: str,
+                iso_conversions_path: str=iso_conversions_path,
+                date_range: Optional[Tuple[str, str]]=None,
+                dataset: Optional[Dataset]=None) -> pd.DataFrame:
+    '''
+    Read a registered BIS dataset into a normalized long dataframe
+
+    Only the series matching the filters of the dataset are parsed, missing
+    observations are dropped. Areas without an ISO conversion, e.g. the euro
+    area or aggregates, keep their BIS code and label.
+
+    Args:
+        name (str): key of DATASETS, also the name of the value column
+        iso_conversions_path (str): path to the file containing ISO conversions
+        date_range (Tuple[str, str]): first and last period to keep, e.g. ("1999-Q1", "2021-Q4")
+        dataset (Dataset): description to use instead of DATASETS[name]
+    Returns:
+        pd.DataFrame: columns "Country", "ISO3", "date", "year", "month" and name, sorted by country and date
+    '''
+    dataset = dataset or DATASETS[name]
+    df = readLong(dataset.path, key=dataset.key, filters=dataset.filters, date_range=date_range,
+                  frequency=dataset.frequency, dtype="float32", dropna=True)
+    iso_conversions = loadCodeTable(iso_conversions_path)
+    # one row per area, the key column holds "XX:Label"
+    areas = pd.Series(df[dataset.key].cat.categories)
+    iso2, labels = areas.str[:2], areas.str.partition(":")[2]
+    iso3 = iso_conversions.translate(iso2, "ISO2", "ISO3")
+    names = pd.Series(iso_conversions.translate(iso2, "ISO2", "name", keep=False)).fillna(labels)
+    codes = df[dataset.key].cat.codes.to_numpy()
+    dates = df["date"].to_numpy()
+    months = dates.astype("datetime64[M]").astype("int64")
+    df = pd.DataFrame({"Country": pd.Categorical(names.to_numpy()[codes]),
+                       "ISO3": pd.Categorical(iso3[codes]),
+                       "date": dates,
+                       "year": (months // 12 + 1970).astype("int16"),
+                       "month": (months % 12 + 1).astype("int8"),
+                       name: df["value"].to_numpy()})
+    return df.sort_values(["Country", "date"], kind="mergesort").reset_index(drop=True)
+
+
+def toMonthly(df: pd.DataFrame, indicator: str, method: str="ffill") -> pd.DataFrame:
+    '''
+    Align a quarterly long dataframe to months
+
+    Every quarter is expanded to its three months. "ffill" repeats the
+    quarterly value, "interpolate" moves linearly towards the next quarter
+    of the same country and repeats the last one.
+
+    Args:
+        df (pd.DataFrame): output of loadDataset for a quarterly dataset
+        indicator (str): value column
+        method (str): "ffill" or "interpolate"
+    Returns:
+        pd.DataFrame: three rows per quarter with monthly "date", "year" and "month"
+    '''
+    if method not in ("ffill", "interpolate"):
+        raise ValueError(f"method must be 'ffill' or 'interpolate', got {method!r}")
+    offsets = np.tile(np.arange(3), len(df))
+    monthly = df.loc[df.index.repeat(3)].reset_index(drop=True)
+    months = (df["date"].to_numpy().astype("datetime64[M]").astype("int64").repeat(3) + offsets)
+    monthly["date"] = months.astype("datetime64[M]").astype("datetime64[ns]")
+    monthly["year"] = (months // 12 + 1970).astype("int16")
+    monthly["month"] = (months % 12 + 1).astype("int8")
+    if method == "interpolate":
+        values = df[indicator].to_numpy()
+        quarters = df["date"].to_numpy().astype("datetime64[M]").astype("int64")
+        country = df["Country"].cat.codes.to_numpy()
+        following = np.r_[(country[1:] == country[:-1]) & (quarters[1:] - quarters[:-1] == 3), False]
+        steps = np.where(following, np.r_[values[1:], 0] - values, 0).astype(values.dtype)
+        monthly[indicator] = values.repeat(3) + steps.repeat(3) * (offsets / 3).astype(values.dtype)
+    return monthly
+
+
+def loadDatasets(names: Optional[Iterable[str]]=None,
+                 iso_conversions_path: str=iso_conversions_path,
+                 workers: Optional[int]=None) -> Dict[str, pd.DataFrame]:
+    '''
+    Load several registered datasets concurrently, one file per thread
+
+    Args:
+        names (Iterable[str]): keys of DATASETS, all by default
+        iso_conversions_path (str): path to the file containing ISO conversions
+        workers (int): number of threads, one per dataset by default
+    Returns:
+        Dict[str, pd.DataFrame]: normalized long dataframes keyed by name
+    '''
+    names = list(DATASETS if names is None else names)
+    with ThreadPoolExecutor(workers or len(names) or 1) as pool:
+        frames = pool.map(lambda name: loadDataset(name, iso_conversions_path), names)
+        return dict(zip(names, frames))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the registered BIS datasets and summarise them")
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(DATASETS)}, all by default")
+    args = parser.parse_args()
+    for name, df in loadDatasets(args.names or None).items():
+        dataset = DATASETS[name]
+        print(f"{name:>15}: {os.path.basename(dataset.path)}, {df.Country.nunique()} areas, "
+              f"{len(df)} observations, {df.date.min():%Y-%m} to {df.date.max():%Y-%m}, {dataset.unit}")
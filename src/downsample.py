@@ -0,0 +1,112 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+METHODS = ("lttb", "minmax")
+
+
+def _numeric(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype("int64").astype("float64")
+    return x.astype("float64")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    '''
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last point and, for every bucket in between, the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+
+    Args:
+        x (np.ndarray): increasing x values without NaN
+        y (np.ndarray): y values without NaN
+        n_out (int): number of points to keep, at least 3
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # averages of every bucket, the last one being the final point on its own
+    counts = np.diff(np.r_[edges, n])
+    mean_x = np.add.reduceat(x[1:], edges - 1) / counts
+    mean_y = np.add.reduceat(y[1:], edges - 1) / counts
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        x_previous, y_previous = x[previous], y[previous]
+        area = np.abs((x_previous - next_x) * (y[start:stop] - y_previous)
+                      - (x_previous - x[start:stop]) * (next_y - y_previous))
+        previous = start + int(area.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    '''
+    Min/max bucketing: keep the lowest and highest point of every bucket
+
+    Args:
+        x (np.ndarray): increasing x values without NaN
+        y (np.ndarray): y values without NaN
+        n_out (int): approximate number of points to keep
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    buckets = np.minimum(np.arange(n) * (n_out // 2) // n, n_out // 2 - 1)
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    stops = np.r_[starts[1:], n] - 1
+    return np.unique(np.r_[0, order[starts], order[stops], n - 1])
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str="lttb",
+               keep: Optional[Tuple] = None) -> np.ndarray:
+    '''
+    Select points of a line trace to send to the browser
+
+    Gaps (NaN values) are preserved by downsampling every contiguous run
+    separately and keeping one NaN between runs. Points with keep[0] <= x <= keep[1]
+    are always kept.
+
+    Args:
+        x (np.ndarray): increasing x values, numeric or datetime64
+        y (np.ndarray): y values, may contain NaN
+        n_out (int): target number of points, e.g. the plot width in pixels
+        method (str): "lttb" or "minmax"
+        keep (Tuple): inclusive x range that must be kept exactly
+    Returns:
+        np.ndarray: sorted indices of the kept points
+    '''
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    x_values, y = _numeric(x), np.asarray(y, dtype="float64")
+    n = len(x_values)
+    if n <= n_out:
+        return np.arange(n)
+    algorithm = lttb if method == "lttb" else minmax
+    valid = ~np.isnan(y)
+    edges = np.flatnonzero(np.diff(np.r_[False, valid, False].astype(int)))
+    runs = list(zip(edges[::2], edges[1::2]))
+    total = valid.sum()
+    kept: List[np.ndarray] = []
+    for start, stop in runs:
+        share = max(int(round(n_out * (stop - start) / total)), 3)
+        kept.append(start + algorithm(x_values[start:stop], y[start:stop], share))
+        if stop < n:
+            kept.append(np.array([stop]))
+    if keep is not None:
+        low, high = _numeric(np.array(keep, dtype=np.asarray(x).dtype))
+        kept.append(np.flatnonzero((x_values >= low) & (x_values <= high)))
+    if runs and runs[0][0] > 0:
+        kept.append(np.array([0]))
+    return np.unique(np.concatenate(kept)) if kept else np.arange(0)
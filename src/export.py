@@ -0,0 +1,200 @@
+import os
+import re
+import time
+import argparse
+import importlib.util
+from plotly.colors import sequential
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.charts import makeChoropleth, makeScatterplot, makeVerticalLineplots
+from src.data import getLocalStore
+from src.grouped import CountryGroups
+from src.schema import INDICATORS
+from src.store import ColumnarStore
+from src.utils import countries_cpi_ir_data, countries_cpi_ir_store
+
+CHARTS = ("choropleth", "scatter", "trends")
+FORMATS = ("html", "json", "png", "svg", "pdf")
+IMAGE_FORMATS = ("png", "svg", "pdf")
+SOURCE = 'Source: BIS: Statistics (https://www.bis.org/statistics/full_data_sets.htm)'
+CHOROPLETHS = {
+    "InterestRate": (-1, 50, 'InterestRate', "sunset", "Interest Rate (%)", '<b>Central Bank Policy Rates</b>', SOURCE),
+    "CPI": (-1, 50, 'CPI', "sunset", "CPI (%)", '<b>Consumer Price Index Change</b>', SOURCE)}
+
+# set once per worker process by _initWorker
+_options = {}
+# country series of every country set, read once per worker
+_groups = {}
+
+Task = Tuple[int, int, Optional[int]]
+
+
+def canRenderImages() -> bool:
+    '''
+    Check whether kaleido, the renderer plotly uses for static images, is installed
+    '''
+    return importlib.util.find_spec("kaleido") is not None
+
+
+def parseCountrySet(text: str, position: int) -> Tuple[str, Tuple[str, ...]]:
+    '''
+    Parse "NAME=Country,Country" or "Country,Country" into a name and countries
+    '''
+    name, _, countries = text.rpartition("=")
+    name = name or f"set{position + 1}"
+    return re.sub(r"[^\w-]+", "_", name), tuple(i.strip() for i in countries.split(",") if i.strip())
+
+
+def writeFigure(fig, path: str, formats: Sequence[str], plotlyjs: str="cdn") -> List[str]:
+    '''
+    Write a figure in every requested format
+
+    Args:
+        fig (go.Figure): figure to write
+        path (str): output path without extension
+        formats (Sequence[str]): any of FORMATS, image formats need kaleido
+        plotlyjs (str): include_plotlyjs option of the HTML files, "cdn" or True to embed it
+    Returns:
+        List[str]: written files
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = []
+    for extension in formats:
+        target = f"{path}.{extension}"
+        if extension == "html":
+            fig.write_html(target, include_plotlyjs=plotlyjs)
+        elif extension == "json":
+            with open(target, "w") as json_file:
+                json_file.write(fig.to_json())
+        else:
+            fig.write_image(target)
+        written.append(target)
+    return written
+
+
+def _initWorker(options: Dict) -> None:
+    _options.update(options)
+    _groups.clear()
+    # the store is memory-mapped, so workers share the page cache instead of re-reading the csv
+    _options["store"] = ColumnarStore(_options["store_path"])
+
+
+def _countryGroups(countries: Tuple[str, ...]) -> CountryGroups:
+    if countries not in _groups:
+        _groups[countries] = CountryGroups.fromFrame(
+            _options["store"].getCountries(countries, ("Country", "date", *INDICATORS)))
+    return _groups[countries]
+
+
+def _renderTask(task: Task) -> List[str]:
+    year, month, set_index = task
+    store = _options["store"]
+    out_dir, formats, plotlyjs = _options["out_dir"], _options["formats"], _options["plotlyjs"]
+    month_dir = os.path.join(out_dir, f"{year}-{month:02d}")
+    written = []
+    if set_index is None:
+        month_df = store.getMonth(year, month)
+        for indicator, args in CHOROPLETHS.items():
+            written += writeFigure(makeChoropleth(month_df, *args),
+                                   os.path.join(month_dir, f"choropleth_{indicator}"), formats, plotlyjs)
+        return written
+
+    name, countries = _options["country_sets"][set_index]
+    if "scatter" in _options["charts"]:
+        written += writeFigure(makeScatterplot(store.getMonth(year, month, countries), ("CPI", "InterestRate")),
+                               os.path.join(month_dir, name, "scatter"), formats, plotlyjs)
+    if "trends" in _options["charts"]:
+        fig = makeVerticalLineplots(_countryGroups(countries), ("CPI", "InterestRate"),
+                                    countries, (year, month),
+                                    ("<b>CPI over Time</b>", "<b>Interest Rate over Time</b>"),
+                                    sequential.Sunsetdark)
+        written += writeFigure(fig, os.path.join(month_dir, name, "trends"), formats, plotlyjs)
+    return written
+
+
+def exportCharts(start: str, end: str,
+                 country_sets: Sequence[Tuple[str, Tuple[str, ...]]],
+                 out_dir: str,
+                 formats: Sequence[str]=("html",),
+                 charts: Sequence[str]=CHARTS,
+                 workers: Optional[int]=None,
+                 plotlyjs: str="cdn",
+                 store_path: str=countries_cpi_ir_store,
+                 csv_path: Optional[str]=countries_cpi_ir_data) -> Dict:
+    '''
+    Render the dashboard charts for every month in a range and every country set
+
+    Choropleths are rendered once per month, scatterplots and trend plots once
+    per month and country set. Tasks are spread over a process pool whose
+    workers open the memory-mapped store at store_path once and render
+    every chart from it.
+
+    Args:
+        start (str): first month, "YYYY-MM"
+        end (str): last month, "YYYY-MM"
+        country_sets (Sequence[Tuple[str, Tuple[str, ...]]]): names and countries of the sets
+        out_dir (str): directory the files are written to, one subdirectory per month
+        formats (Sequence[str]): any of FORMATS
+        charts (Sequence[str]): any of CHARTS
+        workers (int): number of processes, all cores by default, 1 renders in this process
+        plotlyjs (str): include_plotlyjs option of the HTML files
+        store_path (str): directory of the store
+        csv_path (str): source csv used to (re)build a missing or stale store
+    Returns:
+        Dict: number of tasks, written files and elapsed seconds
+    '''
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"formats must be in {FORMATS}, got {sorted(unknown)}")
+    if set(formats) & set(IMAGE_FORMATS) and not canRenderImages():
+        print("kaleido is not installed, skipping image formats")
+        formats = [i for i in formats if i not in IMAGE_FORMATS]
+
+    started = time.perf_counter()
+    # builds or refreshes the store before the workers open it
+    store = getLocalStore(store_path, csv_path)
+    months = [(year, month) for year, month in store.periods() if start <= f"{year}-{month:02d}" <= end]
+    tasks = []
+    for year, month in months:
+        if "choropleth" in charts:
+            tasks.append((year, month, None))
+        if set(charts) & {"scatter", "trends"}:
+            tasks += [(year, month, i) for i in range(len(country_sets))]
+
+    options = {"out_dir": out_dir, "formats": list(formats), "charts": list(charts), "plotlyjs": plotlyjs,
+               "country_sets": list(country_sets), "store_path": store_path}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _initWorker(options)
+        written = [_renderTask(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_initWorker, initargs=(options,)) as pool:
+            written = list(pool.map(_renderTask, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    files = [path for paths in written for path in paths]
+    return {"months": len(months), "tasks": len(tasks), "files": files,
+            "seconds": time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render dashboard charts for a range of months without a browser")
+    parser.add_argument("--start", default="1999-01", help="first month, YYYY-MM")
+    parser.add_argument("--end", default="2022-03", help="last month, YYYY-MM")
+    parser.add_argument("--countries", action="append", metavar="[NAME=]COUNTRY,COUNTRY",
+                        help="country set for scatterplots and trend plots, repeat for several sets")
+    parser.add_argument("--charts", nargs="+", choices=CHARTS, default=list(CHARTS))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["html"])
+    parser.add_argument("--out", default="exports", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--embed-plotlyjs", action="store_true", help="embed plotly.js in every HTML file")
+    parser.add_argument("--store", default=countries_cpi_ir_store, help="columnar store to render from")
+    parser.add_argument("--csv", default=countries_cpi_ir_data,
+                        help="combined csv to build a missing or stale store from")
+    args = parser.parse_args()
+
+    country_sets = [parseCountrySet(text, i) for i, text in enumerate(
+        args.countries or ["default=UK,Germany,Russian Federation,Japan,France,USA,Australia"])]
+    summary = exportCharts(args.start, args.end, country_sets, args.out, args.formats, args.charts,
+                           args.workers, True if args.embed_plotlyjs else "cdn", args.store, args.csv)
+    print(f"Rendered {summary['tasks']} tasks for {summary['months']} months into "
+          f"{len(summary['files'])} files in {summary['seconds']:.1f} s")
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CountryGroups:
+    '''
+    Long timeseries data sorted into contiguous per-country blocks
+
+    Every column is a single array; the rows of a country are the slice
+    offsets[code]:offsets[code + 1], so selecting a country is a lookup
+    rather than a scan and returns views, not copies.
+    '''
+    def __init__(self, countries: Iterable[str], offsets: np.ndarray, columns: Dict[str, np.ndarray]):
+        self._countries = list(countries)
+        self._codes = {country: code for code, country in enumerate(self._countries)}
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self._columns = columns
+
+    @classmethod
+    def fromFrame(cls, df: pd.DataFrame,
+                  country_column: str="Country",
+                  sort_column: Optional[str]="date",
+                  columns: Optional[Iterable[str]]=None) -> "CountryGroups":
+        '''
+        Group a long dataframe by country
+
+        Args:
+            df (pd.DataFrame): long dataframe with one row per country and date
+            country_column (str): column identifying the country
+            sort_column (str): column the rows of every country are sorted by, None keeps row order
+            columns (Iterable[str]): columns to keep, all but country_column by default
+        Returns:
+            CountryGroups: grouped columns
+        '''
+        codes, countries = pd.factorize(df[country_column], sort=False)
+        if sort_column is None:
+            order = np.argsort(codes, kind="stable")
+        else:
+            order = np.lexsort((df[sort_column].to_numpy(), codes))
+        order = order[codes[order] >= 0]
+        offsets = np.r_[0, np.cumsum(np.bincount(codes[order], minlength=len(countries)))]
+        columns = [i for i in df.columns if i != country_column] if columns is None else list(columns)
+        return cls(countries.astype(str), offsets, {column: df[column].to_numpy()[order] for column in columns})
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + sum(i.nbytes for i in self._columns.values())
+
+    def __contains__(self, country: str) -> bool:
+        return country in self._codes
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def countries(self) -> Tuple[str, ...]:
+        return tuple(self._countries)
+
+    def get(self, country: str, column: str) -> np.ndarray:
+        '''
+        Return the values of a column for a single country
+
+        Args:
+            country (str): country name, unknown countries give an empty array
+            column (str): column name
+        Returns:
+            np.ndarray: view of the country block
+        '''
+        values = self._columns[column]
+        code = self._codes.get(country)
+        if code is None:
+            return values[:0]
+        return values[self.offsets[code]:self.offsets[code + 1]]
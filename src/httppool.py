@@ -0,0 +1,131 @@
+import ssl
+import gzip
+import zlib
+import asyncio
+import urllib.parse
+from typing import Dict, Optional, Tuple
+
+
+class HTTPError(Exception):
+    '''
+    Response with a status other than 200
+    '''
+    def __init__(self, status: int, url: str, body: bytes=b""):
+        super().__init__(f"{status} for {url}: {body[:200].decode(errors='replace')}")
+        self.status = status
+        self.url = url
+        self.body = body
+
+
+class HTTPPool:
+    '''
+    Minimal asyncio HTTP/1.1 client keeping a pool of keep-alive connections to one origin
+
+    At most max_connections requests are in flight; further requests wait for
+    a free connection. Bodies may use Content-Length or chunked encoding and
+    are decompressed when gzip or deflate encoded.
+    '''
+    def __init__(self, base_url: str, max_connections: int=16, timeout: float=30.0,
+                 headers: Optional[Dict[str, str]]=None):
+        url = urllib.parse.urlsplit(base_url)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"expected an http(s) url, got {base_url!r}")
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Host": url.netloc, "Accept-Encoding": "gzip, deflate", **(headers or {})}
+        self.max_connections = max_connections
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = []
+        self.opened = 0
+
+    async def get(self, path: str, params: Optional[Dict[str, str]]=None) -> bytes:
+        '''
+        Request a path below the base url and return the decoded body
+
+        Args:
+            path (str): path relative to the base url, already quoted
+            params (Dict[str, str]): query parameters
+        Returns:
+            bytes: body of a 200 response
+        Raises:
+            HTTPError: for any other status
+        '''
+        target = self.prefix + path + (f"?{urllib.parse.urlencode(params)}" if params else "")
+        async with self._slots:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._open()
+            try:
+                status, headers, body, keep_alive = await asyncio.wait_for(
+                    self._exchange(connection, target), self.timeout)
+            except asyncio.TimeoutError:
+                # an OSError since 3.11, but a slow server is left to the caller's backoff
+                connection[1].close()
+                raise
+            except (OSError, asyncio.IncompleteReadError) as error:
+                connection[1].close()
+                if not reused:
+                    raise
+                # the server closed an idle connection, retry once on a fresh one
+                connection = await self._open()
+                status, headers, body, keep_alive = await asyncio.wait_for(
+                    self._exchange(connection, target), self.timeout)
+            except BaseException:
+                connection[1].close()
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                connection[1].close()
+        encoding = headers.get("content-encoding", "")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        if status != 200:
+            raise HTTPError(status, f"{self.host}{target}", body)
+        return body
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        self.opened += 1
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+
+    async def _exchange(self, connection: Tuple[asyncio.StreamReader, asyncio.StreamWriter],
+                        target: str) -> Tuple[int, Dict[str, str], bytes, bool]:
+        reader, writer = connection
+        lines = [f"GET {target} HTTP/1.1"] + [f"{k}: {v}" for k, v in self.headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            # no length: the body ends with the connection
+            body = await reader.read()
+            return status, headers, body, False
+        keep_alive = headers.get("connection", "").lower() != "close"
+        return status, headers, body, keep_alive
+
+    async def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
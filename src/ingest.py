@@ -0,0 +1,179 @@
+import os
+import json
+import argparse
+import datetime as dt
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from src.preprocessing import getCombinedCPIInterestRates, getMonthlyPeriods, defineText
+from src.store import ColumnarStore, appendStore, isStale, buildStore
+from src.utils import (cpi_path, ir_path, iso_conversions_path, eurozone_path,
+                       countries_cpi_ir_data, countries_cpi_ir_store)
+
+COLUMNS = ["year", "month", "ISO3", "InterestRate", "CPI", "name", "text_InterestRate", "text_CPI"]
+INDICATORS = ("InterestRate", "CPI")
+# BIS adds a month once any area reports it and the others follow over later releases,
+# CPI a few months behind the policy rates, so the last ingested months are read again
+REVISION_MONTHS = 6
+
+
+def readManifest(store_path: str) -> Dict:
+    '''
+    Read the manifest of ingested periods, initialising it from the store if absent
+
+    Args:
+        store_path (str): directory of the store
+    Returns:
+        Dict: manifest with "periods" (sorted "YYYY-MM" strings) and "releases"
+    '''
+    manifest_path = os.path.join(store_path, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as json_file:
+            return json.load(json_file)
+    periods = [f"{year}-{month:02d}" for year, month in ColumnarStore(store_path).periods()]
+    return {"periods": periods, "releases": []}
+
+
+def writeManifest(manifest: Dict, store_path: str) -> None:
+    manifest_path = os.path.join(store_path, "manifest.json")
+    with open(f"{manifest_path}.tmp", "w") as json_file:
+        json.dump(manifest, json_file, indent=1)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+
+def findPeriods(manifest: Dict, cpi_path: str, ir_path: str,
+                revision_months: int=REVISION_MONTHS) -> Tuple[List[str], List[str]]:
+    '''
+    Compare the headers of fresh BIS downloads with the manifest
+
+    New months are those present in both files and later than the last
+    ingested month. The last revision_months ingested months are returned
+    as well, they are read again to take in values reported since.
+
+    Args:
+        manifest (Dict): manifest of ingested periods
+        cpi_path (str): path to the fresh WS_LONG_CPI download
+        ir_path (str): path to the fresh WS_CBPOL_M download
+        revision_months (int): ingested months to read again
+    Returns:
+        Tuple[List[str], List[str]]: new and revised "YYYY-MM" periods in chronological order
+    '''
+    last = manifest["periods"][-1] if manifest["periods"] else ""
+    available = set(getMonthlyPeriods(cpi_path)) & set(getMonthlyPeriods(ir_path))
+    revised = manifest["periods"][-revision_months:] if revision_months > 0 else []
+    missing = [i for i in revised if i not in available]
+    if missing:
+        raise ValueError(f"The downloads do not contain the ingested months {missing}, "
+                         "they would be dropped from the store")
+    return sorted(i for i in available if i > last), revised
+
+
+def _isStored(df: pd.DataFrame, store: ColumnarStore, periods: List[str]) -> bool:
+    '''
+    Check whether df holds the stored rows of periods, values compared at the precision of the store
+    '''
+    columns = ["year", "month", "ISO3", "name", *INDICATORS]
+    stored = pd.concat([store.getMonth(int(i[:4]), int(i[5:]), columns=columns) for i in periods],
+                       ignore_index=True)
+    dtypes = {column: str if isinstance(dtype, pd.CategoricalDtype) else dtype
+              for column, dtype in stored.dtypes.items()}
+    df = df.sort_values(["year", "month", "ISO3"], kind="mergesort")[columns].reset_index(drop=True)
+    return len(df) == len(stored) and df.astype(dtypes).equals(stored.astype(dtypes))
+
+
+def replaceCSVMonths(df: pd.DataFrame, csv_path: str, first: str) -> None:
+    '''
+    Replace the rows of the combined csv from month first on by df
+
+    The lines of earlier months are copied as they are, without parsing
+    their values, and the csv is swapped in one rename.
+
+    Args:
+        df (pd.DataFrame): rows with the columns of the csv, "year" and "month" first
+        csv_path (str): combined csv
+        first (str): first "YYYY-MM" month to replace
+    '''
+    first_month = (int(first[:4]), int(first[5:]))
+    tmp_path = f"{csv_path}.tmp"
+    with open(csv_path, encoding="utf-8", newline="") as source, \
+            open(tmp_path, "w", encoding="utf-8", newline="") as target:
+        target.write(source.readline())
+        for line in source:
+            year, month, _ = line.split(",", 2)
+            if (int(year), int(month)) < first_month:
+                target.write(line)
+        df.to_csv(target, header=False, index=False)
+    os.replace(tmp_path, csv_path)
+
+
+def ingest(cpi_path: str=cpi_path, ir_path: str=ir_path,
+           iso_conversions_path: str=iso_conversions_path,
+           eurozone_path: str=eurozone_path,
+           csv_path: Optional[str]=countries_cpi_ir_data,
+           store_path: str=countries_cpi_ir_store,
+           revision_months: int=REVISION_MONTHS) -> List[str]:
+    '''
+    Append months from a fresh BIS release to the combined dataset
+
+    Only the new period columns and the last revision_months ingested ones
+    are parsed and processed. Areas reporting a month after it was first
+    ingested, typically CPI, are taken in this way: the rows of the revised
+    months are replaced in the store (see store.appendStore) and the csv,
+    the months before them are copied as they are. Revisions of older
+    months need a rebuild of the combined csv and the store. Nothing is
+    written if there are no new months and the revised ones are unchanged.
+
+    Args:
+        cpi_path (str): path to the fresh WS_LONG_CPI download
+        ir_path (str): path to the fresh WS_CBPOL_M download
+        iso_conversions_path (str): path to the file containing ISO conversions
+        eurozone_path (str): path to the file containing Eurozone countries and euro adoption dates
+        csv_path (str): combined csv the new rows are written to, None to skip it
+        store_path (str): columnar store the new rows are written to
+        revision_months (int): last ingested months to read again, see findPeriods
+    Returns:
+        List[str]: revised and new periods written, empty if the release changes nothing
+    '''
+    if isStale(store_path, csv_path):
+        if csv_path is None or not os.path.exists(csv_path):
+            raise FileNotFoundError(f"The store {store_path} is missing or outdated and there is no combined csv "
+                                    "to build it from, run python -m src.store first")
+        buildStore(csv_path, store_path)
+    manifest = readManifest(store_path)
+    new, revised = findPeriods(manifest, cpi_path, ir_path, revision_months)
+    periods = revised + new
+    if not periods:
+        return []
+
+    new_df = getCombinedCPIInterestRates(cpi_path, ir_path, iso_conversions_path, eurozone_path,
+                                         date_range=(periods[0], periods[-1]))
+    new_df = defineText(new_df, INDICATORS)[COLUMNS]
+    if not new and _isStored(new_df, ColumnarStore(store_path), revised):
+        return []
+
+    # the csv goes first, the store has to be newer than it or it counts as stale
+    if csv_path is not None:
+        replaceCSVMonths(new_df, csv_path, periods[0])
+    appendStore(new_df, store_path, replace=True)
+
+    manifest["periods"] = [i for i in manifest["periods"] if i < periods[0]] + periods
+    manifest["releases"].append({"ingested_at": dt.datetime.now().isoformat(timespec="seconds"),
+                                 "cpi_path": os.path.abspath(cpi_path),
+                                 "ir_path": os.path.abspath(ir_path),
+                                 "periods": new,
+                                 "revised": revised,
+                                 "rows": len(new_df)})
+    writeManifest(manifest, store_path)
+    return periods
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new months from a BIS release to the combined store")
+    parser.add_argument("--cpi", default=cpi_path, help="fresh WS_LONG_CPI_csv_col download")
+    parser.add_argument("--ir", default=ir_path, help="fresh WS_CBPOL_M_csv_col download")
+    parser.add_argument("--csv", default=countries_cpi_ir_data, help="combined csv to append to")
+    parser.add_argument("--store", default=countries_cpi_ir_store, help="columnar store to append to")
+    parser.add_argument("--revise", type=int, default=REVISION_MONTHS, help="last ingested months to read again")
+    args = parser.parse_args()
+    periods = ingest(args.cpi, args.ir, csv_path=args.csv, store_path=args.store, revision_months=args.revise)
+    print(f"Ingested {len(periods)} months" + (f": {periods[0]} to {periods[-1]}" if periods else ""))
@@ -0,0 +1,116 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Optional
+
+from src.utils import iso_conversions_path, iso_to_name_path
+
+KINDS = ("ISO2", "ISO3", "name")
+
+
+class CodeTable:
+    '''
+    ISO2 codes, ISO3 codes and country names of every known area under one integer code
+
+    Identifier columns are translated by factorizing them, looking up the few
+    distinct values and indexing small per-code arrays with the result, so
+    long frames never go through DataFrame.replace, Series.map over every row
+    or a merge. Areas without an ISO2 code, e.g. historic ISO3 codes with only
+    a name, have "" as ISO2.
+    '''
+    def __init__(self, iso2: Iterable[str], iso3: Iterable[str], names: Iterable[str]):
+        self.values = {"ISO2": np.asarray(list(iso2), dtype=object),
+                       "ISO3": np.asarray(list(iso3), dtype=object),
+                       "name": np.asarray(list(names), dtype=object)}
+        # the first area listed wins when a value is shared
+        self._codes = {kind: {value: code for code, value in reversed(list(enumerate(values))) if value != ""}
+                       for kind, values in self.values.items()}
+
+    @classmethod
+    def fromFiles(cls, conversions_path: str=iso_conversions_path,
+                  names_path: Optional[str]=iso_to_name_path) -> "CodeTable":
+        '''
+        Read a conversion file and, optionally, further ISO3 names
+
+        Args:
+            conversions_path (str): csv with "ISO2", "ISO3" and "name" columns
+                like iso_name_conversions.csv, or json of ISO3 by ISO2 like iso_conversions.json
+            names_path (str): csv with "ISO3" and "name" columns like iso_to_name.csv,
+                names of ISO3 codes the conversions do not name
+        Returns:
+            CodeTable: one code per ISO3 code
+        '''
+        if conversions_path.endswith(".json"):
+            with open(conversions_path) as json_file:
+                pairs = json.load(json_file)
+            areas = pd.DataFrame({"ISO2": list(pairs), "ISO3": list(pairs.values()), "name": ""})
+        else:
+            # empty cells, e.g. the ISO2 of Namibia, stay "" instead of NaN
+            areas = pd.read_csv(conversions_path, keep_default_na=False, dtype=str)
+        if names_path is not None:
+            names = pd.read_csv(names_path, encoding="latin1", keep_default_na=False, dtype=str)
+            names = names.drop_duplicates("ISO3").set_index("ISO3")["name"]
+            areas["name"] = areas["name"].where(areas["name"] != "", areas["ISO3"].map(names).fillna(""))
+            extra = names[~names.index.isin(areas["ISO3"])]
+            areas = pd.concat([areas, pd.DataFrame({"ISO2": "", "ISO3": extra.index, "name": extra.to_numpy()})],
+                              ignore_index=True)
+        return cls(areas["ISO2"], areas["ISO3"], areas["name"])
+
+    def __len__(self) -> int:
+        return len(self.values["ISO3"])
+
+    def translate(self, values: Any, source: str="ISO2", target: str="ISO3",
+                  keep: bool=True) -> np.ndarray:
+        '''
+        Translate identifiers from one kind to another
+
+        Args:
+            values (Any): array, series or categorical of identifiers
+            source (str): kind of values, one of KINDS
+            target (str): kind to return, one of KINDS
+            keep (bool): keep values that are not known, otherwise they become None
+        Returns:
+            np.ndarray: object array of identifiers
+        '''
+        positions, uniques = pd.factorize(values)
+        lookup = self._codes[source]
+        translated = np.empty(len(uniques) + 1, dtype=object)
+        for i, value in enumerate(uniques):
+            code = lookup.get(value, -1)
+            found = self.values[target][code] if code >= 0 else ""
+            translated[i] = found if found != "" else (value if keep else None)
+        translated[-1] = None
+        return translated[positions]
+
+    def mapping(self, source: str="ISO2", target: str="ISO3") -> Dict[str, str]:
+        '''
+        Return a dictionary from one kind to another, e.g. for renaming columns
+        '''
+        return {value: self.values[target][code] for value, code in self._codes[source].items()
+                if self.values[target][code] != ""}
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def loadCodeTable(conversions_path: str=iso_conversions_path,
+                  names_path: Optional[str]=iso_to_name_path) -> CodeTable:
+    '''
+    Return the shared code table of conversion files, read once per process and again after they change
+
+    Args:
+        conversions_path (str): see CodeTable.fromFiles
+        names_path (str): see CodeTable.fromFiles
+    Returns:
+        CodeTable: shared, read-only table
+    '''
+    # src.data imports the modules using this table, so it is only imported once they are loaded
+    from src.data import fileKey
+
+    key = (fileKey(conversions_path), names_path and fileKey(names_path))
+    with _tables_lock:
+        if key not in _tables:
+            _tables[key] = CodeTable.fromFiles(conversions_path, names_path)
+        return _tables[key]
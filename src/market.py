@@ -0,0 +1,243 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import urllib.parse
+import datetime as dt
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Optional, Union
+
+from src.httppool import HTTPPool, HTTPError
+from src.ohlc import OHLCStore, FIELDS
+from src.utils import top100_path, futures_path, currencies_path, crypto_path, ohlc_store
+
+logger = logging.getLogger(__name__)
+
+UNIVERSES = {
+    "top100": top100_path,
+    "futures": futures_path,
+    "currencies": currencies_path,
+    "crypto": crypto_path,
+}
+DEFAULT_START = "2000-01-01"
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart"
+# rate limiting and server errors are worth another attempt, anything else is not
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def loadUniverse(name: str, path: Optional[str]=None) -> pd.DataFrame:
+    '''
+    Read the symbols of a bundled universe file
+
+    currencies.csv interleaves every pair with a "EUR/USD,,0" row that has no
+    description; such rows are dropped.
+
+    Args:
+        name (str): key of UNIVERSES
+        path (str): file to read instead of the bundled one
+    Returns:
+        pd.DataFrame: "Symbol" and "Description" columns
+    '''
+    df = pd.read_csv(path or UNIVERSES[name], usecols=[0, 1], keep_default_na=False, dtype=str)
+    df.columns = ["Symbol", "Description"]
+    df = df.apply(lambda column: column.str.strip())
+    return df[df.Description != ""].drop_duplicates("Symbol").reset_index(drop=True)
+
+
+def universeSymbols(names: Optional[Iterable[str]]=None) -> Dict[str, str]:
+    '''
+    Map the symbols of several universes to the universe they are listed in
+
+    Args:
+        names (Iterable[str]): keys of UNIVERSES, all by default
+    Returns:
+        Dict[str, str]: universe by symbol, in file order
+    '''
+    symbols = {}
+    for name in (UNIVERSES if names is None else names):
+        for symbol in loadUniverse(name).Symbol:
+            symbols.setdefault(symbol, name)
+    return symbols
+
+
+def parseChart(body: bytes) -> pd.DataFrame:
+    '''
+    Parse a chart API response into daily bars, bars without a close are dropped
+
+    Args:
+        body (bytes): JSON with chart.result[0].timestamp and indicators.quote[0]
+    Returns:
+        pd.DataFrame: "date" (datetime64[D]) and FIELDS columns
+    '''
+    chart = json.loads(body)["chart"]
+    if chart.get("error"):
+        raise ValueError(chart["error"])
+    result = chart["result"][0]
+    timestamps = np.array(result.get("timestamp") or [], dtype="int64")
+    # timestamps are the session opens, the exchange offset gives their local date
+    offset = result.get("meta", {}).get("gmtoffset") or 0
+    quote = (result.get("indicators", {}).get("quote") or [{}])[0]
+    df = pd.DataFrame({"date": ((timestamps + offset) // 86400).astype("datetime64[D]"),
+                       **{field: np.array(quote.get(field) or [None] * len(timestamps), dtype="float64")
+                          for field in FIELDS}})
+    return df[df.close.notna()].reset_index(drop=True)
+
+
+class Provider:
+    '''
+    Source of daily bars for the fetcher
+
+    Subclasses implement bars(); close() releases their connections.
+    '''
+    async def bars(self, symbol: str, start: np.datetime64, end: np.datetime64) -> pd.DataFrame:
+        '''
+        Return the bars of a symbol from start up to but excluding end, "date" and FIELDS columns
+        '''
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class ChartProvider(Provider):
+    '''
+    Daily bars from a Yahoo Finance style chart API
+
+    Requests go to {base_url}/{symbol}?period1=...&period2=...&interval=1d
+    over a pool of keep-alive connections; base_url can point at a local
+    stand-in server.
+    '''
+    def __init__(self, base_url: str=YAHOO_CHART_URL, max_connections: int=16, timeout: float=30.0):
+        self.pool = HTTPPool(base_url, max_connections, timeout, headers={"User-Agent": "financial-markets"})
+
+    async def bars(self, symbol: str, start: np.datetime64, end: np.datetime64) -> pd.DataFrame:
+        seconds = lambda day: int(day.astype("datetime64[s]").astype("int64"))
+        body = await self.pool.get(f"/{urllib.parse.quote(symbol, safe='')}",
+                                   {"period1": seconds(start), "period2": seconds(end), "interval": "1d"})
+        return parseChart(body)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+async def fetchSymbol(provider: Provider, store: OHLCStore, symbol: str,
+                      start: np.datetime64, end: np.datetime64,
+                      retries: int=3, backoff: float=0.5) -> int:
+    '''
+    Fetch the bars of a symbol missing from the store and append them
+
+    Only days after the last stored bar are requested. Failed requests are
+    retried with exponential backoff and jitter when the error is transient.
+
+    Args:
+        provider (Provider): source of bars
+        store (OHLCStore): store the bars are appended to
+        symbol (str): ticker
+        start (np.datetime64): first day for a symbol without bars
+        end (np.datetime64): day to stop before
+        retries (int): further attempts after a failed request
+        backoff (float): seconds before the first retry, doubled for every further one
+    Returns:
+        int: number of bars added
+    '''
+    last = store.lastDate(symbol)
+    first = start if last is None else last + 1
+    if first >= end:
+        return 0
+    for attempt in range(retries + 1):
+        try:
+            bars = await provider.bars(symbol, first, end)
+            break
+        except HTTPError as error:
+            if error.status not in RETRY_STATUSES or attempt == retries:
+                raise
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+    # append rewrites the column files of the symbol, other requests go on meanwhile
+    return await asyncio.to_thread(store.append, symbol, bars)
+
+
+async def fetchAll(symbols: Iterable[str], store: OHLCStore, provider: Provider,
+                   start: np.datetime64, end: np.datetime64,
+                   concurrency: int=16, retries: int=3, backoff: float=0.5) -> Dict[str, Union[int, Exception]]:
+    '''
+    Fetch missing bars of many symbols with at most concurrency requests in flight
+
+    Returns:
+        Dict[str, Union[int, Exception]]: bars added, or the error of a symbol that failed
+    '''
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(symbol):
+        async with slots:
+            try:
+                return await fetchSymbol(provider, store, symbol, start, end, retries, backoff)
+            except Exception as error:
+                logger.warning("%s: %s", symbol, error)
+                return error
+
+    symbols = list(symbols)
+    return dict(zip(symbols, await asyncio.gather(*(one(symbol) for symbol in symbols))))
+
+
+def refresh(universes: Optional[Iterable[str]]=None,
+            store_path: str=ohlc_store,
+            provider: Optional[Provider]=None,
+            start: str=DEFAULT_START,
+            end: Optional[str]=None,
+            concurrency: int=16,
+            retries: int=3,
+            backoff: float=0.5) -> Dict[str, Any]:
+    '''
+    Bring the OHLC store up to date for the symbols of one or more universes
+
+    Args:
+        universes (Iterable[str]): keys of UNIVERSES, all by default
+        store_path (str): directory of the OHLC store
+        provider (Provider): source of bars, ChartProvider by default; closed when done
+        start (str): first day for symbols without bars
+        end (str): day to stop before, today by default so only complete days are stored
+        concurrency (int): requests in flight and size of the connection pool
+        retries (int): further attempts after a transient failure
+        backoff (float): seconds before the first retry
+    Returns:
+        Dict[str, Any]: "symbols", "bars" added, "failed" errors by symbol and "seconds"
+    '''
+    symbols = universeSymbols(universes)
+    store = OHLCStore(store_path)
+    first, stop = np.datetime64(start, "D"), np.datetime64(end or dt.date.today().isoformat(), "D")
+
+    async def run():
+        source = provider or ChartProvider(max_connections=concurrency)
+        try:
+            return await fetchAll(symbols, store, source, first, stop, concurrency, retries, backoff)
+        finally:
+            await source.close()
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    return {"symbols": len(symbols),
+            "bars": sum(i for i in results.values() if isinstance(i, int)),
+            "failed": {symbol: i for symbol, i in results.items() if isinstance(i, Exception)},
+            "seconds": time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch missing daily bars of the bundled symbol universes")
+    parser.add_argument("--universes", nargs="+", choices=list(UNIVERSES), default=None, help="all by default")
+    parser.add_argument("--store", default=ohlc_store, help="OHLC store directory")
+    parser.add_argument("--base-url", default=YAHOO_CHART_URL, help="chart API, e.g. a local stand-in server")
+    parser.add_argument("--start", default=DEFAULT_START, help="first day for symbols without bars")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    summary = refresh(args.universes, args.store, ChartProvider(args.base_url, args.concurrency),
+                      args.start, concurrency=args.concurrency)
+    print(f"{summary['bars']} new bars for {summary['symbols']} symbols in {summary['seconds']:.1f} s, "
+          f"{len(summary['failed'])} failed")
+    for symbol, error in summary["failed"].items():
+        print(f"  {symbol}: {error}")
@@ -0,0 +1,152 @@
+import os
+import json
+import threading
+import urllib.parse
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils import ohlc_store
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class OHLCStore:
+    '''
+    On-disk columnar store of daily bars, one directory of column files per symbol
+
+    Every symbol has a "date" column (datetime64[D]) and float64 FIELDS,
+    sorted by date. Updates only append bars after the last stored date:
+    the column files are replaced by longer ones and index.json, which holds
+    the row count and date range of every symbol, is replaced last. Readers
+    slice the columns to the row count of the index they loaded, so a
+    concurrent update never shows them a partial bar.
+    '''
+    def __init__(self, path: str=ohlc_store):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = self._readIndex()
+
+    def _readIndex(self) -> Dict[str, Dict]:
+        index_path = os.path.join(self.path, "index.json")
+        if not os.path.exists(index_path):
+            return {}
+        with open(index_path) as json_file:
+            return json.load(json_file)
+
+    def _symbolPath(self, symbol: str) -> str:
+        return os.path.join(self.path, urllib.parse.quote(symbol, safe=""))
+
+    def reload(self) -> None:
+        '''
+        Pick up updates written by other processes
+        '''
+        with self._lock:
+            self._index = self._readIndex()
+
+    def symbols(self) -> List[str]:
+        return sorted(self._index)
+
+    def info(self, symbol: str) -> Optional[Dict]:
+        '''
+        Return "rows", "first" and "last" date of a symbol, None if it has no bars
+        '''
+        return self._index.get(symbol)
+
+    def lastDate(self, symbol: str) -> Optional[np.datetime64]:
+        info = self._index.get(symbol)
+        return None if info is None else np.datetime64(info["last"], "D")
+
+    def columns(self, symbol: str, fields: Iterable[str]=("date", *FIELDS)) -> Dict[str, np.ndarray]:
+        '''
+        Return memory-mapped columns of a symbol, empty arrays if it has no bars
+        '''
+        info = self._index.get(symbol)
+        if info is None:
+            return {field: np.empty(0, dtype="datetime64[D]" if field == "date" else "float64") for field in fields}
+        return {field: np.load(os.path.join(self._symbolPath(symbol), f"{field}.npy"), mmap_mode="r")[:info["rows"]]
+                for field in fields}
+
+    def read(self, symbol: str, start: Optional[str]=None, end: Optional[str]=None) -> pd.DataFrame:
+        '''
+        Return the bars of a symbol between two dates, both included
+
+        Args:
+            symbol (str): ticker
+            start (str): first date, e.g. "2020-01-01", the first bar by default
+            end (str): last date, the last bar by default
+        Returns:
+            pd.DataFrame: "date" and FIELDS columns
+        '''
+        columns = self.columns(symbol)
+        dates = columns["date"]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"), "left")
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, "D"), "right")
+        return pd.DataFrame({field: np.array(values[lo:hi]) for field, values in columns.items()})
+
+    def append(self, symbol: str, bars: pd.DataFrame) -> int:
+        '''
+        Add bars later than the last stored one
+
+        Args:
+            symbol (str): ticker
+            bars (pd.DataFrame): "date" and FIELDS columns, in any order, may overlap stored bars
+        Returns:
+            int: number of bars added
+        '''
+        dates = pd.to_datetime(bars["date"]).to_numpy().astype("datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        dates = dates[order]
+        keep = np.r_[dates[1:] != dates[:-1], True] if len(dates) else np.empty(0, dtype=bool)
+        last = self.lastDate(symbol)
+        if last is not None:
+            keep &= dates > last
+        if not keep.any():
+            return 0
+        new = {"date": dates[keep], **{field: bars[field].to_numpy("float64")[order][keep] for field in FIELDS}}
+        old = self.columns(symbol)
+        symbol_path = self._symbolPath(symbol)
+        os.makedirs(symbol_path, exist_ok=True)
+        for field, values in new.items():
+            path = os.path.join(symbol_path, f"{field}.npy")
+            with open(f"{path}.tmp", "wb") as npy_file:
+                np.save(npy_file, np.concatenate([old[field], values]))
+            os.replace(f"{path}.tmp", path)
+        rows = len(old["date"]) + len(new["date"])
+        with self._lock:
+            self._index[symbol] = {"rows": rows,
+                                   "first": str(old["date"][0] if len(old["date"]) else new["date"][0]),
+                                   "last": str(new["date"][-1])}
+            self._writeIndex()
+        return len(new["date"])
+
+    def _writeIndex(self) -> None:
+        index_path = os.path.join(self.path, "index.json")
+        with open(f"{index_path}.tmp", "w") as json_file:
+            json.dump(self._index, json_file)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    def panel(self, symbols: Iterable[str], field: str="close",
+              start: Optional[str]=None, end: Optional[str]=None) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Align one field of several symbols on the union of their dates
+
+        Args:
+            symbols (Iterable[str]): tickers, one row each
+            field (str): one of FIELDS
+            start (str): first date, all by default
+            end (str): last date, all by default
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: dates and a symbols x dates array, NaN where a symbol has no bar
+        '''
+        series = []
+        for symbol in symbols:
+            columns = self.columns(symbol, ("date", field))
+            lo = 0 if start is None else np.searchsorted(columns["date"], np.datetime64(start, "D"), "left")
+            hi = len(columns["date"]) if end is None else np.searchsorted(columns["date"], np.datetime64(end, "D"), "right")
+            series.append((columns["date"][lo:hi], columns[field][lo:hi]))
+        dates = np.unique(np.concatenate([i[0] for i in series])) if series else np.empty(0, "datetime64[D]")
+        values = np.full((len(series), len(dates)), np.nan)
+        for row, (days, column) in enumerate(series):
+            values[row, np.searchsorted(dates, days)] = column
+        return dates, values
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional, Tuple
+
+from src.bisreader import iterSeries, periodsToDates
+from src.utils import ir_daily_path, iso_conversions_path, eurozone_path
+from src.isocodes import loadCodeTable
+
+FREQUENCIES = ("D", "W", "M")
+AGGREGATIONS = ("last", "mean")
+
+
+def _compress(days: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    '''
+    Reduce a daily series to its change-points, forward filling gaps like getInterestRates
+
+    Args:
+        days (np.ndarray): int32 day numbers (days since 1970-01-01)
+        values (np.ndarray): float32 daily values with NaN for missing days
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: change-point days, values and the last observed day
+    '''
+    observed = np.flatnonzero(~np.isnan(values))
+    if len(observed) == 0:
+        return np.empty(0, dtype="int32"), np.empty(0, dtype="float32"), -1
+    values = values[observed]
+    changes = np.r_[True, values[1:] != values[:-1]]
+    return days[observed][changes], values[changes], int(days[observed[-1]])
+
+
+class PolicyRates:
+    '''
+    Compact store of daily central bank policy rates
+
+    Policy rates are step functions, so every country keeps only the days on
+    which its rate changed. Daily, weekly or monthly values (last or mean) are
+    computed on demand from the change-points.
+    '''
+    def __init__(self, countries: List[str], offsets: np.ndarray, days: np.ndarray,
+                 values: np.ndarray, last_days: np.ndarray):
+        self._countries = list(countries)
+        self._codes = {country: code for code, country in enumerate(self._countries)}
+        self.offsets = offsets
+        self.days = days
+        self.values = values
+        self.last_days = last_days
+
+    @classmethod
+    def fromBIS(cls, ir_daily_path: str=ir_daily_path,
+                iso_conversions_path: str=iso_conversions_path,
+                eurozone_path: str=eurozone_path) -> "PolicyRates":
+        '''
+        Build the change-point store from the BIS daily policy rate file
+
+        The euro area rate is assigned to Eurozone members from January of
+        their adoption year, as in expandCPIInterestRates.
+
+        Args:
+            ir_daily_path (str): path to WS_CBPOL_D_csv_col.csv
+            iso_conversions_path (str): path to the file containing ISO conversions
+            eurozone_path (str): path to the file containing Eurozone countries and euro adoption dates
+        Returns:
+            PolicyRates: compact store keyed by country name
+        '''
+        names = loadCodeTable(iso_conversions_path).mapping("ISO2", "name")
+        series = {}
+        for metadata, periods, values in iterSeries(ir_daily_path, frequency="D"):
+            days = periodsToDates(periods).astype("int64").astype("int32")
+            series[metadata["REF_AREA"]] = _compress(days, values)
+
+        eu_index = pd.read_csv(eurozone_path)
+        if "XM" in series:
+            xm_days, xm_values, xm_last = series.pop("XM")
+            for iso2, year in zip(eu_index.ISO2, eu_index.Adoption):
+                start = int(np.datetime64(f"{year}-01-01", "D").astype("int64"))
+                first = max(np.searchsorted(xm_days, start, side="right") - 1, 0)
+                days = xm_days[first:].copy()
+                days[0] = max(days[0], start)
+                series[iso2] = (days, xm_values[first:], xm_last)
+
+        countries, days, values, last_days = [], [], [], []
+        for iso2, (area_days, area_values, last_day) in series.items():
+            if iso2 not in names or len(area_days) == 0:
+                continue
+            countries.append(names[iso2])
+            days.append(area_days)
+            values.append(area_values)
+            last_days.append(last_day)
+        offsets = np.r_[0, np.cumsum([len(i) for i in days])].astype("int32")
+        return cls(countries, offsets, np.concatenate(days).astype("int32"),
+                   np.concatenate(values).astype("float32"), np.array(last_days, dtype="int32"))
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.days.nbytes + self.values.nbytes + self.last_days.nbytes
+
+    def countries(self) -> Tuple[str, ...]:
+        return tuple(self._countries)
+
+    def changes(self, country: str) -> pd.DataFrame:
+        '''
+        Return the change-points of a single country
+
+        Args:
+            country (str): country name
+        Returns:
+            pd.DataFrame: columns "date" and "InterestRate", one row per rate change
+        '''
+        code = self._codes[country]
+        block = slice(self.offsets[code], self.offsets[code + 1])
+        return pd.DataFrame({"date": self.days[block].astype("datetime64[D]").astype("datetime64[ns]"),
+                             "InterestRate": self.values[block]})
+
+    def _periods(self, first: int, last: int, freq: str) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Return first and last day of every period of freq overlapping [first, last]
+        '''
+        if freq == "D":
+            starts = np.arange(first, last + 1)
+            return starts, starts
+        if freq == "W":
+            # weeks run Monday to Sunday, day 0 (1970-01-01) is a Thursday
+            starts = np.arange(first - (first + 3) % 7, last + 1, 7)
+            return starts, starts + 6
+        months = np.arange(np.datetime64(first, "D").astype("datetime64[M]"),
+                           np.datetime64(last, "D").astype("datetime64[M]") + 1)
+        starts = months.astype("datetime64[D]").astype("int64")
+        return starts, (months + 1).astype("datetime64[D]").astype("int64") - 1
+
+    def resample(self, countries: Iterable[str], freq: str="M", how: str="last",
+                 date_range: Optional[Tuple[str, str]]=None) -> pd.DataFrame:
+        '''
+        Aggregate the daily policy rates of selected countries
+
+        Args:
+            countries (Iterable[str]): country names, unknown names are skipped
+            freq (str): "D" daily, "W" weekly (Monday to Sunday) or "M" monthly
+            how (str): "last" value of the period or time-weighted "mean" over the period
+            date_range (Tuple[str, str]): first and last day to include, e.g. ("1999-01-01", "2022-03-31")
+        Returns:
+            pd.DataFrame: columns "Country", "date" (period start) and "InterestRate"
+        '''
+        if freq not in FREQUENCIES:
+            raise ValueError(f"freq must be one of {FREQUENCIES}")
+        if how not in AGGREGATIONS:
+            raise ValueError(f"how must be one of {AGGREGATIONS}")
+        window = (-np.inf, np.inf) if date_range is None else \
+            tuple(np.datetime64(i, "D").astype("int64") for i in date_range)
+
+        frames = []
+        for country in countries:
+            code = self._codes.get(country)
+            if code is None:
+                continue
+            days = self.days[self.offsets[code]:self.offsets[code + 1]].astype("int64")
+            values = self.values[self.offsets[code]:self.offsets[code + 1]]
+            first, last = max(days[0], window[0]), min(self.last_days[code], window[1])
+            if first > last:
+                continue
+            starts, ends = self._periods(int(first), int(last), freq)
+            lows, highs = np.maximum(starts, first), np.minimum(ends, last)
+            if how == "last":
+                rates = values[np.searchsorted(days, highs, side="right") - 1]
+            else:
+                # integral of the step function up to (not including) a given day
+                cumulative = np.r_[0, np.cumsum(values[:-1] * np.diff(days))]
+                def integral(day):
+                    idx = np.searchsorted(days, day, side="right") - 1
+                    return cumulative[idx] + values[idx] * (day - days[idx])
+                rates = ((integral(highs + 1) - integral(lows)) / (highs + 1 - lows)).astype("float32")
+            frames.append(pd.DataFrame({
+                "Country": country,
+                "date": starts.astype("datetime64[D]").astype("datetime64[ns]"),
+                "InterestRate": rates}))
+        if not frames:
+            return pd.DataFrame({"Country": [], "date": np.array([], dtype="datetime64[ns]"),
+                                 "InterestRate": np.array([], dtype="float32")})
+        return pd.concat(frames, ignore_index=True)
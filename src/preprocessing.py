@@ -1,7 +1,12 @@
 import pandas as pd
-import json
-import streamlit as st 
+import numpy as np
 from typing import Tuple, List, Union
+
+from src.data import cached
+from src.bisreader import FREQUENCIES, readHeader, readLong
+from src.schema import formatText
+from src.isocodes import CodeTable, loadCodeTable
+
 def reformatEU(target_df: pd.DataFrame, 
                eurozone_countries: str) -> pd.DataFrame:
     '''
@@ -25,17 +30,19 @@ def reassignISO2toISO3(target_df: pd.DataFrame,
     '''
     Replace ISO2 with ISO3 values
     
+    Only the text columns are translated, through the distinct values of
+    each column instead of every cell; values without a conversion are kept.
+    
     Args:
         target_df (pandas.DataFrame): the dataframe that will receive updates
         iso_conversions (str): path to file with iso2 to iso3 conversions
     Returns:
         pandas.DataFrame: updated target_df
     '''
-    
-    with open(iso_conversions) as json_file:
-        ISO_conversions = json.load(json_file)
-    
-    return target_df.replace(ISO_conversions)
+    table = loadCodeTable(iso_conversions, None)
+    columns = target_df.select_dtypes(include=["object"]).columns
+    return target_df.assign(**{column: table.translate(target_df[column], "ISO2", "ISO3") 
+                               for column in columns})
     
     
 def getInterestRates(cutoff_date: str, 
@@ -66,7 +73,7 @@ def getInterestRates(cutoff_date: str,
     
     return target_df
 
-@st.cache(suppress_st_warning=True)   
+@cached
 def formatIRData(cutoff_date: str, 
                  ir_path: str, 
                  iso_conversions: str, 
@@ -90,18 +97,79 @@ def formatIRData(cutoff_date: str,
     target_df = reformatEU(target_df, eurozone_countries)
     
     target_df = pd.melt(target_df, id_vars=["date"], var_name="ISO3", value_name="interest rate")
-    target_df = reassignISO2toISO3(target_df, iso_conversions)
-    target_df = target_df.merge(pd.read_csv(iso_to_country_name, encoding='latin1'))
-    target_df["text"] = target_df.apply(lambda row: f"{row['name']}<br>{row['interest rate']}%", axis=1)
+    table = loadCodeTable(iso_conversions, iso_to_country_name)
+    target_df["ISO3"] = table.translate(target_df["ISO3"], "ISO2", "ISO3")
+    target_df["name"] = table.translate(target_df["ISO3"], "ISO3", "name", keep=False)
+    # areas without a name are dropped, as by an inner merge with the names
+    target_df = _namedRows(target_df)
+    target_df["text"] = formatText(target_df["name"], target_df["interest rate"], spec="")
 
     return target_df[["date", "ISO3", "name", "interest rate", "text"]]
 
 
-@st.cache(suppress_st_warning=True)
+def _namedRows(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Keep the rows with a "name", grouped by "ISO3" in order of first appearance like DataFrame.merge
+    '''
+    groups, _ = pd.factorize(df["ISO3"])
+    order = np.argsort(groups, kind="stable")
+    order = order[pd.notna(df["name"].to_numpy()[order])]
+    return df.take(order).reset_index(drop=True)
+
+def isMonthlyPeriod(column: str) -> bool:
+    '''
+    Check whether a BIS column name is a monthly period such as "2022-03"
+    '''
+    return FREQUENCIES["M"].fullmatch(column) is not None
+
+def getMonthlyPeriods(path: str) -> List[str]:
+    '''
+    Read only the header of a wide BIS file and return its monthly period columns
+    
+    Args:
+        path (str): path to a BIS csv_col file
+    Returns:
+        List[str]: monthly periods in file order
+    '''
+    return [i for i in readHeader(path)[1] if isMonthlyPeriod(i)]
+
+def getMonthlyLong(path: str, indicator: str, 
+                   iso_conversions: CodeTable, 
+                   date_range: Tuple[str, str]=('1999-01', '2022-03'),
+                   filters: dict=None,
+                   interpolate: bool=False) -> pd.DataFrame:
+    '''
+    Stream monthly series from a wide BIS file straight into long format
+    
+    Equivalent to getMonthly followed by a melt, without reading the whole 
+    file or transposing it.
+    
+    Args: 
+        path (str): path to a BIS csv_col file
+        indicator (str): name of the value column
+        iso_conversions (CodeTable): ISO2 to ISO3 conversions, see isocodes.loadCodeTable
+        date_range (Tuple[str, str]): first and last month to keep, inclusive
+        filters (dict): required values of metadata columns, see bisreader.iterSeries
+        interpolate (bool): linearly interpolate missing months within each country
+    Returns:
+        pd.DataFrame: long dataframe with columns "date", "ISO3" and indicator
+    '''
+    df = readLong(path, filters=filters, date_range=date_range, frequency="M", dtype="float64")
+    # one conversion per area, the key column holds "XX:Label"
+    areas = df["Reference area"].cat
+    iso3 = iso_conversions.translate(areas.categories.str[:2], "ISO2", "ISO3")
+    df = pd.DataFrame({"date": df["period"],
+                       "ISO3": iso3[areas.codes.to_numpy()],
+                       indicator: df["value"]})
+    if interpolate:
+        df[indicator] = df.groupby("ISO3", sort=False)[indicator].transform(
+            lambda series: series.interpolate(method='linear'))
+    return df
+
 def getMonthly(df: pd.DataFrame, indicator: str, 
                iso_conversions: str, 
                date_range: tuple[str, str]=('1999-01', '2022-03'),
-               interpolate: bool=True) -> pd.DataFrame:
+               interpolate: bool=False) -> pd.DataFrame:
     '''
     Reformat data for monthly visualisations
     
@@ -114,8 +182,7 @@ def getMonthly(df: pd.DataFrame, indicator: str,
     Returns:
         pd.DataFrame: formatted long dataframe
     '''
-    df["Reference area"] = df["Reference area"].str[:2]
-    countries = list(df["Reference area"])
+    countries = list(df["Reference area"].str[:2])
     df = df[df.columns[list(df.columns).index(date_range[0]): list(df.columns).index(date_range[1])+1]].T
     df.columns = countries
     df = df.reset_index()
@@ -124,9 +191,8 @@ def getMonthly(df: pd.DataFrame, indicator: str,
     df = df.rename(columns = iso_conversions)
     
     if interpolate:
-        return df.interpolate(method='linear', axis=1)
-    else:
-        return df
+        df[df.columns[1:]] = df[df.columns[1:]].interpolate(method='linear', axis=0)
+    return df
 
 def splitDate(df: pd.DataFrame):
     '''
@@ -137,7 +203,7 @@ def splitDate(df: pd.DataFrame):
     Returns:
         pd.DataFrame the edited dataframe
     '''
-    df[["year", "month"]] = df['date'].str.split('-', 1, expand=True)
+    df[["year", "month"]] = df['date'].str.split('-', n=1, expand=True)
     df["year"] = df["year"].astype("int")
     df["month"] = df["month"].astype("int")
     
@@ -147,65 +213,64 @@ def expandCPIInterestRates(cpi_df: pd.DataFrame, ir_df: pd.DataFrame, eu_join: d
     '''
     Combines CPI and Interest Rates data by BIS.org, expanding Eurozone interest rate to all Eurozone countries
     
+    Every Eurozone member gets the euro area (XM) rate of the same year and month
+    from the year it adopted the euro, joined in one pass for all members.
+    
     Args:
         cpi_df (pd.DataFrame): dataframe containing monthly CPI data by BIS.org
-        cpi_df (pd.DataFrame): dataframe containing monthly CPI data by BIS.org
+        ir_df (pd.DataFrame): dataframe containing monthly interest rate data by BIS.org
         eu_join (dict): a dictionary of Eurozone countries with years of entering
     Returns:
         combined and expanded pd.DataFrame  
     '''
     cpi_df = splitDate(cpi_df)
     ir_df = splitDate(ir_df)
-    df = cpi_df.merge(ir_df, how="left")
-    
-    dfs = []
-    for i in eu_join:
-        dfs.append(pd.DataFrame({
-                    "year" : df[(df.ISO3 == i) & (df.year >= eu_join[i])].year.values, 
-                    "month": df[(df.ISO3 == i) & (df.year >= eu_join[i])].month.values, 
-                    "ISO3" : df[(df.ISO3 == i) & (df.year >= eu_join[i])].ISO3.values,
-                    "CPI"  : df[(df.ISO3 == i) & (df.year >= eu_join[i])].CPI.values,
-                    "InterestRate": df[(df.ISO3 == "XM") & (df.year >= eu_join[i])].InterestRate.values}))
+    
+    members = pd.DataFrame({"ISO3": list(eu_join), "adoption": list(eu_join.values())})
+    eu_df = members.merge(cpi_df, on="ISO3")
+    eu_df = eu_df[eu_df.year >= eu_df.adoption].drop(columns="adoption")
+    xm_rates = ir_df.loc[ir_df.ISO3 == "XM", ["year", "month", "InterestRate"]]
+    eu_df = eu_df.merge(xm_rates, on=["year", "month"], how="left")
     df = ir_df.merge(cpi_df, how="left")
     
-    return pd.concat([df, *dfs])
+    return pd.concat([df, eu_df])
 
+@cached
 def getCombinedCPIInterestRates(cpi_path: str, ir_path: str,
                                 iso_conversions_path: str,
                                 eurozone_path: str,
-                                interpolate:bool = True) -> pd.DataFrame:
+                                date_range: Tuple[str, str]=('1999-01', '2022-03'),
+                                interpolate:bool = False) -> pd.DataFrame:
     '''
     Prepare data from BIS.org for further analysis and visualisation
     
     Args:
         cpi_path (str):path to monthly CPI from BIS.org
         ir_path (str): path to monthly interest rates from BIS.org
-        cutoff_date (str): cutoff date for data set as default to "1999-01-01"
         iso_conversions_path (str): path to the file containing ISO conversions
         eurozone_path (str): path to the file containing Eurozone countries and euro adoption dates
+        date_range (Tuple[str, str]): first and last month to process, only these
+        period columns are parsed
+        interpolate (bool): linearly interpolate missing months, see getMonthly
     
     Returns:
         pd.DataFrame:
     '''
-    cpi_df = pd.read_csv(cpi_path)
-    ir_df = pd.read_csv(ir_path)
-    cpi_df = cpi_df[((cpi_df["Unit of measure"]=="771:Year-on-year changes, in per cent") 
-              & (cpi_df["Frequency"] == "M:Monthly"))].reset_index(drop=True)
-    
-    iso_conversions = pd.read_csv(iso_conversions_path)
-    iso_conversions_dict = dict(zip(iso_conversions.ISO2, iso_conversions.ISO3))
-    
-    cpi_df = getMonthly(cpi_df, "CPI", iso_conversions=iso_conversions_dict)
-    ir_df = getMonthly(ir_df, "interest rate", iso_conversions=iso_conversions_dict)
+    iso_conversions = loadCodeTable(iso_conversions_path)
     
-    ir_df = ir_df.melt(id_vars="date", value_vars=ir_df.columns[1:], var_name="ISO3", value_name="InterestRate")
-    cpi_df = cpi_df.melt(id_vars="date", value_vars=cpi_df.columns[1:], var_name="ISO3", value_name="CPI")
+    cpi_df = getMonthlyLong(cpi_path, "CPI", iso_conversions, date_range,
+                            filters={"Unit of measure": "771:Year-on-year changes, in per cent",
+                                     "Frequency": "M:Monthly"},
+                            interpolate=interpolate)
+    ir_df = getMonthlyLong(ir_path, "InterestRate", iso_conversions, date_range,
+                           interpolate=interpolate)
     
     eu_index = pd.read_csv(eurozone_path, parse_dates = ["Adoption"])
     eu_join=dict(zip(eu_index.ISO3, eu_index.Adoption.dt.year))
     df = expandCPIInterestRates(cpi_df, ir_df, eu_join)
+    df["name"] = iso_conversions.translate(df["ISO3"], "ISO3", "name", keep=False)
     
-    return df.merge(iso_conversions[["ISO3", "name"]])
+    return _namedRows(df)
 
 def defineText(df: pd.DataFrame, indicators: Union[str, 
                                              Tuple[str, ...], 
@@ -217,15 +282,13 @@ def defineText(df: pd.DataFrame, indicators: Union[str,
         df (pd.DataFrame): dataframe with indicators that need to be formatted into text
         indicators (str, Tuple[str, ...], or List[str]): a list of indicators that need to be formatted
     Returns:
-        pd.DataFrame the original dataframe with new columns
+        pd.DataFrame a copy of the original dataframe with new columns
     '''
     if isinstance(indicators, str): 
         if indicators in df.columns:
-            df[f"text_{indicators}"] = df.apply(lambda row: f"{row['name']}<br>{row[indicator]}%", axis=1)
+            indicators = (indicators,)
         else:
             print(f"Indicator {indicators} not found")
             return df
-    else:
-        for indicator in indicators:
-            df[f"text_{indicator}"] = df.apply(lambda row: f"{row['name']}<br>{row[indicator]: .2f}%", axis=1)
-    return df
\ No newline at end of file
+    return df.assign(**{f"text_{indicator}": formatText(df["name"], df[indicator])
+                        for indicator in indicators})
\ No newline at end of file
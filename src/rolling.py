@@ -0,0 +1,380 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+from src.grouped import CountryGroups
+from src.schema import INDICATORS, decimalValues
+
+REAL_RATE = "RealRate"
+# elements of the window copies a batch of correlation matrices is computed from
+MATRIX_BATCH = 2**22
+
+
+def rollingLabel(statistic: str, indicators: Sequence[str]) -> str:
+    '''
+    Name a rolling statistic, e.g. "corr(CPI, InterestRate)"
+    '''
+    return f"{statistic}({', '.join(indicators)})"
+
+
+def _months(years: np.ndarray, months: np.ndarray) -> np.ndarray:
+    return years.astype("int64") * 12 + months.astype("int64") - 1
+
+
+class RollingPanel:
+    '''
+    CPI and interest rates as country x month arrays with cached rolling statistics
+
+    Every statistic is computed for all countries and months at once over
+    sliding window views of the panel, centring each window before summing
+    squares. Results are cached per statistic and window; a panel extended
+    with append only computes the windows ending in the new months.
+    Missing observations are NaN and left out of every statistic.
+
+    Besides the loaded indicators, REAL_RATE (interest rate minus CPI) and
+    "<indicator>.change" (month-on-month change) can be used wherever an
+    indicator is expected.
+    '''
+    def __init__(self, countries: Sequence[str], months: np.ndarray, values: Dict[str, np.ndarray],
+                 results: Optional[Dict[Hashable, np.ndarray]]=None):
+        self._countries = list(countries)
+        self._codes = {country: code for code, country in enumerate(self._countries)}
+        self.months = np.asarray(months, dtype="int64")
+        self.values = dict(values)
+        self._derived = {}
+        self._results = dict(results or {})
+
+    @classmethod
+    def fromFrame(cls, df: pd.DataFrame, indicators: Iterable[str]=INDICATORS) -> "RollingPanel":
+        '''
+        Pivot a long dataframe with "Country", "year" and "month" columns into a panel
+
+        Args:
+            df (pd.DataFrame): long dataframe, e.g. ColumnarStore.toFrame()
+            indicators (Iterable[str]): value columns to keep
+        Returns:
+            RollingPanel: one row per country, one column per month from the first to the last
+        '''
+        codes, countries = pd.factorize(df["Country"], sort=True)
+        keys = _months(df["year"].to_numpy(), df["month"].to_numpy())
+        months = np.arange(keys.min(), keys.max() + 1) if len(keys) else np.empty(0, dtype="int64")
+        columns = keys - (months[0] if len(months) else 0)
+        values = {}
+        for indicator in indicators:
+            array = np.full((len(countries), len(months)), np.nan)
+            array[codes, columns] = decimalValues(df[indicator])
+            values[indicator] = array
+        return cls(countries.astype(str), months, values)
+
+    def countries(self) -> Tuple[str, ...]:
+        return tuple(self._countries)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return (self.months - 1970 * 12).astype("datetime64[M]").astype("datetime64[ns]")
+
+    def series(self, name: str) -> np.ndarray:
+        '''
+        Return the countries x months values of a loaded or derived indicator
+        '''
+        if name in self.values:
+            return self.values[name]
+        if name not in self._derived:
+            if name == REAL_RATE:
+                self._derived[name] = self.values["InterestRate"] - self.values["CPI"]
+            elif name.endswith(".change"):
+                values = self.series(name[:-len(".change")])
+                changes = np.full_like(values, np.nan)
+                changes[:, 1:] = np.diff(values, axis=1)
+                self._derived[name] = changes
+            else:
+                raise KeyError(name)
+        return self._derived[name]
+
+    def column(self, year: int, month: int) -> int:
+        '''
+        Return the position of a month in the panel, may be outside of it
+        '''
+        return int(year * 12 + month - 1 - self.months[0])
+
+    def _position(self, end: Tuple[int, int]) -> int:
+        # position of the period a window ends with, given as (year, month)
+        return self.column(*end)
+
+    def append(self, df: pd.DataFrame, replace: bool=False) -> "RollingPanel":
+        '''
+        Return a panel extended by months later than the last one
+
+        New countries get empty history. Cached statistics are carried over
+        and extended over the new months when next requested; this panel is
+        left unchanged, so it can keep serving readers. With replace, df may
+        start at a month the panel holds: that month and all later ones are
+        dropped first, with the cached windows ending in them.
+
+        Args:
+            df (pd.DataFrame): long dataframe of the new months, same columns as for fromFrame
+            replace (bool): replace the months from the first month of df on, e.g. revised ones
+        Returns:
+            RollingPanel: extended panel
+        '''
+        indicators = list(self.values)
+        new = RollingPanel.fromFrame(df, indicators)
+        if len(new.months) == 0:
+            return self
+        kept = len(self.months)
+        if kept and new.months[0] <= self.months[-1]:
+            if not replace:
+                raise ValueError("only months after the last one in the panel can be appended")
+            kept = int(np.searchsorted(self.months, new.months[0]))
+        countries = self._countries + [i for i in new.countries() if i not in self._codes]
+        start = self.months[0] if kept else new.months[0]
+        months = np.arange(start, new.months[-1] + 1)
+        rows = [countries.index(i) for i in new.countries()]
+        columns = new.months - start
+        values = {}
+        for indicator in indicators:
+            array = np.full((len(countries), len(months)), np.nan)
+            array[:len(self._countries), :kept] = self.values[indicator][:, :kept]
+            array[np.ix_(rows, columns)] = new.values[indicator]
+            values[indicator] = array
+        # windows ending in the kept months do not change, new countries have no history
+        added = len(countries) - len(self._countries)
+        results = {key: np.pad(result[:, :kept], ((0, added), (0, 0)), constant_values=np.nan)
+                   for key, result in self._results.items()}
+        return RollingPanel(countries, months, values, results)
+
+    def _cached(self, key: Hashable, compute: Callable[[int], np.ndarray]) -> np.ndarray:
+        '''
+        Return a cached statistic, computing only the months added since it was cached
+
+        Args:
+            key (Hashable): statistic, indicators and window
+            compute (Callable): computes the statistic for the months from a position on
+        Returns:
+            np.ndarray: countries x months
+        '''
+        result = self._results.get(key)
+        done = 0 if result is None else result.shape[1]
+        if done < len(self.months):
+            added = compute(done)
+            result = added if result is None else np.concatenate([result, added], axis=1)
+            self._results[key] = result
+        return result
+
+    def _windows(self, names: Tuple[str, ...], window: int, start: int) -> Tuple[np.ndarray, ...]:
+        '''
+        Trailing windows of every month from start on, NaN where any of the names is missing
+
+        Returns:
+            Tuple[np.ndarray, ...]: one countries x months x window view per name
+        '''
+        if window < 1:
+            raise ValueError(f"window must be at least 1 month, got {window}")
+        arrays = [self.series(i)[:, max(start - window + 1, 0):] for i in names]
+        if len(names) > 1:
+            missing = np.logical_or.reduce([np.isnan(i) for i in arrays])
+            arrays = [np.where(missing, np.nan, i) for i in arrays]
+        padding = max(window - 1 - start, 0)
+        return tuple(sliding_window_view(np.pad(i, ((0, 0), (padding, 0)), constant_values=np.nan), window, axis=1)
+                     for i in arrays)
+
+    @staticmethod
+    def _centred(windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # observations, mean and deviations from the mean of every window, 0 for missing months;
+        # the mean of a flat window is its value so it has exactly no spread
+        observed = ~np.isnan(windows)
+        values = np.where(observed, windows, 0.0)
+        n = observed.sum(axis=2)
+        largest, smallest = np.fmax.reduce(windows, axis=2), np.fmin.reduce(windows, axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(largest == smallest, largest, values.sum(axis=2) / n)
+        deviations = values - mean[:, :, None]
+        np.multiply(deviations, observed, out=deviations)
+        return n, mean, deviations
+
+    @staticmethod
+    def _minPeriods(window: int, min_periods: Optional[int], least: int=1) -> int:
+        return max(window if min_periods is None else min_periods, least)
+
+    def _moments(self, names: Tuple[str, ...], window: int,
+                 start: int) -> Tuple[np.ndarray, Tuple[np.ndarray, ...], Dict[Tuple[int, int], np.ndarray]]:
+        '''
+        Observations, means and sums of centred products in the trailing window of every month from start on
+
+        Months where any of the names is missing are left out for all of them.
+
+        Returns:
+            Tuple: observations, one mean per name and the sums of products of
+                deviations keyed by pairs of name positions (i, j) with i <= j,
+                all countries x months
+        '''
+        centred = [self._centred(i) for i in self._windows(names, window, start)]
+        products = {(i, j): np.einsum("ijk,ijk->ij", centred[i][2], centred[j][2])
+                    for i in range(len(names)) for j in range(i, len(names))}
+        return centred[0][0], tuple(i[1] for i in centred), products
+
+    def mean(self, indicator: str, window: int, min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling mean over the trailing window months
+
+        Args:
+            indicator (str): loaded or derived indicator
+            window (int): window length in months
+            min_periods (int): observations required in a window, window by default like pandas
+        Returns:
+            np.ndarray: countries x months, NaN where there are too few observations
+        '''
+        def compute(start):
+            n, (mean,), _ = self._moments((indicator,), window, start)
+            return np.where(n >= self._minPeriods(window, min_periods), mean, np.nan)
+        return self._cached(("mean", indicator, window, min_periods), compute)
+
+    def std(self, indicator: str, window: int, min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling sample standard deviation over the trailing window months, see mean
+        '''
+        def compute(start):
+            n, _, products = self._moments((indicator,), window, start)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                deviation = np.sqrt(products[0, 0] / (n - 1))
+            return np.where(n >= self._minPeriods(window, min_periods, 2), deviation, np.nan)
+        return self._cached(("std", indicator, window, min_periods), compute)
+
+    def volatility(self, indicator: str, window: int, min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling standard deviation of month-on-month changes, see mean
+        '''
+        return self.std(f"{indicator}.change", window, min_periods)
+
+    def corr(self, first: str, second: str, window: int, min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling correlation of two indicators of the same country over months where both are observed
+
+        Args:
+            first (str): indicator, e.g. "CPI"
+            second (str): indicator, e.g. "InterestRate"
+            window (int): window length in months
+            min_periods (int): joint observations required in a window, window by default
+        Returns:
+            np.ndarray: countries x months, NaN for too few observations or constant values
+        '''
+        def compute(start):
+            n, _, products = self._moments((first, second), window, start)
+            scale = np.sqrt(products[0, 0] * products[1, 1])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                correlation = np.clip(products[0, 1] / scale, -1, 1)
+            return np.where((n >= self._minPeriods(window, min_periods, 2)) & (scale > 0), correlation, np.nan)
+        return self._cached(("corr", first, second, window, min_periods), compute)
+
+    def beta(self, first: str, second: str, window: int, min_periods: Optional[int]=None) -> np.ndarray:
+        '''
+        Rolling least squares slope of first on second over months where both are observed
+
+        The covariance of the two divided by the variance of second, e.g. the
+        sensitivity of returns to changes of the interest rate.
+
+        Args:
+            first (str): dependent indicator
+            second (str): explanatory indicator
+            window (int): window length in months
+            min_periods (int): joint observations required in a window, window by default
+        Returns:
+            np.ndarray: countries x months, NaN for too few observations or a constant second
+        '''
+        def compute(start):
+            n, _, products = self._moments((first, second), window, start)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                slope = products[0, 1] / products[1, 1]
+            return np.where((n >= self._minPeriods(window, min_periods, 2)) & (products[1, 1] > 0), slope, np.nan)
+        return self._cached(("beta", first, second, window, min_periods), compute)
+
+    def crossCorrelation(self, indicator: str,
+                         countries: Optional[Sequence[str]]=None,
+                         end: Optional[Tuple[int, int]]=None,
+                         window: Optional[int]=None,
+                         min_periods: int=12) -> pd.DataFrame:
+        '''
+        Correlation matrix of an indicator between countries over a window of months
+
+        Pairs are compared over the months both countries are observed in, like
+        DataFrame.corr, computed for all pairs with matrix products.
+
+        Args:
+            indicator (str): loaded or derived indicator
+            countries (Sequence[str]): rows and columns of the matrix, all countries by default
+            end (Tuple[int, int]): year and month the window ends with, the last month by default
+            window (int): number of months, the whole history up to end by default
+            min_periods (int): joint observations required for a pair
+        Returns:
+            pd.DataFrame: countries x countries correlations, NaN for too few observations
+        '''
+        countries = self._countries if countries is None else [i for i in countries if i in self._codes]
+        stop = len(self.months) if end is None else min(max(self._position(end) + 1, 0), len(self.months))
+        start = 0 if window is None else max(stop - window, 0)
+        values = self.series(indicator)[[self._codes[i] for i in countries], start:stop]
+        return pd.DataFrame(self._correlation(values, max(min_periods, 2)), index=countries, columns=countries)
+
+    def correlationMatrices(self, indicator: str, window: int, step: int=1,
+                            countries: Optional[Sequence[str]]=None,
+                            min_periods: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Rolling correlation matrices of an indicator between countries, see crossCorrelation
+
+        Matrices are computed in batches of windows with stacked matrix products.
+
+        Args:
+            indicator (str): loaded or derived indicator
+            window (int): window length in months
+            step (int): months between the ends of consecutive windows, counted back from the last month
+            countries (Sequence[str]): rows and columns of the matrices, all countries by default
+            min_periods (int): joint observations required for a pair, window by default
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: positions of the months the windows end with
+                and a windows x countries x countries array
+        '''
+        if window < 1 or step < 1:
+            raise ValueError(f"window and step must be at least 1, got {window} and {step}")
+        countries = self._countries if countries is None else [i for i in countries if i in self._codes]
+        values = self.series(indicator)[[self._codes[i] for i in countries]]
+        padded = np.pad(values, ((0, 0), (window - 1, 0)), constant_values=np.nan)
+        windows = sliding_window_view(padded, window, axis=1)
+        ends = np.arange(len(self.months) - 1, -1, -step)[::-1]
+        matrices = np.empty((len(ends), len(countries), len(countries)))
+        # bound the windows x countries x window copy of every batch
+        batch = max(MATRIX_BATCH // max(len(countries) * window, 1), 1)
+        for i in range(0, len(ends), batch):
+            chunk = np.ascontiguousarray(windows[:, ends[i:i + batch]].transpose(1, 0, 2))
+            matrices[i:i + batch] = self._correlation(chunk, self._minPeriods(window, min_periods, 2))
+        return ends, matrices
+
+    @staticmethod
+    def _correlation(values: np.ndarray, min_periods: int) -> np.ndarray:
+        # pairwise complete correlations of the rows of the last two axes, with matrix products
+        observed = (~np.isnan(values)).astype("float64")
+        # centring does not change correlations but keeps the products small
+        means = np.nansum(values, axis=-1, keepdims=True) / np.maximum(observed.sum(axis=-1, keepdims=True), 1)
+        x = np.where(observed > 0, values - means, 0.0)
+        transposed = lambda array: np.swapaxes(array, -1, -2)
+        n = observed @ transposed(observed)
+        sums = x @ transposed(observed)
+        squares = (x * x) @ transposed(observed)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = x @ transposed(x) - sums * transposed(sums) / n
+            scale = np.sqrt(np.maximum(squares - sums * sums / n, 0)
+                            * np.maximum(transposed(squares) - transposed(sums) * transposed(sums) / n, 0))
+            return np.where((n >= min_periods) & (scale > 0), np.clip(covariance / scale, -1, 1), np.nan)
+
+    def toGroups(self, array: np.ndarray, name: str) -> CountryGroups:
+        '''
+        Wrap a countries x months result for the line chart functions
+
+        Args:
+            array (np.ndarray): output of mean, std, volatility or corr
+            name (str): column name of the values
+        Returns:
+            CountryGroups: "date" and name columns, one block per country
+        '''
+        offsets = np.arange(len(self._countries) + 1) * len(self.months)
+        return CountryGroups(self._countries, offsets,
+                             {"date": np.tile(self.dates, len(self._countries)), name: array.ravel()})
@@ -0,0 +1,158 @@
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+from src.utils import countries_cpi_ir_data, countries_cpi_ir_store
+
+# dtypes of the combined CPI and interest rate dataset, other numeric columns are float32
+# and other string columns categorical
+SCHEMA = {
+    "year": "int16",
+    "month": "int8",
+    "InterestRate": "float32",
+    "CPI": "float32",
+    "ISO3": "category",
+    "name": "category",
+    "Country": "category",
+}
+INDICATORS = ("InterestRate", "CPI")
+TEXT_PREFIX = "text_"
+
+
+def decimalValues(values: Iterable) -> np.ndarray:
+    '''
+    Widen values to float64, float32 ones through their shortest decimal representation
+
+    A float32 holding 2.675 is 2.6749999523..., formatting or serialising it
+    directly shows the binary expansion. Its shortest repr is the stored decimal
+    for values with up to 7 significant digits and the nearest 7-8 digit one
+    otherwise, which keeps chart payloads short and 2-decimal hover text exact.
+
+    Args:
+        values (Iterable): numeric values
+    Returns:
+        np.ndarray: float64 array
+    '''
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        return values.astype(str).astype("float64")
+    return values.astype("float64")
+
+
+def formatText(names: pd.Series, values: pd.Series, spec: str=" .2f") -> pd.Series:
+    '''
+    Build "name<br>value%" hover text for whole columns at once
+
+    Every distinct name and value is formatted only once and the pieces are
+    joined column-wise, which gives the same output as formatting row by row.
+
+    Args:
+        names (pd.Series): names shown in the first line of the hover text
+        values (pd.Series): numeric values shown in the second line
+        spec (str): format spec applied to the values, "" gives str(value)
+    Returns:
+        pd.Series: hover text aligned with values
+    '''
+    name_codes, name_uniques = pd.factorize(names)
+    value_codes, value_uniques = pd.factorize(values)
+    if getattr(value_uniques, "dtype", None) == np.float32:
+        value_uniques = decimalValues(value_uniques)
+    prefixes = np.array([f"{i}<br>" for i in name_uniques] + ["nan<br>"], dtype=object)
+    # factorize puts -0.0 and 0.0 under whichever comes first, -0.0 gets its own text as when formatted row by row
+    raw = np.asarray(values)
+    if raw.dtype.kind == "f":
+        value_uniques = np.asarray(value_uniques) + 0.0
+        value_codes = np.where((raw == 0) & np.signbit(raw), len(value_uniques), value_codes)
+    suffixes = np.array([f"{i:{spec}}%" for i in value_uniques] + [f"{-0.0:{spec}}%", f"{np.nan:{spec}}%"],
+                        dtype=object)
+    return pd.Series(prefixes[name_codes] + suffixes[value_codes], index=values.index)
+
+
+def textColumns(columns: Iterable[str]) -> Dict[str, str]:
+    '''
+    Map the hover text columns derivable from the given columns to their indicator
+    '''
+    columns = set(columns)
+    if "name" not in columns:
+        return {}
+    return {f"{TEXT_PREFIX}{i}": i for i in INDICATORS if i in columns}
+
+
+def compactDtype(column: str, values: pd.Series) -> str:
+    '''
+    Return the compact dtype of a column, from SCHEMA or inferred from its values
+    '''
+    if column in SCHEMA:
+        return SCHEMA[column]
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return str(values.dtype)
+    if pd.api.types.is_integer_dtype(values):
+        return "int32"
+    if pd.api.types.is_numeric_dtype(values):
+        return "float32"
+    return "category"
+
+
+def compactFrame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Convert a combined dataframe to compact dtypes and drop stored hover text
+
+    Hover text repeats the name and value of every row as a python string;
+    textColumns lists what can be rebuilt on demand with formatText.
+
+    Args:
+        df (pd.DataFrame): combined dataframe, e.g. read from the csv
+    Returns:
+        pd.DataFrame: copy with int16/int8 date parts, float32 values and categorical identifiers
+    '''
+    df = df.drop(columns=[i for i in df.columns if i.startswith(TEXT_PREFIX)])
+    return df.astype({column: compactDtype(column, df[column]) for column in df.columns})
+
+
+def withText(df: pd.DataFrame, indicators: Iterable[str]=INDICATORS) -> pd.DataFrame:
+    '''
+    Add hover text columns derived from the name and indicator columns
+    '''
+    return df.assign(**{f"{TEXT_PREFIX}{i}": formatText(df["name"], df[i]) for i in indicators})
+
+
+def memoryReport(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    '''
+    Compare the deep memory usage of several versions of a dataframe per column
+
+    Args:
+        frames (Dict[str, pd.DataFrame]): dataframes keyed by a label
+    Returns:
+        pd.DataFrame: bytes per column (rows) and label (columns) with a "total" row
+    '''
+    report = pd.DataFrame({label: df.memory_usage(index=False, deep=True) for label, df in frames.items()})
+    report.loc["total"] = report.sum()
+    return report
+
+
+def printReport(csv_path: str=countries_cpi_ir_data,
+                store_path: Optional[str]=countries_cpi_ir_store) -> None:
+    '''
+    Print the memory of the combined dataset as read from the csv, compacted and served by the store
+    '''
+    frames = {"csv": pd.read_csv(csv_path)}
+    frames["compact"] = compactFrame(frames["csv"])
+    frames["compact+text"] = withText(frames["compact"])
+    if store_path is not None:
+        from src.store import loadStore
+        store = loadStore(store_path, csv_path)
+        derived = {"date", *textColumns(store.columns)}
+        frames["store"] = store.toFrame([i for i in store.columns if i not in derived])
+    report = memoryReport(frames)
+    print(report.applymap(lambda i: "" if pd.isna(i) else f"{i / 2**10:.1f} KB").to_string())
+    for label in list(frames)[1:]:
+        print(f"{label}: {report.loc['total', label] / report.loc['total', 'csv']:.1%} of the csv frame")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the memory of the combined dataset before and after compaction")
+    parser.add_argument("--csv", default=countries_cpi_ir_data, help="combined csv dataset")
+    parser.add_argument("--store", default=countries_cpi_ir_store, help="columnar store directory")
+    args = parser.parse_args()
+    printReport(args.csv, args.store)
@@ -0,0 +1,123 @@
+import os
+import json
+import base64
+import importlib.util
+import numpy as np
+from typing import Any, Optional
+from plotly.basedatatypes import BaseFigure
+
+# orjson writes numpy arrays directly instead of converting them to lists first
+ENGINE = "orjson" if importlib.util.find_spec("orjson") is not None else "json"
+if ENGINE == "orjson":
+    # imported here, plotly imports it on first use and concurrent first encodes could see it half initialized
+    import orjson  # noqa: F401
+# plotly.js decodes base64 typed arrays from 2.28 on; the one bundled with streamlit 1.22 is 2.18,
+# so FM_TYPED_ARRAYS=1 is only for frontends with a newer plotly.js
+TYPED_ARRAYS = os.environ.get("FM_TYPED_ARRAYS", "0") == "1"
+# numpy dtypes plotly.js has typed arrays for, 64 bit integers are not among them
+TYPED_DTYPES = {"float64": "f8", "float32": "f4", "int32": "i4", "uint32": "u4",
+                "int16": "i2", "uint16": "u2", "int8": "i1", "uint8": "u1"}
+CHART_CONFIG = json.dumps({"showLink": False, "linkText": False})
+
+
+def typedArray(values: np.ndarray) -> Optional[dict]:
+    '''
+    Encode a numeric array as a plotly typed array, None for arrays plotly.js has no typed array for
+
+    Args:
+        values (np.ndarray): one or two dimensional array
+    Returns:
+        dict: "dtype", base64 "bdata" and, for two dimensions, "shape"
+    '''
+    if values.dtype.kind not in "iuf" or values.ndim not in (1, 2):
+        return None
+    if values.dtype.kind in "iu" and values.dtype.itemsize == 8:
+        small = np.int32 if values.dtype.kind == "i" else np.uint32
+        info = np.iinfo(small)
+        values = values.astype(small) if not len(values) or (values.min() >= info.min and values.max() <= info.max) \
+            else values.astype("float64")
+    dtype = TYPED_DTYPES.get(values.dtype.newbyteorder("=").name)
+    if dtype is None:
+        values, dtype = values.astype("float64"), "f8"
+    encoded = {"dtype": dtype, "bdata": base64.b64encode(np.ascontiguousarray(values, values.dtype.newbyteorder("<"))).decode()}
+    if values.ndim == 2:
+        encoded["shape"] = f"{values.shape[0]},{values.shape[1]}"
+    return encoded
+
+
+def withTypedArrays(obj: Any) -> Any:
+    '''
+    Replace the numeric arrays of a figure dictionary by typed arrays, leaving other values as they are
+    '''
+    if isinstance(obj, np.ndarray):
+        return typedArray(obj) or obj
+    if isinstance(obj, dict):
+        return {key: withTypedArrays(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [withTypedArrays(i) for i in obj]
+    return obj
+
+
+def encode(obj: Any, typed_arrays: bool=TYPED_ARRAYS) -> str:
+    '''
+    Serialize part of a figure dictionary to compact plotly JSON
+
+    Args:
+        obj (Any): figure dictionary or a part of it, e.g. its data or layout
+        typed_arrays (bool): write numeric arrays as base64 typed arrays
+    Returns:
+        str: JSON
+    '''
+    # plotly.io.json loads plotly.offline and IPython, which cost most of the app's import time
+    from plotly.io.json import to_json_plotly
+
+    return to_json_plotly(withTypedArrays(obj) if typed_arrays else obj, engine=ENGINE)
+
+
+def figurePayload(fig: Any, data: Optional[str]=None, typed_arrays: bool=TYPED_ARRAYS) -> str:
+    '''
+    Serialize a figure for plotlyChart without validating it
+
+    Args:
+        fig (go.Figure or dict): figure to serialize
+        data (str): already serialized traces of the figure, only layout and frames are encoded then
+        typed_arrays (bool): write numeric arrays as base64 typed arrays
+    Returns:
+        str: plotly JSON with "data", "layout" and, for animations, "frames"
+    '''
+    figure = fig.to_plotly_json() if isinstance(fig, BaseFigure) else fig
+    parts = [f'"data":{encode(figure.get("data", []), typed_arrays) if data is None else data}']
+    for name in ("layout", "frames"):
+        if figure.get(name):
+            parts.append(f'"{name}":{encode(figure[name], typed_arrays)}')
+    return "{" + ",".join(parts) + "}"
+
+
+def dataPayload(fig: Any, typed_arrays: bool=TYPED_ARRAYS) -> str:
+    '''
+    Serialize only the traces of a figure, to be reused by figurePayload
+    '''
+    figure = fig.to_plotly_json() if isinstance(fig, BaseFigure) else fig
+    return encode(figure.get("data", []), typed_arrays)
+
+
+def plotlyChart(payload: str, use_container_width: bool=False, container: Any=None) -> Any:
+    '''
+    Show a serialized figure like st.plotly_chart, which would validate and encode the figure again
+
+    Args:
+        payload (str): output of figurePayload
+        use_container_width (bool): stretch the chart to the width of its container
+        container (DeltaGenerator): where to show the chart, the current container by default
+    Returns:
+        DeltaGenerator: the chart element
+    '''
+    import streamlit as st
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+
+    proto = PlotlyChart()
+    proto.use_container_width = use_container_width
+    proto.figure.spec = payload
+    proto.figure.config = CHART_CONFIG
+    proto.theme = "streamlit"
+    return (container or st._main)._enqueue("plotly_chart", proto)
@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import socket
+import logging
+import argparse
+import threading
+import http.client
+import socketserver
+import urllib.parse
+import pandas as pd
+import pyarrow as pa
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.data import FrameCache, getLocalStore
+from src.schema import INDICATORS
+from src.utils import countries_cpi_ir_data, countries_cpi_ir_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = "http://127.0.0.1:8765"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def toArrow(df: pd.DataFrame) -> bytes:
+    '''
+    Serialize a dataframe as an Arrow IPC stream, categorical columns as dictionaries
+    '''
+    # one batch even for no rows, an empty table is written without its dictionaries
+    batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def fromArrow(payload: bytes) -> pd.DataFrame:
+    '''
+    Read a dataframe written by toArrow, keeping categorical and compact numeric dtypes
+    '''
+    return pa.ipc.open_stream(payload).read_pandas()
+
+
+def parseAddress(address: str) -> Tuple[str, Any]:
+    '''
+    Split "http://host:port" or "unix:/path/to.sock" into a scheme and a socket address
+    '''
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    url = urllib.parse.urlsplit(address)
+    if url.scheme != "http" or not url.hostname:
+        raise ValueError(f"expected http://host:port or unix:/path, got {address!r}")
+    return "http", (url.hostname, url.port or 80)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/meta":
+            return self._send(404, b"unknown path", "text/plain")
+        store = self.server.store()
+        meta = {"key": list(store.key),
+                "path": os.path.abspath(store.path),
+                "rows": store.rows,
+                "columns": store.columns,
+                "indicators": [i for i in INDICATORS if i in store.columns],
+                "periods": store.periods(),
+                "countries": store.countries()}
+        self._send(200, json.dumps(meta).encode(), "application/json")
+
+    def do_POST(self):
+        try:
+            query = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            body = self.server.slice(self.path, query)
+        except (KeyError, TypeError, ValueError) as error:
+            return self._send(400, f"{type(error).__name__}: {error}".encode(), "text/plain")
+        if body is None:
+            return self._send(404, b"unknown path", "text/plain")
+        self._send(200, body, ARROW_TYPE)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class _TCPHandler(_Handler):
+    # headers and body are written separately, Nagle would hold the body back for the ACK
+    disable_nagle_algorithm = True
+
+
+class _DataServer:
+    '''
+    Store access and payload cache shared by the TCP and Unix socket servers
+    '''
+    def setup(self, store_path: str, csv_path: Optional[str], max_bytes: int) -> None:
+        self.store_path = store_path
+        self.csv_path = csv_path
+        self.payloads = FrameCache(max_bytes=max_bytes)
+
+    def store(self):
+        return getLocalStore(self.store_path, self.csv_path)
+
+    def slice(self, path: str, query: Dict) -> Optional[bytes]:
+        '''
+        Return the Arrow payload of a slice query, None for an unknown path
+        '''
+        columns = None if query.get("columns") is None else tuple(query["columns"])
+        countries = None if query.get("countries") is None else tuple(query["countries"])
+        if path == "/month":
+            args = (int(query["year"]), int(query["month"]), countries, columns)
+        elif path == "/countries":
+            args = (tuple(query["countries"]), columns)
+        elif path == "/frame":
+            args = (columns,)
+        else:
+            return None
+        store = self.store()
+        key = (store.key, path, args)
+        payload = self.payloads.get(key)
+        if payload is None:
+            method = {"/month": store.getMonth, "/countries": store.getCountries, "/frame": store.toFrame}[path]
+            payload = self.payloads.put(key, toArrow(method(*args)))
+        return payload
+
+
+class _TCPServer(_DataServer, ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(_DataServer, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def makeServer(address: str=DEFAULT_ADDRESS,
+               store_path: str=countries_cpi_ir_store,
+               csv_path: Optional[str]=countries_cpi_ir_data,
+               max_bytes: int=64 * 2**20) -> socketserver.BaseServer:
+    '''
+    Create a data service answering slice queries on the store with Arrow payloads
+
+    GET /meta returns the store key, row count, columns, indicators, periods and
+    countries as JSON. POST /month, /countries and /frame take the arguments of
+    the ColumnarStore methods of the same purpose as a JSON object and return
+    the slice as an Arrow stream. Serialized slices are cached per store version.
+
+    Args:
+        address (str): "http://host:port" or "unix:/path/to.sock"
+        store_path (str): directory of the store
+        csv_path (str): source csv used to (re)build a missing or stale store, None to never rebuild
+        max_bytes (int): memory of the payload cache
+    Returns:
+        socketserver.BaseServer: call serve_forever() to start serving
+    '''
+    scheme, location = parseAddress(address)
+    if scheme == "unix":
+        if os.path.exists(location):
+            os.remove(location)
+        server = _UnixServer(location, _Handler)
+    else:
+        server = _TCPServer(location, _TCPHandler)
+    server.setup(store_path, csv_path, max_bytes)
+    # build or open the store before the first query
+    server.store()
+    return server
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DataClient:
+    '''
+    Reads the store through a data service, with the reading methods of ColumnarStore
+
+    Every thread keeps its own keep-alive connection. Metadata is fetched again
+    at most every refresh_seconds, so key changes once the service picks up a
+    rebuilt store or an ingest.
+    '''
+    def __init__(self, address: str=DEFAULT_ADDRESS, refresh_seconds: float=1.0, timeout: float=30.0):
+        self.address = address
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+        self._scheme, self._location = parseAddress(address)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._meta = None
+        self._fetched = 0.0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._scheme == "unix":
+                connection = _UnixConnection(self._location, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(*self._location, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, query: Optional[Dict]=None) -> bytes:
+        body = None if query is None else json.dumps(query).encode()
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # the service closed an idle keep-alive connection or restarted
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise ValueError(f"{self.address}{path}: {response.status} {payload.decode(errors='replace')}")
+        return payload
+
+    def meta(self) -> Dict:
+        '''
+        Return the metadata of the served store, refreshed at most every refresh_seconds
+        '''
+        with self._lock:
+            if self._meta is None or time.monotonic() - self._fetched > self.refresh_seconds:
+                self._meta = json.loads(self._request("GET", "/meta"))
+                self._fetched = time.monotonic()
+            return self._meta
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        # same as the key of the served ColumnarStore, so caches keyed on it carry over
+        return tuple(self.meta()["key"])
+
+    @property
+    def path(self) -> str:
+        return self.meta()["path"]
+
+    @property
+    def rows(self) -> int:
+        return self.meta()["rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta()["columns"])
+
+    def indicators(self) -> List[str]:
+        return list(self.meta()["indicators"])
+
+    def periods(self) -> List[Tuple[int, int]]:
+        return [tuple(i) for i in self.meta()["periods"]]
+
+    def countries(self) -> Tuple[str, ...]:
+        return tuple(self.meta()["countries"])
+
+    def getMonth(self, year: int, month: int,
+                 countries: Optional[Iterable[str]]=None,
+                 columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        return fromArrow(self._request("POST", "/month", {
+            "year": year, "month": month,
+            "countries": None if countries is None else list(countries),
+            "columns": None if columns is None else list(columns)}))
+
+    def getCountries(self, countries: Iterable[str],
+                     columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        return fromArrow(self._request("POST", "/countries", {
+            "countries": list(countries),
+            "columns": None if columns is None else list(columns)}))
+
+    def toFrame(self, columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        return fromArrow(self._request("POST", "/frame", {
+            "columns": None if columns is None else list(columns)}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve slices of the CPI and interest rate store to dashboard workers")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="http://host:port or unix:/path/to.sock")
+    parser.add_argument("--store", default=countries_cpi_ir_store, help="columnar store directory")
+    parser.add_argument("--csv", default=countries_cpi_ir_data, help="combined csv dataset")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = makeServer(args.address, args.store, args.csv)
+    logger.info("serving %s on %s, set FM_DATA_SERVICE=%s for the dashboard", args.store, args.address, args.address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheme, location = parseAddress(args.address)
+        if scheme == "unix" and os.path.exists(location):
+            os.remove(location)
@@ -0,0 +1,127 @@
+import os
+import time
+import runpy
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from src import timing
+from src.data import getStore, getFigureJSON, getFigurePayload
+
+logger = logging.getLogger(__name__)
+
+# set FM_FAST_START=0 to build the default view on every cold start instead of reading prebuilt figures
+FAST_START = os.environ.get("FM_FAST_START", "1") not in ("", "0")
+DEFAULT_COUNTRIES = ("UK", "Germany", "Russian Federation", "Japan", "France", "USA", "Australia")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "financial-markets.py")
+
+_lock = threading.Lock()
+_metrics = {}
+_first_run_start = None
+# set by prebuild() so the default view is built and written again
+_rebuild = False
+
+
+def beginRun(run_start: float, import_seconds: float) -> None:
+    '''
+    Record how long the imports of the first script run in this process took
+
+    Later runs find every module imported already and are not recorded.
+
+    Args:
+        run_start (float): perf_counter() when the script run started
+        import_seconds (float): time spent on the imports of the script
+    '''
+    global _first_run_start
+    with _lock:
+        if _first_run_start is not None:
+            return
+        _first_run_start = run_start
+    _report("startup.imports", import_seconds)
+
+
+def chartShown() -> None:
+    '''
+    Record the time from the start of the first script run to its first chart, once per process
+    '''
+    with _lock:
+        if _first_run_start is None or "startup.first chart" in _metrics:
+            return
+        _metrics["startup.first chart"] = time.perf_counter() - _first_run_start
+    _report("startup.first chart", _metrics["startup.first chart"])
+
+
+def _report(name: str, seconds: float) -> None:
+    _metrics[name] = seconds
+    timing.record(name, seconds)
+    logger.info("%s took %.0f ms", name, seconds * 1000)
+
+
+def metrics() -> Dict[str, float]:
+    '''
+    Return the startup metrics recorded so far in seconds
+    '''
+    return dict(_metrics)
+
+
+def isDefaultView(year: int, month: int, countries: Iterable[str]) -> bool:
+    '''
+    Tell whether a selection is the one every new session starts with: the latest month and DEFAULT_COUNTRIES
+    '''
+    return (year, month) == tuple(getStore().periods()[-1]) and tuple(countries) == DEFAULT_COUNTRIES
+
+
+def firstView(name: Hashable, build: Callable[[], Any], default: bool,
+              key: Optional[Hashable]=None, data_key: Optional[Hashable]=None) -> str:
+    '''
+    Serve a chart of the default view from its prebuilt figure, other views from the payload cache
+
+    Prebuilt figures are plotly JSON kept next to the store by getFigureJSON,
+    so a new process renders the default view without building the figures
+    as long as neither the store nor the chart code changed since prebuild().
+
+    Args:
+        name (Hashable): identity of the chart within the default view
+        build (Callable): function producing the go.Figure
+        default (bool): whether the current selection is the default view
+        key (Hashable): input slice of the chart for getFigurePayload, name by default
+        data_key (Hashable): input slice of its traces, see getFigurePayload
+    Returns:
+        str: plotly JSON for serialize.plotlyChart
+    '''
+    if FAST_START and default:
+        return getFigureJSON(("first view", name), build, rebuild=_rebuild)
+    return getFigurePayload(name if key is None else key, build, data_key)
+
+
+def prebuild(app_path: str=APP_PATH) -> float:
+    '''
+    Build the store and the figures of the default view by running the app once without a server
+
+    The figures are always built again, also when prebuilt ones of the
+    current store exist.
+
+    Args:
+        app_path (str): path to financial-markets.py
+    Returns:
+        float: seconds taken
+    '''
+    global _rebuild
+    start = time.perf_counter()
+    getStore()
+    # without a server every widget returns its default, which is the default view
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _rebuild = True
+    try:
+        runpy.run_path(app_path, run_name="__main__")
+    finally:
+        _rebuild = False
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prebuild the default view of the dashboard, e.g. after a deploy or an ingest")
+    parser.add_argument("--app", default=APP_PATH, help="path to financial-markets.py")
+    args = parser.parse_args()
+    print(f"Prebuilt the default view in {prebuild(args.app):.2f} s")
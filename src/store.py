@@ -0,0 +1,468 @@
+import os
+import re
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+from typing import List, Tuple, Union, Optional, Iterable
+
+from src.utils import countries_cpi_ir_data, countries_cpi_ir_store
+from src.schema import compactDtype, textColumns, formatText, TEXT_PREFIX
+
+# 2: float32 values, hover text derived on read instead of stored
+# 3: columns in immutable generation directories, meta.json names the current one
+STORE_VERSION = 3
+# generations kept besides the current one for readers that opened them before a swap
+KEEP_GENERATIONS = 2
+# prebuilt figures of a generation are kept in FIGURES_DIR/<generation> inside the store
+FIGURES_DIR = "figures"
+
+def _categoricalDtype(n_categories: int) -> str:
+    '''
+    Pick the smallest signed integer dtype able to hold category codes
+
+    Args:
+        n_categories (int): number of distinct categories
+    Returns:
+        str: numpy dtype name
+    '''
+    if n_categories < np.iinfo(np.int16).max:
+        return "int16"
+    return "int32"
+
+def _monthsToDates(year: np.ndarray, month: np.ndarray) -> np.ndarray:
+    '''
+    Convert year and month arrays to datetime64 values for the first of the month
+
+    Args:
+        year (np.ndarray): array of years
+        month (np.ndarray): array of months, 1 to 12
+    Returns:
+        np.ndarray: datetime64[ns] array
+    '''
+    months = (year.astype("int64") - 1970) * 12 + month.astype("int64") - 1
+    return months.astype("datetime64[M]").astype("datetime64[ns]")
+
+def generations(store_path: str) -> List[str]:
+    '''
+    Return the generation directories of a store, oldest first
+    '''
+    if not os.path.isdir(store_path):
+        return []
+    return sorted(i for i in os.listdir(store_path) if re.fullmatch(r"g\d{6}", i))
+
+def currentGeneration(store_path: str) -> str:
+    '''
+    Return the generation meta.json points at, "" when the store has none yet
+    '''
+    try:
+        with open(os.path.join(store_path, "meta.json")) as json_file:
+            return json.load(json_file).get("generation", "")
+    except FileNotFoundError:
+        return ""
+
+def _removeGenerations(store_path: str, current: str, keep: int) -> None:
+    '''
+    Delete generations older than the keep ones before current, their prebuilt figures and files of older store versions
+
+    Readers that still have a deleted generation memory-mapped keep reading
+    it, the files only go away with the last mapping.
+    '''
+    older = [i for i in generations(store_path) if i < current]
+    for generation in older[:max(len(older) - keep, 0)]:
+        shutil.rmtree(os.path.join(store_path, generation), ignore_errors=True)
+    for name in os.listdir(store_path):
+        if name.endswith((".npy", ".npy.tmp")):
+            os.remove(os.path.join(store_path, name))
+    figures_path = os.path.join(store_path, FIGURES_DIR)
+    if os.path.isdir(figures_path):
+        kept = set(generations(store_path))
+        # also removes figures written directly into FIGURES_DIR by earlier versions
+        for name in os.listdir(figures_path):
+            if name not in kept:
+                path = os.path.join(figures_path, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+def _storeFrame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Drop hover text, sort rows by (year, month, ISO3) and add "Country" where missing
+    '''
+    df = df.drop(columns=[i for i in df.columns if i.startswith(TEXT_PREFIX)])
+    df = df.sort_values(["year", "month", "ISO3"], kind="mergesort").reset_index(drop=True)
+    if "Country" not in df.columns:
+        df["Country"] = df["name"]
+    return df
+
+def _periods(df: pd.DataFrame, offset: int=0) -> List[List[int]]:
+    '''
+    Return [year, month, start, stop] of every month block of a sorted frame, rows counted from offset
+    '''
+    keys = df.year.to_numpy("int64") * 12 + df.month.to_numpy("int64") - 1
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(df)]
+    return [[int(df.year[s]), int(df.month[s]), int(s) + offset, int(e) + offset] for s, e in zip(starts, stops)]
+
+def _countryIndex(country_codes: np.ndarray, n_countries: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Return the rows of every country in row order and the offsets of each country in them
+    '''
+    country_rows = np.argsort(country_codes, kind="stable").astype("int32")
+    country_offsets = np.searchsorted(country_codes[country_rows], np.arange(n_countries + 1)).astype("int32")
+    return country_rows, country_offsets
+
+def _newGeneration(store_path: str) -> Tuple[str, str]:
+    '''
+    Create the directory of the next generation, return its name and path
+    '''
+    existing = generations(store_path)
+    generation = f"g{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+    data_path = os.path.join(store_path, generation)
+    # fails if another writer took the same generation
+    os.makedirs(data_path)
+    return generation, data_path
+
+def _swapGeneration(store_path: str, generation: str, meta: dict, keep: int) -> None:
+    '''
+    Point meta.json at a fully written generation unless a later-numbered one is current already
+    '''
+    meta_path = os.path.join(store_path, "meta.json")
+    # one temporary file per generation, concurrent writers never write to the same file
+    tmp_path = f"{meta_path}.{generation}.tmp"
+    with open(tmp_path, "w") as json_file:
+        json.dump({"version": STORE_VERSION, "generation": generation, **meta}, json_file)
+    if currentGeneration(store_path) > generation:
+        # a writer that started later already swapped, its generation stays current
+        os.remove(tmp_path)
+        shutil.rmtree(os.path.join(store_path, generation), ignore_errors=True)
+        return
+    # the swap: new readers open the new generation from here on
+    os.replace(tmp_path, meta_path)
+    _removeGenerations(store_path, generation, keep)
+
+def writeStore(df: pd.DataFrame, store_path: str, keep: int=KEEP_GENERATIONS) -> None:
+    '''
+    Write the combined CPI and interest rate dataframe as a columnar store
+
+    Rows are sorted by (year, month, ISO3), so every month is a contiguous block,
+    and a CSR-style table of row positions is kept for every country. Columns
+    get the compact dtypes of src.schema; hover text columns are not stored,
+    the store derives them from names and values when they are read.
+
+    Columns are written to a new generation directory that is never modified
+    afterwards, then meta.json is replaced to point at it. Readers opening
+    the store see either the old or the new generation as a whole, and
+    readers of the old one keep their views until they reopen the store.
+    A writer that finishes after a later-numbered generation was swapped in
+    discards its own instead of swapping meta.json back. The check and the
+    swap are two steps, so writers finishing within the same instant can
+    still both swap; run one writer at a time where that matters.
+
+    Args:
+        df (pd.DataFrame): combined dataframe with "year", "month", "ISO3" and "name" columns
+        store_path (str): directory the store is written to
+        keep (int): previous generations to keep for readers that opened them
+    '''
+    df = _storeFrame(df)
+    generation, data_path = _newGeneration(store_path)
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        dtype = compactDtype(column, values)
+        if dtype != "category":
+            array, meta = values.to_numpy(dtype), {"dtype": dtype}
+        else:
+            categorical = pd.Categorical(values)
+            dtype = _categoricalDtype(len(categorical.categories))
+            array = categorical.codes.astype(dtype)
+            meta = {"dtype": dtype, "categories": [str(i) for i in categorical.categories]}
+        np.save(os.path.join(data_path, f"{column}.npy"), array)
+        columns[column] = meta
+
+    country_codes = pd.Categorical(df["Country"], categories=columns["Country"]["categories"]).codes
+    country_rows, country_offsets = _countryIndex(country_codes, len(columns["Country"]["categories"]))
+    np.save(os.path.join(data_path, "_country_rows.npy"), country_rows)
+    np.save(os.path.join(data_path, "_country_offsets.npy"), country_offsets)
+
+    periods = _periods(df)
+    _swapGeneration(store_path, generation, {"rows": len(df), "columns": columns, "periods": periods,
+                                             "written": [generation] * len(periods)}, keep)
+
+def appendStore(df: pd.DataFrame, store_path: str, keep: int=KEEP_GENERATIONS,
+                replace: bool=False) -> None:
+    '''
+    Append months later than the last one of the store as a new generation
+
+    Only the new rows are sorted and encoded: every column of the next
+    generation is the column of the current one with the new codes or
+    values behind it, and the country table gets the new rows inserted at
+    the end of each country. The unchanged rows are still copied, because
+    generations are never modified once written, but that is a plain
+    byte copy rather than reading, sorting and encoding the whole history.
+    The result is the same as writeStore on all rows.
+
+    With replace, df may start at a month that is already stored: the stored
+    rows of that month and all later ones are dropped and df takes their
+    place, e.g. to take in revised values of recent months.
+
+    Args:
+        df (pd.DataFrame): rows of the new months with the columns of the store, hover text is dropped
+        store_path (str): directory of an existing store
+        keep (int): previous generations to keep for readers that opened them
+        replace (bool): replace the stored months from the first month of df on
+    '''
+    store = ColumnarStore(store_path)
+    df = _storeFrame(df)
+    if set(df.columns) != set(store._meta):
+        raise ValueError(f"Columns {sorted(df.columns)} do not match the store columns {sorted(store._meta)}")
+    first = (int(df.year[0]), int(df.month[0])) if len(df) else None
+    last = max(store._periods)
+    if first is not None and first <= last and not replace:
+        raise ValueError(f"Only months after {last[0]}-{last[1]:02d} can be appended to {store_path}")
+    # stored rows before the first month of df are kept, the rows from there on are replaced
+    kept = [period for period in store._periods if first is None or period < first]
+    cut = store._periods[kept[-1]][1] if kept else 0
+    generation, data_path = _newGeneration(store_path)
+
+    columns, arrays = {}, {}
+    for column, meta in store._meta.items():
+        old = store._columns[column][:cut]
+        if "categories" not in meta:
+            array = np.concatenate([old, df[column].to_numpy(meta["dtype"])])
+        else:
+            categories = store._categories[column]
+            new = pd.Categorical(df[column])
+            added = pd.Index([str(i) for i in new.categories]).difference(categories)
+            if len(added):
+                # categories stay sorted as in writeStore, codes of the stored rows are remapped
+                merged = categories.append(added).sort_values()
+                meta = {"dtype": _categoricalDtype(len(merged)), "categories": list(merged)}
+                old = merged.get_indexer(categories).astype(meta["dtype"])[old]
+                categories = merged
+            lookup = np.r_[categories.get_indexer([str(i) for i in new.categories]), -1]
+            array = np.concatenate([old, lookup[new.codes]]).astype(meta["dtype"])
+            used = np.bincount(array[array >= 0], minlength=len(categories)) > 0 if cut < store.rows else None
+            if used is not None and not used.all():
+                # categories only the replaced rows had are dropped, writeStore would not list them either
+                categories = categories[used]
+                meta = {"dtype": _categoricalDtype(len(categories)), "categories": list(categories)}
+                array = np.r_[np.cumsum(used) - 1, -1][array].astype(meta["dtype"])
+        np.save(os.path.join(data_path, f"{column}.npy"), array)
+        columns[column], arrays[column] = meta, array
+
+    n_countries = len(columns["Country"]["categories"])
+    new_codes = arrays["Country"][cut:].astype("int64")
+    country_rows, country_offsets = store._country_rows, store._country_offsets
+    if cut < store.rows:
+        # replaced rows leave the country table, offsets count the rows that stay
+        stays = country_rows < cut
+        country_rows, country_offsets = country_rows[stays], np.r_[0, np.cumsum(stays)][country_offsets]
+    if columns["Country"]["categories"] == list(store._categories["Country"]) and (new_codes >= 0).all():
+        # stored rows keep their places, new rows go behind the stored rows of their country
+        order = np.argsort(new_codes, kind="stable")
+        country_rows = np.insert(country_rows, country_offsets[new_codes[order] + 1], order + cut).astype("int32")
+        country_offsets = (country_offsets
+                           + np.searchsorted(new_codes[order], np.arange(n_countries + 1))).astype("int32")
+    else:
+        country_rows, country_offsets = _countryIndex(arrays["Country"], n_countries)
+    np.save(os.path.join(data_path, "_country_rows.npy"), country_rows)
+    np.save(os.path.join(data_path, "_country_offsets.npy"), country_offsets)
+
+    periods = [[*period, *store._periods[period]] for period in kept] + _periods(df, cut)
+    written = [store._written[period] for period in kept] + [generation] * (len(periods) - len(kept))
+    _swapGeneration(store_path, generation, {"rows": cut + len(df), "columns": columns, "periods": periods,
+                                             "written": written}, keep)
+
+def buildStore(csv_path: str=countries_cpi_ir_data,
+               store_path: str=countries_cpi_ir_store) -> None:
+    '''
+    Convert the combined csv dataset into a columnar store
+
+    Args:
+        csv_path (str): path to the combined CPI and interest rate csv
+        store_path (str): directory the store is written to
+    '''
+    writeStore(pd.read_csv(csv_path), store_path)
+
+def isStale(store_path: str, csv_path: Optional[str]=None) -> bool:
+    '''
+    Check whether the store is missing, written by another version or older than its source csv
+
+    Args:
+        store_path (str): directory of the store
+        csv_path (str): path to the source csv, optional
+    Returns:
+        bool: True if the store has to be (re)built
+    '''
+    meta_path = os.path.join(store_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return True
+    with open(meta_path) as json_file:
+        if json.load(json_file)["version"] != STORE_VERSION:
+            return True
+    if csv_path is None or not os.path.exists(csv_path):
+        return False
+    return os.path.getmtime(csv_path) > os.path.getmtime(meta_path)
+
+
+class ColumnarStore:
+    '''
+    Read-only, memory-mapped view of the combined CPI and interest rate store
+
+    Month cross-sections and country series are served from precomputed
+    row offsets rather than boolean scans over the whole table. Hover text
+    columns are built from the selected rows only.
+
+    A store object stays on the generation that was current when it was
+    opened; open a new one to see a later write.
+    '''
+    def __init__(self, store_path: str, mmap_mode: Optional[str]="r"):
+        with open(os.path.join(store_path, "meta.json")) as json_file:
+            meta = json.load(json_file)
+        if meta["version"] != STORE_VERSION:
+            raise ValueError(f"Unsupported store version {meta['version']} in {store_path}")
+        self.path = store_path
+        self.generation = meta["generation"]
+        self.key = (os.path.abspath(store_path), self.generation)
+        data_path = os.path.join(store_path, self.generation)
+        self.rows = meta["rows"]
+        self._meta = meta["columns"]
+        self._columns = {column: np.load(os.path.join(data_path, f"{column}.npy"), mmap_mode=mmap_mode)
+                         for column in self._meta}
+        self._categories = {column: pd.Index(self._meta[column]["categories"])
+                            for column in self._meta if "categories" in self._meta[column]}
+        self._periods = {(y, m): (start, stop) for y, m, start, stop in meta["periods"]}
+        # generation that wrote the rows of every month, stores written before it was recorded count as rewritten
+        self._written = dict(zip(self._periods, meta.get("written", [self.generation] * len(self._periods))))
+        self._country_rows = np.load(os.path.join(data_path, "_country_rows.npy"), mmap_mode=mmap_mode)
+        self._country_offsets = np.load(os.path.join(data_path, "_country_offsets.npy"), mmap_mode=mmap_mode)
+        self._country_codes = {country: code for code, country in enumerate(self._categories["Country"])}
+        self._text = textColumns(self._meta)
+
+    @property
+    def columns(self) -> List[str]:
+        return [*self._meta, *self._text, "date"]
+
+    def periods(self) -> List[Tuple[int, int]]:
+        '''
+        Return available (year, month) pairs in chronological order
+        '''
+        return list(self._periods)
+
+    def periodsWrittenAfter(self, generation: str) -> List[Tuple[int, int]]:
+        '''
+        Return (year, month) pairs whose rows were written by a later generation than the given one
+        '''
+        return [period for period, written in self._written.items() if written > generation]
+
+    def countries(self) -> Tuple[str, ...]:
+        '''
+        Return all countries present in the store
+        '''
+        return tuple(self._categories["Country"])
+
+    def _rowsForCountries(self, countries: Iterable[str]) -> np.ndarray:
+        blocks = []
+        for country in countries:
+            code = self._country_codes.get(country)
+            if code is None:
+                continue
+            blocks.append(self._country_rows[self._country_offsets[code]:self._country_offsets[code + 1]])
+        if not blocks:
+            return np.empty(0, dtype="int32")
+        return np.concatenate(blocks)
+
+    def _frame(self, rows: Union[slice, np.ndarray],
+               columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        '''
+        Materialise selected rows into a dataframe with categorical identifiers
+
+        Args:
+            rows (slice or np.ndarray): contiguous slice or array of row positions
+            columns (Iterable[str]): columns to include, all by default
+        Returns:
+            pd.DataFrame: selected rows
+        '''
+        columns = self.columns if columns is None else list(columns)
+        data = {}
+        for column in columns:
+            if column == "date":
+                data[column] = _monthsToDates(self._columns["year"][rows], self._columns["month"][rows])
+            elif column in self._text:
+                names = pd.Categorical.from_codes(np.asarray(self._columns["name"][rows]),
+                                                  categories=self._categories["name"])
+                data[column] = formatText(pd.Series(names), pd.Series(self._columns[self._text[column]][rows]))
+            elif column in self._categories:
+                data[column] = pd.Categorical.from_codes(np.asarray(self._columns[column][rows]),
+                                                         categories=self._categories[column])
+            else:
+                data[column] = np.array(self._columns[column][rows])
+        return pd.DataFrame(data)
+
+    def getMonth(self, year: int, month: int,
+                 countries: Optional[Iterable[str]]=None,
+                 columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        '''
+        Return the cross-section for a single month
+
+        Args:
+            year (int): year of the cross-section
+            month (int): month of the cross-section
+            countries (Iterable[str]): restrict to these countries, all by default
+            columns (Iterable[str]): columns to include, all by default
+        Returns:
+            pd.DataFrame: one row per country for the given month
+        '''
+        start, stop = self._periods.get((year, month), (0, 0))
+        if countries is None:
+            return self._frame(slice(start, stop), columns)
+        codes = [self._country_codes[i] for i in countries if i in self._country_codes]
+        mask = np.isin(self._columns["Country"][start:stop], codes)
+        return self._frame(start + np.flatnonzero(mask), columns)
+
+    def getCountries(self, countries: Iterable[str],
+                     columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        '''
+        Return full time series for the given countries
+
+        Args:
+            countries (Iterable[str]): countries to include, in order
+            columns (Iterable[str]): columns to include, all by default
+        Returns:
+            pd.DataFrame: rows grouped by country, each in chronological order
+        '''
+        return self._frame(self._rowsForCountries(countries), columns)
+
+    def toFrame(self, columns: Optional[Iterable[str]]=None) -> pd.DataFrame:
+        '''
+        Return the whole store as a dataframe
+        '''
+        return self._frame(slice(0, self.rows), columns)
+
+
+def loadStore(store_path: str=countries_cpi_ir_store,
+              csv_path: Optional[str]=countries_cpi_ir_data) -> ColumnarStore:
+    '''
+    Open the columnar store, building it from the csv first if it is missing or stale
+
+    Args:
+        store_path (str): directory of the store
+        csv_path (str): path to the source csv, None to never rebuild
+    Returns:
+        ColumnarStore: memory-mapped store
+    '''
+    if csv_path is not None and isStale(store_path, csv_path):
+        buildStore(csv_path, store_path)
+    return ColumnarStore(store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar CPI and interest rate store")
+    parser.add_argument("--csv", default=countries_cpi_ir_data, help="combined csv dataset")
+    parser.add_argument("--out", default=countries_cpi_ir_store, help="output store directory")
+    args = parser.parse_args()
+    buildStore(args.csv, args.out)
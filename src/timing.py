@@ -0,0 +1,175 @@
+import os
+import json
+import atexit
+import time
+import logging
+import threading
+import functools
+import contextlib
+import contextvars
+import numpy as np
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 99)
+# set FM_TIMING=1 to record spans, everything below is a no-op otherwise
+_enabled = os.environ.get("FM_TIMING", "") not in ("", "0")
+_disabled_span = contextlib.nullcontext()
+
+
+class SpanStats:
+    '''
+    Thread-safe latency samples per span name
+
+    Keeps a count and total of every span and the most recent max_samples
+    durations for percentiles.
+    '''
+    def __init__(self, max_samples: int=2048):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.max_samples)
+                self._counts[name] = 0
+                self._totals[name] = 0.0
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
+
+    def summary(self) -> List[Dict[str, Any]]:
+        '''
+        Return count, total, mean, percentiles and maximum in milliseconds for every span
+        '''
+        with self._lock:
+            samples = {name: np.array(values) * 1000 for name, values in self._samples.items()}
+            counts, totals = dict(self._counts), dict(self._totals)
+        rows = []
+        for name, values in samples.items():
+            row = {"span": name,
+                   "count": counts[name],
+                   "total_ms": totals[name] * 1000,
+                   "mean_ms": totals[name] * 1000 / counts[name]}
+            row.update({f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES})
+            row["max_ms"] = float(values.max())
+            rows.append(row)
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+process_stats = SpanStats()
+_session_stats = contextvars.ContextVar("session_stats", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool=True) -> None:
+    '''
+    Switch span recording on or off for the whole process
+    '''
+    global _enabled
+    _enabled = on
+
+
+def bindSession(stats: Optional[SpanStats]) -> None:
+    '''
+    Record spans of the current script run into a session's statistics as well
+
+    Args:
+        stats (SpanStats): statistics kept in the session state, None to unbind
+    '''
+    _session_stats.set(stats)
+
+
+def record(name: str, seconds: float) -> None:
+    '''
+    Add a duration measured elsewhere to the process and session statistics
+    '''
+    if not _enabled:
+        return
+    process_stats.add(name, seconds)
+    session = _session_stats.get()
+    if session is not None:
+        session.add(name, seconds)
+    logger.debug("%s took %.2f ms", name, seconds * 1000)
+
+
+@contextlib.contextmanager
+def _span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name: str):
+    '''
+    Time a block of code
+
+        with span("filter"):
+            ...
+
+    Args:
+        name (str): name the duration is aggregated under
+    Returns:
+        context manager, a shared no-op one when recording is disabled
+    '''
+    if not _enabled:
+        return _disabled_span
+    return _span(name)
+
+
+def timed(name: Optional[str]=None) -> Callable:
+    '''
+    Time every call of a function, named after the function by default
+    '''
+    def decorator(func: Callable) -> Callable:
+        label = name or func.__qualname__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export(path: str, stats: SpanStats=process_stats) -> None:
+    '''
+    Write percentile latencies of every span to a JSON file
+
+    Args:
+        path (str): output file
+        stats (SpanStats): statistics to export, the process-wide ones by default
+    '''
+    with open(path, "w") as json_file:
+        json.dump({"pid": os.getpid(), "time": time.time(), "spans": stats.summary()}, json_file, indent=1)
+
+
+def logSummary(stats: SpanStats=process_stats, level: int=logging.INFO) -> None:
+    '''
+    Log one line with count and percentile latencies per span
+    '''
+    for row in stats.summary():
+        logger.log(level, "%s: n=%d mean=%.2fms p50=%.2fms p90=%.2fms p99=%.2fms max=%.2fms",
+                   row["span"], row["count"], row["mean_ms"], row["p50_ms"], row["p90_ms"],
+                   row["p99_ms"], row["max_ms"])
+
+
+if os.environ.get("FM_TIMING_EXPORT"):
+    atexit.register(export, os.environ["FM_TIMING_EXPORT"])
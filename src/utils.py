@@ -1,6 +1,20 @@
+import os
+
 cpi_path = r"./data/WS_LONG_CPI_csv_col.csv"
 ir_path = r"./data/WS_CBPOL_M_csv_col.csv"
+ir_daily_path = r"./data/WS_CBPOL_D_csv_col.csv"
+credit_gap_path = r"./data/WS_CREDIT_GAP_csv_col.csv"
+total_credit_path = r"./data/WS_TC_csv_col.csv"
+property_prices_path = r"./data/WS_SPP_csv_col.csv"
 iso_conversions_path = r"./data/iso_name_conversions.csv"
+iso_to_name_path = r"./data/iso_to_name.csv"
 eurozone_path = r"./data/eurozone.csv"
+top100_path = r"./data/top100.csv"
+futures_path = r"./data/futures.csv"
+currencies_path = r"./data/currencies.csv"
+crypto_path = r"./data/crypto.csv"
 
-countries_cpi_ir_data = r"./data/BIS_Monthly_CPI_Interest_Data.csv"
\ No newline at end of file
+countries_cpi_ir_data = r"./data/BIS_Monthly_CPI_Interest_Data.csv"
+# FM_STORE=/dev/shm/... keeps the store in shared memory, every worker maps the same pages
+countries_cpi_ir_store = os.environ.get("FM_STORE", r"./data/BIS_Monthly_CPI_Interest_Data.store")
+ohlc_store = r"./data/ohlc.store"